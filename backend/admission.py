@@ -0,0 +1,65 @@
+"""Admission control for expensive endpoints."""
+
+from __future__ import annotations
+
+import asyncio
+import weakref
+from typing import AsyncIterator, Dict
+
+from fastapi import HTTPException
+
+
+class AdmissionGate:
+    """Cap concurrent requests to a group of endpoints and turn away the excess quickly.
+
+    A request waits at most ``max_wait_seconds`` for a slot and is then rejected
+    with 503, so a burst cannot build a queue that every later request sits behind.
+    """
+
+    def __init__(self, name: str, capacity: int, max_wait_seconds: float = 0.1) -> None:
+        self.name = name
+        self.capacity = capacity
+        self.max_wait_seconds = max_wait_seconds
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        # asyncio primitives belong to one loop; tests run several in turn.
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.capacity)
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    async def slot(self) -> AsyncIterator[None]:
+        """FastAPI dependency that holds a slot while the request is handled."""
+        semaphore = self._semaphore()
+        try:
+            await asyncio.wait_for(semaphore.acquire(), self.max_wait_seconds)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Server busy, please retry shortly",
+                headers={"Retry-After": "1"},
+            ) from None
+        self.admitted += 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            semaphore.release()
+
+    def snapshot(self) -> Dict[str, int]:
+        return {
+            "capacity": self.capacity,
+            "in_flight": self.in_flight,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
@@ -2,23 +2,37 @@
 
 from __future__ import annotations
 
+import atexit
 import logging
 import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
 
+_FORMATTER = logging.Formatter("%(asctime)s %(levelname)s %(message)s")
 
-def setup_app_logger(name: str = "plot_mcp") -> logging.Logger:
-    """Create a file logger for backend requests."""
-    log_dir = os.path.join("backend", "logs")
-    if not os.path.exists(log_dir):
-        os.makedirs(log_dir)
 
+def setup_app_logger(
+    name: str = "plot_mcp", filename: str = "app.log", level: int = logging.INFO
+) -> logging.Logger:
+    """Create a file logger under backend/logs, once per logger name.
+
+    Records are handed to a queue and written by a background listener
+    thread, so request handlers never wait on disk writes.
+    """
     logger = logging.getLogger(name)
     if logger.handlers:
         return logger
 
-    logger.setLevel(logging.INFO)
-    handler = logging.FileHandler(os.path.join(log_dir, "app.log"))
-    formatter = logging.Formatter("%(asctime)s %(levelname)s %(message)s")
-    handler.setFormatter(formatter)
-    logger.addHandler(handler)
+    log_dir = os.path.join("backend", "logs")
+    os.makedirs(log_dir, exist_ok=True)
+
+    logger.setLevel(level)
+    # delay=True defers opening the file until the first record is written.
+    handler = logging.FileHandler(os.path.join(log_dir, filename), delay=True)
+    handler.setFormatter(_FORMATTER)
+    records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    listener = QueueListener(records, handler)
+    listener.start()
+    atexit.register(listener.stop)
+    logger.addHandler(QueueHandler(records))
     return logger
@@ -3,8 +3,63 @@
 from __future__ import annotations
 
 import ast
+import functools
 from dataclasses import dataclass
-from typing import List, Set
+from typing import Callable, Dict, FrozenSet, List, Tuple
+
+_ALLOWED_IMPORTS: FrozenSet[str] = frozenset(
+    {
+        "matplotlib",
+        "matplotlib.pyplot",
+        "pandas",
+        "numpy",
+        "seaborn",
+    }
+)
+
+_DISALLOWED_NAMES: FrozenSet[str] = frozenset(
+    {
+        "open",
+        "exec",
+        "eval",
+        "compile",
+        "__import__",
+        "input",
+        "exit",
+        "quit",
+        "os",
+        "sys",
+        "subprocess",
+        "socket",
+        "pathlib",
+        "shutil",
+        "pd.read_csv",
+        "pd.read_json",
+        "pd.read_excel",
+        "pd.read_parquet",
+        "np.load",
+    }
+)
+
+# Enough errors to explain a rejection; walking further only adds noise.
+_MAX_ERRORS = 5
+
+# Nodes whose children can never hold an import, call, name or constant.
+_LEAF_TYPES: FrozenSet[type] = frozenset(
+    {
+        ast.Constant,
+        ast.Name,
+        ast.alias,
+        ast.Load,
+        ast.Store,
+        ast.Del,
+        ast.Pass,
+        ast.Break,
+        ast.Continue,
+        ast.Global,
+        ast.Nonlocal,
+    }
+)
 
 
 @dataclass
@@ -16,73 +71,84 @@ class LintResult:
     warnings: List[str]
 
 
+def _on_import(node: ast.Import, errors: List[str], warnings: List[str]) -> None:
+    for alias in node.names:
+        if alias.name not in _ALLOWED_IMPORTS:
+            errors.append(f"Import not allowed: {alias.name}")
+
+
+def _on_import_from(node: ast.ImportFrom, errors: List[str], warnings: List[str]) -> None:
+    module = node.module or ""
+    if module not in _ALLOWED_IMPORTS:
+        errors.append(f"Import not allowed: {module}")
+
+
+def _on_constant(node: ast.Constant, errors: List[str], warnings: List[str]) -> None:
+    if node.value is Ellipsis:
+        errors.append("Placeholder '...' detected; replace with real values/columns")
+
+
+def _on_call(node: ast.Call, errors: List[str], warnings: List[str]) -> None:
+    func = node.func
+    func_type = type(func)
+    if func_type is ast.Name:
+        name = func.id
+    elif func_type is ast.Attribute:
+        value = func.value
+        name = f"{value.id}.{func.attr}" if type(value) is ast.Name else func.attr
+    else:
+        return
+    if name in _DISALLOWED_NAMES:
+        errors.append(f"Call not allowed: {name}")
+
+
+def _on_name(node: ast.Name, errors: List[str], warnings: List[str]) -> None:
+    if node.id in _DISALLOWED_NAMES:
+        warnings.append(f"Reference to restricted name: {node.id}")
+
+
+# Handlers keyed on the exact node type; ``ast.walk`` plus an isinstance
+# chain costs several attribute lookups per node, a dict hit costs one.
+_DISPATCH: Dict[type, Callable[[ast.AST, List[str], List[str]], None]] = {
+    ast.Import: _on_import,
+    ast.ImportFrom: _on_import_from,
+    ast.Constant: _on_constant,
+    ast.Call: _on_call,
+    ast.Name: _on_name,
+}
+
+
+@functools.lru_cache(maxsize=512)
+def _lint_cached(code: str) -> Tuple[bool, Tuple[str, ...], Tuple[str, ...]]:
+    """Lint source text; results depend on the text alone, so they are cached."""
+    tree = ast.parse(code)
+    errors: List[str] = []
+    warnings: List[str] = []
+
+    stack: List[ast.AST] = [tree]
+    while stack:
+        node = stack.pop()
+        handler = _DISPATCH.get(type(node))
+        if handler is not None:
+            handler(node, errors, warnings)
+            if len(errors) >= _MAX_ERRORS:
+                break
+        if type(node) in _LEAF_TYPES:
+            continue
+        children = list(ast.iter_child_nodes(node))
+        children.reverse()
+        stack.extend(children)
+
+    return len(errors) == 0, tuple(errors), tuple(warnings)
+
+
 class CodeSafetyValidator:
     """Validate plot code for unsafe constructs."""
 
-    def __init__(self) -> None:
-        self.allowed_imports = {
-            "matplotlib",
-            "matplotlib.pyplot",
-            "pandas",
-            "numpy",
-            "seaborn",
-        }
-        self.disallowed_names = {
-            "open",
-            "exec",
-            "eval",
-            "compile",
-            "__import__",
-            "input",
-            "exit",
-            "quit",
-            "os",
-            "sys",
-            "subprocess",
-            "socket",
-            "pathlib",
-            "shutil",
-            "pd.read_csv",
-            "pd.read_json",
-            "pd.read_excel",
-            "pd.read_parquet",
-            "np.load",
-        }
+    allowed_imports: FrozenSet[str] = _ALLOWED_IMPORTS
+    disallowed_names: FrozenSet[str] = _DISALLOWED_NAMES
 
     def lint(self, code: str) -> LintResult:
         """Parse and validate code against import and call rules."""
-        tree = ast.parse(code)
-        errors: List[str] = []
-        warnings: List[str] = []
-
-        for node in ast.walk(tree):
-            if isinstance(node, ast.Import):
-                for alias in node.names:
-                    if alias.name not in self.allowed_imports:
-                        errors.append(f"Import not allowed: {alias.name}")
-            elif isinstance(node, ast.ImportFrom):
-                module = node.module or ""
-                if module not in self.allowed_imports:
-                    errors.append(f"Import not allowed: {module}")
-            elif isinstance(node, ast.Constant):
-                if node.value is Ellipsis:
-                    errors.append("Placeholder '...' detected; replace with real values/columns")
-            elif isinstance(node, ast.Call):
-                name = self._get_call_name(node)
-                if name in self.disallowed_names:
-                    errors.append(f"Call not allowed: {name}")
-            elif isinstance(node, ast.Name):
-                if node.id in self.disallowed_names:
-                    warnings.append(f"Reference to restricted name: {node.id}")
-
-        ok = len(errors) == 0
-        return LintResult(ok=ok, errors=errors, warnings=warnings)
-
-    def _get_call_name(self, node: ast.Call) -> str:
-        if isinstance(node.func, ast.Name):
-            return node.func.id
-        if isinstance(node.func, ast.Attribute):
-            if isinstance(node.func.value, ast.Name):
-                return f"{node.func.value.id}.{node.func.attr}"
-            return node.func.attr
-        return ""
+        ok, errors, warnings = _lint_cached(code)
+        return LintResult(ok=ok, errors=list(errors), warnings=list(warnings))
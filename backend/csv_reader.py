@@ -0,0 +1,29 @@
+"""CSV parsing shared by the backend and the plot sandbox.
+
+Both sides must read a file the same way, otherwise the column types
+described to the LLM differ from the ones its generated code receives.
+"""
+
+from __future__ import annotations
+
+from importlib.util import find_spec
+from typing import BinaryIO
+
+import pandas as pd
+
+# The multi-threaded Arrow CSV parser is used when pyarrow is installed.
+CSV_ENGINE = "pyarrow" if find_spec("pyarrow") is not None else "c"
+
+
+def read_csv(source: BinaryIO, sep: str = ",") -> pd.DataFrame:
+    """Parse CSV with ``CSV_ENGINE``, retrying with the C parser on rows Arrow rejects.
+
+    Arrow refuses rows with fewer fields than the header, which the C parser pads with NaN.
+    """
+    try:
+        return pd.read_csv(source, sep=sep, engine=CSV_ENGINE)
+    except pd.errors.ParserError:
+        if CSV_ENGINE == "c":
+            raise
+        source.seek(0)
+        return pd.read_csv(source, sep=sep, engine="c")
@@ -2,6 +2,8 @@
 
 from __future__ import annotations
 
+import asyncio
+import functools
 import io
 import os
 from typing import Dict, List, Optional
@@ -9,6 +11,48 @@ from typing import Dict, List, Optional
 import pandas as pd
 from fastapi import UploadFile
 
+from csv_reader import read_csv
+
+_UPLOAD_CHUNK_SIZE = 1 << 20
+_IO_BUFFER_SIZE = 1 << 20
+
+# Upper bound on columns rendered in the prompt sample rows.
+_CONTEXT_MAX_COLUMNS = 20
+_CONTEXT_MAX_COLWIDTH = 32
+
+
+def _write_text(file_path: str, content: str) -> None:
+    with open(file_path, "w", buffering=_IO_BUFFER_SIZE) as f:
+        f.write(content)
+
+
+@functools.lru_cache(maxsize=32)
+def _load_cached(file_path: str, mtime_ns: int, size: int) -> Optional[pd.DataFrame]:
+    """Parse a dataset once per (path, mtime, size); callers must not mutate it."""
+    if file_path.endswith(".csv"):
+        with open(file_path, "rb", buffering=_IO_BUFFER_SIZE) as handle:
+            return read_csv(handle)
+    if file_path.endswith(".json"):
+        with open(file_path, "rb", buffering=_IO_BUFFER_SIZE) as handle:
+            return pd.read_json(handle)
+    return None
+
+
+@functools.lru_cache(maxsize=64)
+def _describe_cached(file_path: str, mtime_ns: int, size: int) -> str:
+    """Render the columns, dtypes and sample rows of a dataset once per file version."""
+    df = _load_cached(file_path, mtime_ns, size)
+    info_str = f"shape={df.shape}\n{df.dtypes.to_string()}"
+    sample = df.iloc[:3, :_CONTEXT_MAX_COLUMNS].to_string(max_colwidth=_CONTEXT_MAX_COLWIDTH)
+    hidden_columns = df.shape[1] - _CONTEXT_MAX_COLUMNS
+    if hidden_columns > 0:
+        sample = f"{sample}\n... (+{hidden_columns} more cols)"
+    return (
+        f"Data Columns: {list(df.columns)}\n"
+        f"Data Types:\n{info_str}\n"
+        f"First 3 rows:\n{sample}\n"
+    )
+
 
 class DataManager:
     """Handle saving, loading, and summarizing uploaded datasets."""
@@ -26,9 +70,10 @@ class DataManager:
         save_dir = target_dir or self.upload_dir
         self._ensure_dir(save_dir)
         file_path = os.path.join(save_dir, file.filename)
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
+        f = await asyncio.to_thread(open, file_path, "wb")
+        with f:
+            while chunk := await file.read(_UPLOAD_CHUNK_SIZE):
+                await asyncio.to_thread(f.write, chunk)
         return file_path
 
     async def save_text_data(
@@ -38,51 +83,47 @@ class DataManager:
         save_dir = target_dir or self.upload_dir
         self._ensure_dir(save_dir)
         file_path = os.path.join(save_dir, filename)
-        with open(file_path, "w") as f:
-            f.write(content)
+        await asyncio.to_thread(_write_text, file_path, content)
         return file_path
 
+    def _load_shared(self, file_path: str) -> Optional[pd.DataFrame]:
+        """Return the cached parse of a supported file, or None for other formats."""
+        if not file_path.endswith((".csv", ".json")):
+            return None
+        stat = os.stat(file_path)
+        return _load_cached(file_path, stat.st_mtime_ns, stat.st_size)
+
     def load_data(self, file_path: str) -> pd.DataFrame:
         """Load data from a CSV or JSON file into a DataFrame."""
-        if file_path.endswith(".csv"):
-            return pd.read_csv(file_path)
-        if file_path.endswith(".json"):
-            return pd.read_json(file_path)
-        raise ValueError("Unsupported file format")
+        df = self._load_shared(file_path)
+        if df is None:
+            raise ValueError("Unsupported file format")
+        return df.copy()
+
+    def parse_csv_text(self, text: str, sep: str = ",") -> pd.DataFrame:
+        """Parse in-memory CSV text the same way uploaded CSV files are parsed."""
+        return read_csv(io.BytesIO(text.encode("utf-8")), sep=sep)
 
     def get_preview(self, file_path: str) -> List[Dict[str, object]]:
         """Return a preview of the dataset as a list of records."""
-        if file_path.endswith(".csv"):
-            df = pd.read_csv(file_path)
-        elif file_path.endswith(".json"):
-            df = pd.read_json(file_path)
-        else:
+        df = self._load_shared(file_path)
+        if df is None:
             return []
 
         return df.head().to_dict(orient="records")
 
     def get_data_context(self, file_path: str, alias: Optional[str] = None) -> str:
-        """Build a compact context block for a single dataset."""
-        if file_path.endswith(".csv"):
-            df = pd.read_csv(file_path)
-        elif file_path.endswith(".json"):
-            df = pd.read_json(file_path)
-        else:
-            return "No data available."
+        """Build a compact context block for a single dataset.
 
-        buffer = io.StringIO()
-        df.info(buf=buffer)
-        info_str = buffer.getvalue()
+        The rendered summary is reused across chat turns until the file changes.
+        """
+        if not file_path.endswith((".csv", ".json")):
+            return "No data available."
+        stat = os.stat(file_path)
+        description = _describe_cached(file_path, stat.st_mtime_ns, stat.st_size)
         label = os.path.basename(file_path)
         alias_text = f" (alias: {alias})" if alias else ""
-
-        context = (
-            f"File: {label}{alias_text}\n"
-            f"Data Columns: {list(df.columns)}\n"
-            f"Data Types:\n{info_str}\n"
-            f"First 3 rows:\n{df.head(3).to_string()}\n"
-        )
-        return context
+        return f"File: {label}{alias_text}\n{description}"
 
     def get_multi_data_context(self, alias_map: Dict[str, str]) -> str:
         """Build a combined context block for multiple datasets."""
@@ -6,51 +6,55 @@ Provides guidance on data formatting requirements
 
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Tuple
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Tuple, Union
+
+# Plot requirements, frozen and shared by every validator
+_PLOT_REQUIREMENTS: Mapping[str, Mapping[str, object]] = MappingProxyType({
+    "scatter": MappingProxyType({
+        "min_numeric_cols": 2,
+        "description": "Requires at least 2 numeric columns (x, y)",
+        "example": "Columns: 'x', 'y', optional 'size', 'color'"
+    }),
+    "line": MappingProxyType({
+        "min_numeric_cols": 2,
+        "description": "Requires at least 2 numeric columns (x, y)",
+        "example": "Columns: 'time', 'value'"
+    }),
+    "bar": MappingProxyType({
+        "min_cols": 2,
+        "categorical": 1,
+        "numeric": 1,
+        "description": "Requires 1 categorical and 1 numeric column",
+        "example": "Columns: 'category', 'value'"
+    }),
+    "histogram": MappingProxyType({
+        "min_numeric_cols": 1,
+        "description": "Requires at least 1 numeric column",
+        "example": "Column: 'values'"
+    }),
+    "boxplot": MappingProxyType({
+        "min_cols": 2,
+        "categorical": 1,
+        "numeric": 1,
+        "description": "Requires 1 categorical (groups) and 1 numeric column",
+        "example": "Columns: 'group', 'value'"
+    }),
+    "heatmap": MappingProxyType({
+        "min_numeric_cols": 3,
+        "description": "Requires numeric data in matrix form or 3+ numeric columns",
+        "example": "Columns: multiple numeric columns or correlation matrix"
+    }),
+    "3d_scatter": MappingProxyType({
+        "min_numeric_cols": 3,
+        "description": "Requires at least 3 numeric columns (x, y, z)",
+        "example": "Columns: 'x', 'y', 'z'"
+    })
+})
+
 
 class DataValidator:
-    def __init__(self):
-        self.plot_requirements = {
-            "scatter": {
-                "min_numeric_cols": 2,
-                "description": "Requires at least 2 numeric columns (x, y)",
-                "example": "Columns: 'x', 'y', optional 'size', 'color'"
-            },
-            "line": {
-                "min_numeric_cols": 2,
-                "description": "Requires at least 2 numeric columns (x, y)",
-                "example": "Columns: 'time', 'value'"
-            },
-            "bar": {
-                "min_cols": 2,
-                "categorical": 1,
-                "numeric": 1,
-                "description": "Requires 1 categorical and 1 numeric column",
-                "example": "Columns: 'category', 'value'"
-            },
-            "histogram": {
-                "min_numeric_cols": 1,
-                "description": "Requires at least 1 numeric column",
-                "example": "Column: 'values'"
-            },
-            "boxplot": {
-                "min_cols": 2,
-                "categorical": 1,
-                "numeric": 1,
-                "description": "Requires 1 categorical (groups) and 1 numeric column",
-                "example": "Columns: 'group', 'value'"
-            },
-            "heatmap": {
-                "min_numeric_cols": 3,
-                "description": "Requires numeric data in matrix form or 3+ numeric columns",
-                "example": "Columns: multiple numeric columns or correlation matrix"
-            },
-            "3d_scatter": {
-                "min_numeric_cols": 3,
-                "description": "Requires at least 3 numeric columns (x, y, z)",
-                "example": "Columns: 'x', 'y', 'z'"
-            }
-        }
+    plot_requirements = _PLOT_REQUIREMENTS
     
     def analyze_data(self, df: pd.DataFrame) -> Dict:
         """Analyze dataframe structure and suggest plot types"""
@@ -66,19 +70,18 @@ class DataValidator:
             "warnings": []
         }
         
-        # Analyze each column
-        for col in df.columns:
-            if pd.api.types.is_numeric_dtype(df[col]):
-                analysis["numeric_cols"].append(col)
-            elif pd.api.types.is_datetime64_any_dtype(df[col]):
-                analysis["datetime_cols"].append(col)
-            else:
-                analysis["categorical_cols"].append(col)
-            
-            # Check for missing values
-            missing = df[col].isnull().sum()
-            if missing > 0:
-                analysis["missing_values"][col] = missing
+        # Classify all columns by dtype in one pass each
+        # "number" also matches timedelta, which is_numeric_dtype treats as categorical
+        numeric_cols = df.select_dtypes(include=["number", "bool"], exclude=["timedelta"]).columns.tolist()
+        datetime_cols = df.select_dtypes(include=["datetime", "datetimetz"]).columns.tolist()
+        typed = set(numeric_cols) | set(datetime_cols)
+        analysis["numeric_cols"] = numeric_cols
+        analysis["datetime_cols"] = datetime_cols
+        analysis["categorical_cols"] = [col for col in df.columns if col not in typed]
+        
+        # Check for missing values
+        missing = df.isna().sum()
+        analysis["missing_values"] = missing[missing > 0].to_dict()
         
         # Suggest appropriate plot types
         num_numeric = len(analysis["numeric_cols"])
@@ -150,14 +153,26 @@ class DataValidator:
         
         return analysis
     
-    def validate_for_plot_type(self, df: pd.DataFrame, plot_type: str) -> Tuple[bool, str]:
-        """Validate if data is suitable for a specific plot type"""
+    def _resolve_analysis(self, data: Union[pd.DataFrame, Dict]) -> Dict:
+        """Return an analysis dict, computing it only when given a DataFrame"""
+        if isinstance(data, pd.DataFrame):
+            return self.analyze_data(data)
+        return data
+    
+    def validate_for_plot_type(
+        self, data: Union[pd.DataFrame, Dict], plot_type: str
+    ) -> Tuple[bool, str]:
+        """Validate if data is suitable for a specific plot type.
+        
+        ``data`` may be a DataFrame or the result of ``analyze_data`` so that
+        callers checking several plot types scan the frame only once.
+        """
         
         if plot_type not in self.plot_requirements:
             return True, "Plot type not in validation database"
         
         requirements = self.plot_requirements[plot_type]
-        analysis = self.analyze_data(df)
+        analysis = self._resolve_analysis(data)
         
         # Check numeric column requirements
         if "min_numeric_cols" in requirements:
@@ -181,10 +196,12 @@ class DataValidator:
         
         return True, "Data is suitable for this plot type"
     
-    def suggest_data_transformation(self, df: pd.DataFrame, desired_plot: str) -> str:
-        """Suggest how to transform data for a desired plot type"""
+    def suggest_data_transformation(
+        self, data: Union[pd.DataFrame, Dict], desired_plot: str
+    ) -> str:
+        """Suggest how to transform data (DataFrame or analysis) for a desired plot type"""
         
-        analysis = self.analyze_data(df)
+        analysis = self._resolve_analysis(data)
         
         if desired_plot == "scatter" and len(analysis["numeric_cols"]) < 2:
             return (
@@ -211,14 +228,11 @@ class DataValidator:
 
     def get_plot_schema(self, plot_type: str) -> Dict[str, object]:
         """Return schema requirements for a plot type."""
-        return self.plot_requirements.get(plot_type, {})
+        return dict(self.plot_requirements.get(plot_type, {}))
 
-# Global instance
-_validator = None
+# Global instance; the validator holds no state, so one is built at import
+_validator = DataValidator()
 
 def get_validator():
-    """Get or create the validator instance"""
-    global _validator
-    if _validator is None:
-        _validator = DataValidator()
+    """Get the shared validator instance"""
     return _validator
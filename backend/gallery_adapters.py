@@ -8,7 +8,10 @@ for high-impact examples so they work reliably with user datasets.
 
 from __future__ import annotations
 
+import functools
+import re
 from dataclasses import dataclass
+from itertools import islice
 from typing import Dict, List, Optional, Tuple
 
 
@@ -26,27 +29,31 @@ _GALLERY_PHRASES = (
     "example:",
 )
 
+# Longer phrases come first so "based on this example:" wins over its
+# "example:" suffix at the same position.
+_GALLERY_PATTERN = re.compile(
+    "(?:" + "|".join(re.escape(phrase) for phrase in _GALLERY_PHRASES) + r")\s*(.+)",
+    re.IGNORECASE,
+)
+
 
 def extract_gallery_example_title(query: str) -> Optional[str]:
     """Extract the requested gallery example title from a chat query."""
-    normalized = " ".join((query or "").strip().split())
+    normalized = " ".join((query or "").split())
     if not normalized:
         return None
 
-    lowered = normalized.lower()
-    for phrase in _GALLERY_PHRASES:
-        idx = lowered.find(phrase)
-        if idx == -1:
-            continue
-        remainder = normalized[idx + len(phrase) :].strip()
-        if not remainder:
-            continue
-        title = _split_title(remainder)
+    for match in _GALLERY_PATTERN.finditer(normalized):
+        title = _split_title(match.group(1))
         if title:
             return title
     return None
 
 
+# Only these analysis fields influence generated code, so they form the cache key.
+_AnalysisKey = Tuple[Tuple[object, ...], Tuple[object, ...], Tuple[object, ...]]
+
+
 def maybe_adapt_gallery_example(
     example_title: str,
     data_analysis: Optional[Dict[str, object]] = None,
@@ -58,6 +65,25 @@ def maybe_adapt_gallery_example(
         return None
 
     analysis = _get_primary_analysis(data_analysis, file_catalog)
+    return _adapt_cached(normalized_title, _analysis_key(analysis))
+
+
+def generate_gallery_fallback_plot(
+    data_analysis: Optional[Dict[str, object]] = None,
+    file_catalog: Optional[List[Dict[str, object]]] = None,
+) -> Optional[GalleryAdaptation]:
+    """Generate a generic plot fallback when an example adaptation fails."""
+    analysis = _get_primary_analysis(data_analysis, file_catalog)
+    if not analysis:
+        return None
+    return _fallback_cached(_analysis_key(analysis))
+
+
+@functools.lru_cache(maxsize=256)
+def _adapt_cached(
+    normalized_title: str, key: Optional[_AnalysisKey]
+) -> Optional[GalleryAdaptation]:
+    analysis = _analysis_from_key(key)
 
     if normalized_title == "curve error band":
         code = _curve_error_band_code(analysis)
@@ -74,16 +100,31 @@ def maybe_adapt_gallery_example(
     return None
 
 
-def generate_gallery_fallback_plot(
-    data_analysis: Optional[Dict[str, object]] = None,
-    file_catalog: Optional[List[Dict[str, object]]] = None,
-) -> Optional[GalleryAdaptation]:
-    """Generate a generic plot fallback when an example adaptation fails."""
-    analysis = _get_primary_analysis(data_analysis, file_catalog)
+@functools.lru_cache(maxsize=256)
+def _fallback_cached(key: _AnalysisKey) -> GalleryAdaptation:
+    code = _basic_line_plot_code(_analysis_from_key(key) or {})
+    return GalleryAdaptation(code=code, description="Basic line plot (fallback)")
+
+
+def _analysis_key(analysis: Optional[Dict[str, object]]) -> Optional[_AnalysisKey]:
     if not analysis:
         return None
-    code = _basic_line_plot_code(analysis)
-    return GalleryAdaptation(code=code, description="Basic line plot (fallback)")
+    return (
+        tuple(analysis.get("columns", []) or ()),
+        tuple(analysis.get("numeric_cols", []) or ()),
+        tuple(analysis.get("datetime_cols", []) or ()),
+    )
+
+
+def _analysis_from_key(key: Optional[_AnalysisKey]) -> Optional[Dict[str, object]]:
+    if key is None:
+        return None
+    columns, numeric_cols, datetime_cols = key
+    return {
+        "columns": list(columns),
+        "numeric_cols": list(numeric_cols),
+        "datetime_cols": list(datetime_cols),
+    }
 
 
 def _normalize_title(title: str) -> str:
@@ -112,6 +153,31 @@ def _get_primary_analysis(
     return None
 
 
+_ERROR_BAND_BODY = (
+    "mask = (~x.isna()) & (~y.isna()) & (~y_err.isna())",
+    "x = x[mask]",
+    "y = y[mask]",
+    "y_err = y_err[mask]",
+    "df_plot = pd.DataFrame({'x': x, 'y': y, 'y_err': y_err})",
+    "df_plot = df_plot.sort_values('x')",
+    "if df_plot.empty:",
+    "    fig, ax = plt.subplots(figsize=(10, 4))",
+    "    ax.text(0.5, 0.5, 'No plottable numeric data after cleaning.', ha='center', va='center')",
+    "    ax.set_axis_off()",
+    "else:",
+    "    x = df_plot['x']",
+    "    y = df_plot['y']",
+    "    y_err = df_plot['y_err']",
+    "    fig, ax = plt.subplots(figsize=(10, 4))",
+    "    ax.plot(x, y, color='#1f77b4', linewidth=2.0, label='value')",
+    "    ax.fill_between(x, y - y_err, y + y_err, color='#1f77b4', alpha=0.22, label='error band')",
+    "    ax.set_title('Curve with error band')",
+    "    ax.set_xlabel('x')",
+    "    ax.set_ylabel('y')",
+    "    ax.legend(loc='best')",
+)
+
+
 def _curve_error_band_code(analysis: Optional[Dict[str, object]]) -> str:
     """Generate a robust error-band plot for user data (or synthetic fallback)."""
     if not analysis:
@@ -119,66 +185,35 @@ def _curve_error_band_code(analysis: Optional[Dict[str, object]]) -> str:
 
     x_col, y_col, err_col, x_kind = _choose_error_band_columns(analysis)
 
-    preamble = [
+    lines: List[str] = [
         "plt.style.use('seaborn-v0_8-whitegrid')",
         "df_local = df.copy()",
     ]
 
-    x_lines: List[str] = []
-    y_lines: List[str] = []
-
     if x_col:
         if x_kind == "datetime":
-            x_lines.append(f"x = pd.to_datetime(df_local[{x_col!r}], errors='coerce')")
+            lines.append(f"x = pd.to_datetime(df_local[{x_col!r}], errors='coerce')")
         else:
-            x_lines.append(f"x = pd.to_numeric(df_local[{x_col!r}], errors='coerce')")
+            lines.append(f"x = pd.to_numeric(df_local[{x_col!r}], errors='coerce')")
     else:
-        x_lines.append("x = pd.Series(np.arange(len(df_local)))")
+        lines.append("x = pd.Series(np.arange(len(df_local)))")
 
     if y_col:
-        y_lines.append(f"y = pd.to_numeric(df_local[{y_col!r}], errors='coerce')")
+        lines.append(f"y = pd.to_numeric(df_local[{y_col!r}], errors='coerce')")
     else:
-        y_lines.append("y = pd.Series(dtype=float)")
+        lines.append("y = pd.Series(dtype=float)")
 
-    err_lines: List[str] = []
     if err_col:
-        err_lines.append(f"y_err = pd.to_numeric(df_local[{err_col!r}], errors='coerce').abs()")
+        lines.append(f"y_err = pd.to_numeric(df_local[{err_col!r}], errors='coerce').abs()")
     else:
-        err_lines.append("y_err = 0.1 * y.abs()")
-
-    cleanup = [
-        "mask = (~x.isna()) & (~y.isna()) & (~y_err.isna())",
-        "x = x[mask]",
-        "y = y[mask]",
-        "y_err = y_err[mask]",
-        "df_plot = pd.DataFrame({'x': x, 'y': y, 'y_err': y_err})",
-    ]
-
-    plotting = [
-        "df_plot = df_plot.sort_values('x')",
-        "if df_plot.empty:",
-        "    fig, ax = plt.subplots(figsize=(10, 4))",
-        "    ax.text(0.5, 0.5, 'No plottable numeric data after cleaning.', ha='center', va='center')",
-        "    ax.set_axis_off()",
-        "else:",
-        "    x = df_plot['x']",
-        "    y = df_plot['y']",
-        "    y_err = df_plot['y_err']",
-        "    fig, ax = plt.subplots(figsize=(10, 4))",
-        "    ax.plot(x, y, color='#1f77b4', linewidth=2.0, label='value')",
-        "    ax.fill_between(x, y - y_err, y + y_err, color='#1f77b4', alpha=0.22, label='error band')",
-        "    ax.set_title('Curve with error band')",
-        "    ax.set_xlabel('x')",
-        "    ax.set_ylabel('y')",
-        "    ax.legend(loc='best')",
-    ]
+        lines.append("y_err = 0.1 * y.abs()")
 
+    lines.extend(_ERROR_BAND_BODY)
     if x_kind == "datetime":
-        plotting.append("    fig.autofmt_xdate()")
-
-    plotting.append("fig.tight_layout()")
+        lines.append("    fig.autofmt_xdate()")
+    lines.append("fig.tight_layout()")
 
-    return "\n".join(preamble + x_lines + y_lines + err_lines + cleanup + plotting)
+    return "\n".join(lines)
 
 
 def _curve_error_band_synthetic_code() -> str:
@@ -200,34 +235,30 @@ def _curve_error_band_synthetic_code() -> str:
     )
 
 
+def _first_strs(values: object, limit: int) -> List[str]:
+    """Return up to ``limit`` string entries of ``values`` without scanning the rest."""
+    return list(islice((value for value in values if isinstance(value, str)), limit))
+
+
 def _choose_error_band_columns(
     analysis: Dict[str, object],
 ) -> Tuple[Optional[str], Optional[str], Optional[str], str]:
-    columns = analysis.get("columns", [])
-    numeric_cols = analysis.get("numeric_cols", [])
-    datetime_cols = analysis.get("datetime_cols", [])
-
-    resolved_columns = [c for c in columns if isinstance(c, str)]
-    resolved_numeric = [c for c in numeric_cols if isinstance(c, str)]
-    resolved_datetime = [c for c in datetime_cols if isinstance(c, str)]
-
-    if resolved_datetime and resolved_numeric:
-        x_col = resolved_datetime[0]
-        y_col = resolved_numeric[0]
-        err_col = resolved_numeric[1] if len(resolved_numeric) > 1 else None
-        return x_col, y_col, err_col, "datetime"
-
-    if len(resolved_numeric) >= 2:
-        x_col = resolved_numeric[0]
-        y_col = resolved_numeric[1]
-        err_col = resolved_numeric[2] if len(resolved_numeric) > 2 else None
-        return x_col, y_col, err_col, "numeric"
-
-    if len(resolved_numeric) == 1:
-        y_col = resolved_numeric[0]
-        return None, y_col, None, "index"
-
-    y_col = resolved_columns[0] if resolved_columns else None
+    numeric = _first_strs(analysis.get("numeric_cols", []), 3)
+    if numeric:
+        datetimes = _first_strs(analysis.get("datetime_cols", []), 1)
+        if datetimes:
+            err_col = numeric[1] if len(numeric) > 1 else None
+            return datetimes[0], numeric[0], err_col, "datetime"
+
+    if len(numeric) >= 2:
+        err_col = numeric[2] if len(numeric) > 2 else None
+        return numeric[0], numeric[1], err_col, "numeric"
+
+    if len(numeric) == 1:
+        return None, numeric[0], None, "index"
+
+    columns = _first_strs(analysis.get("columns", []), 1)
+    y_col = columns[0] if columns else None
     return None, y_col, None, "index"
 
 
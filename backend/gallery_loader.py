@@ -3,26 +3,81 @@ Matplotlib Gallery Loader - Production System
 Provides LLM access to ALL 509 official Matplotlib examples
 """
 
+import bisect
 import json
 import random
+from importlib.util import find_spec
 from pathlib import Path
 
 import os
+import threading
+
+from app_logger import setup_app_logger
+
+if find_spec("orjson") is not None:
+    import orjson
+else:
+    orjson = None
+
+
+def _read_json(path):
+    """Parse a JSON file, using orjson's native decoder when it is installed"""
+    if orjson is not None:
+        return orjson.loads(Path(path).read_bytes())
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def _match(category, example):
+    """Shape an example the way search results are returned"""
+    return {
+        'category': category,
+        'title': example['title'],
+        'filename': example['filename'],
+        'code': example['code'],
+    }
 
 class GalleryLoader:
     def __init__(self, gallery_file="backend/matplotlib_gallery_examples_full.json"):
         self.gallery_file = gallery_file
         self.examples = self._load_examples()
         self.kb = self._load_kb()
+        # Flat view with the category attached, built once; source dicts are left untouched
+        self._all_examples = [
+            dict(example, category=category)
+            for category, examples in self.examples.items()
+            for example in examples
+        ]
+        # The summary depends only on the KB, so it is rendered once
+        self._prompt_summary = self._build_prompt_summary()
+        self._build_search_index()
+
+    def _build_search_index(self):
+        """Index titles for exact lookup and join all searchable text for substring scans"""
+        self._by_title = {}
+        self._search_records = []
+        self._search_offsets = []
+        fields = []
+        offset = 0
+        for category, examples in self.examples.items():
+            for example in examples:
+                record = (category, example)
+                self._by_title.setdefault(example['title'].lower(), record)
+                # "title\0filename\0" per example; str.find over one string replaces a Python loop
+                text = f"{example['title'].lower()}\0{example['filename'].lower()}\0"
+                self._search_records.append(record)
+                self._search_offsets.append(offset)
+                fields.append(text)
+                offset += len(text)
+        self._search_text = ''.join(fields)
     
     def _load_examples(self):
         """Load all gallery examples"""
         if not os.path.exists(self.gallery_file):
-            print(f"Warning: {self.gallery_file} not found")
+            # Configured on first use so importing this module starts no log listener
+            setup_app_logger().warning("gallery_file_missing path=%s", self.gallery_file)
             return {}
 
-        with open(self.gallery_file, 'r') as f:
-            return json.load(f)
+        return _read_json(self.gallery_file)
     
     def _load_kb(self):
         """Load knowledge base summary"""
@@ -30,56 +85,53 @@ class GalleryLoader:
         if not os.path.exists(kb_path):
             return {}
             
-        with open(kb_path, 'r') as f:
-            return json.load(f)
+        return _read_json(kb_path)
     
     def get_category_examples(self, category, limit=3):
         """Get examples from a specific category"""
-        if category not in self.examples:
+        examples = self.examples.get(category)
+        if not examples:
             return []
         
-        examples = self.examples[category]
-        # Return up to 'limit' random examples
-        return random.sample(examples, min(limit, len(examples)))
+        # Return up to 'limit' random examples, sampling indices rather than the list
+        count = len(examples)
+        return [examples[i] for i in random.sample(range(count), min(limit, count))]
 
     def get_all_examples(self):
-        """Get all examples as a flat list"""
-        all_examples = []
-        for category, examples in self.examples.items():
-            for example in examples:
-                # Ensure category is included
-                example['category'] = category
-                all_examples.append(example)
-        return all_examples
+        """Get all examples as a flat list (shared; do not mutate)"""
+        return self._all_examples
     
     def search_examples(self, query, limit=5):
-        """Search for examples matching a query"""
+        """Search for examples matching a query; an exact title match ranks first"""
         query_lower = query.lower()
-        matches = []
-        
-        for category, examples in self.examples.items():
-            for example in examples:
-                title = example['title'].lower()
-                filename = example['filename'].lower()
-                
-                if query_lower in title or query_lower in filename:
-                    matches.append({
-                        'category': category,
-                        'title': example['title'],
-                        'filename': example['filename'],
-                        'code': example['code']
-                    })
-                
-                if len(matches) >= limit:
-                    break
-            
-            if len(matches) >= limit:
+        if '\0' in query_lower:
+            return []
+
+        records = []
+        exact = self._by_title.get(query_lower)
+        if exact is not None:
+            records.append(exact)
+
+        position = self._search_text.find(query_lower)
+        while position != -1 and len(records) < limit:
+            index = bisect.bisect_right(self._search_offsets, position) - 1
+            record = self._search_records[index]
+            if record is not exact:
+                records.append(record)
+            # Resume at the next example; one hit per example is enough
+            next_index = index + 1
+            if next_index == len(self._search_offsets):
                 break
-        
-        return matches
-    
+            position = self._search_text.find(query_lower, self._search_offsets[next_index])
+
+        return [_match(*record) for record in records]
+
     def get_prompt_summary(self):
         """Get a summary for the LLM prompt"""
+        return self._prompt_summary
+    
+    def _build_prompt_summary(self):
+        """Render the gallery summary block from the knowledge base"""
         if not self.kb:
             return "Matplotlib gallery examples available."
         
@@ -120,12 +172,15 @@ You have access to {total} official Matplotlib examples from {categories} catego
 
 # Global instance
 _gallery_loader = None
+_gallery_loader_lock = threading.Lock()
 
 def get_gallery_loader():
-    """Get or create the gallery loader instance"""
+    """Get or create the gallery loader instance (safe under concurrent requests)"""
     global _gallery_loader
     if _gallery_loader is None:
-        _gallery_loader = GalleryLoader()
+        with _gallery_loader_lock:
+            if _gallery_loader is None:
+                _gallery_loader = GalleryLoader()
     return _gallery_loader
 
 def get_gallery_prompt():
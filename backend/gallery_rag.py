@@ -9,50 +9,70 @@ gallery patterns while keeping the prompt small and safe.
 
 from __future__ import annotations
 
+import functools
+import heapq
+import json
+import logging
 import os
 import re
+import threading
 from dataclasses import dataclass
-from typing import Dict, Iterable, List, Optional, Sequence, Set
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Set, Tuple
 
-from gallery_loader import get_gallery_loader
+from gallery_loader import GalleryLoader, get_gallery_loader
 
 
+_LOGGER = logging.getLogger(__name__)
+
 _TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
 
-_STOPWORDS: Set[str] = {
-    "a",
-    "an",
-    "and",
-    "as",
-    "at",
-    "based",
-    "by",
-    "create",
-    "data",
-    "demo",
-    "do",
-    "draw",
-    "example",
-    "for",
-    "from",
-    "how",
-    "i",
-    "in",
-    "it",
-    "me",
-    "my",
-    "of",
-    "on",
-    "or",
-    "plot",
-    "please",
-    "show",
-    "the",
-    "this",
-    "to",
-    "using",
-    "with",
-}
+# Persisted index file, written next to the gallery JSON. Bump the version
+# whenever tokenization or sanitization changes so stale files are rebuilt.
+_INDEX_CACHE_NAME = ".gallery_index.json"
+_INDEX_CACHE_VERSION = 2
+_INDEX_FIELDS = ("titles_lower", "title_tokens", "filename_tokens", "sanitized_code")
+
+# Sanitizer line filters, matched against the stripped line.
+_DOCSTRING_QUOTES = ('"""', "'''")
+_DROPPED_LINE_PREFIXES = ("import ", "from ", "# %%", "# ..")
+
+_STOPWORDS: FrozenSet[str] = frozenset(
+    {
+        "a",
+        "an",
+        "and",
+        "as",
+        "at",
+        "based",
+        "by",
+        "create",
+        "data",
+        "demo",
+        "do",
+        "draw",
+        "example",
+        "for",
+        "from",
+        "how",
+        "i",
+        "in",
+        "it",
+        "me",
+        "my",
+        "of",
+        "on",
+        "or",
+        "plot",
+        "please",
+        "show",
+        "the",
+        "this",
+        "to",
+        "using",
+        "with",
+    }
+)
 
 
 @dataclass(frozen=True)
@@ -66,6 +86,19 @@ class RetrievedExample:
     score: float
 
 
+@dataclass(frozen=True)
+class _GalleryIndex:
+    """Pre-tokenized gallery metadata with a token -> example postings map."""
+
+    examples: Tuple[Dict[str, object], ...]
+    titles_lower: Tuple[str, ...]
+    title_tokens: Tuple[FrozenSet[str], ...]
+    filename_tokens: Tuple[FrozenSet[str], ...]
+    postings: Dict[str, Tuple[int, ...]]
+    # Prompt-ready code per example, filled on first retrieval.
+    sanitized_code: List[Optional[str]]
+
+
 def gallery_rag_enabled() -> bool:
     """Return True if gallery RAG injection is enabled."""
     mode = os.getenv("PLOT_GALLERY_RAG_MODE", "auto").strip().lower()
@@ -78,39 +111,53 @@ def retrieve_gallery_examples(query: str, limit: int = 3) -> List[RetrievedExamp
     if not normalized_query:
         return []
 
-    loader = get_gallery_loader()
-    examples = loader.get_all_examples()
     query_tokens = _tokenize(normalized_query)
     if not query_tokens:
         return []
 
-    scored: List[RetrievedExample] = []
-    for example in examples:
-        title = str(example.get("title", "") or "")
-        filename = str(example.get("filename", "") or "")
-        category = str(example.get("category", "") or "")
-        code = str(example.get("code", "") or "")
+    index = _build_index(get_gallery_loader())
+    candidates: Set[int] = set()
+    for token in query_tokens:
+        candidates.update(index.postings.get(token, ()))
+    # A query that is a substring of a title scores even without a whole-token match.
+    candidates.update(
+        position
+        for position, title_lower in enumerate(index.titles_lower)
+        if normalized_query in title_lower
+    )
 
-        score = _score_example(normalized_query, query_tokens, title, filename)
+    scored: List[RetrievedExample] = []
+    for position in sorted(candidates):
+        score = _score_example(
+            normalized_query,
+            query_tokens,
+            index.titles_lower[position],
+            index.title_tokens[position],
+            index.filename_tokens[position],
+        )
         if score <= 0:
             continue
 
-        sanitized_code = sanitize_gallery_code_for_prompt(code)
+        example = index.examples[position]
+        sanitized_code = index.sanitized_code[position]
+        if sanitized_code is None:
+            sanitized_code = sanitize_gallery_code_for_prompt(str(example.get("code", "") or ""))
+            index.sanitized_code[position] = sanitized_code
         if not sanitized_code:
             continue
 
         scored.append(
             RetrievedExample(
-                title=title,
-                filename=filename,
-                category=category,
+                title=str(example.get("title", "") or ""),
+                filename=str(example.get("filename", "") or ""),
+                category=str(example.get("category", "") or ""),
                 code=sanitized_code,
                 score=score,
             )
         )
 
-    scored.sort(key=lambda item: item.score, reverse=True)
-    return scored[: max(0, limit)]
+    # nlargest matches sorted(..., reverse=True)[:limit], including tie order.
+    return heapq.nlargest(max(0, limit), scored, key=lambda item: item.score)
 
 
 def sanitize_gallery_code_for_prompt(
@@ -120,38 +167,23 @@ def sanitize_gallery_code_for_prompt(
     if not code.strip():
         return ""
 
-    lines = code.splitlines()
     output: List[str] = []
-
-    in_docstring = False
     doc_delimiter: Optional[str] = None
 
-    for raw_line in lines:
-        line = raw_line.rstrip("\n")
+    for line in code.splitlines():
         stripped = line.strip()
 
-        if not in_docstring and (stripped.startswith('"""') or stripped.startswith("'''")):
-            doc_delimiter = stripped[:3]
-            if stripped.count(doc_delimiter) >= 2:
-                continue
-            in_docstring = True
-            continue
-
-        if in_docstring:
-            if doc_delimiter and doc_delimiter in stripped:
-                in_docstring = False
+        if doc_delimiter is not None:
+            if doc_delimiter in stripped:
                 doc_delimiter = None
             continue
-
-        if stripped.startswith("import ") or stripped.startswith("from "):
+        if stripped.startswith(_DOCSTRING_QUOTES):
+            if stripped.count(stripped[:3]) < 2:
+                doc_delimiter = stripped[:3]
             continue
-        if "plt.show(" in stripped or stripped == "plt.show()":
+        if stripped.startswith(_DROPPED_LINE_PREFIXES):
             continue
-        if "sphinx_gallery_thumbnail_number" in stripped:
-            continue
-        if stripped.startswith("# %%"):
-            continue
-        if stripped.startswith("# .."):
+        if "plt.show(" in stripped or "sphinx_gallery_thumbnail_number" in stripped:
             continue
 
         output.append(line)
@@ -168,22 +200,168 @@ def sanitize_gallery_code_for_prompt(
 
 
 def _tokenize(text: str) -> Set[str]:
-    tokens = {token for token in _TOKEN_PATTERN.findall(text.lower()) if token}
-    return {token for token in tokens if token not in _STOPWORDS and len(token) >= 2}
+    """Return non-stopword tokens of length >= 2; ``text`` must already be lowercase."""
+    return {
+        token
+        for token in _TOKEN_PATTERN.findall(text)
+        if len(token) >= 2 and token not in _STOPWORDS
+    }
+
+
+@functools.lru_cache(maxsize=1)
+def _build_index(loader: GalleryLoader) -> _GalleryIndex:
+    """Tokenize every example title/filename once per loader instance.
+
+    When the loader reads a gallery file, the derived fields (including every
+    sanitized snippet) are persisted next to it by a background thread and
+    reused by later processes until the file's mtime or size changes.
+    """
+    examples = tuple(loader.get_all_examples())
+    cache_path, cache_key = _index_cache_location(loader, len(examples))
+    if cache_path is not None:
+        persisted = _read_persisted_index(cache_path, cache_key)
+        if persisted is not None:
+            titles_lower, title_tokens, filename_tokens, sanitized_code = persisted
+            return _index_from_tokens(
+                examples,
+                tuple(titles_lower),
+                tuple(frozenset(tokens) for tokens in title_tokens),
+                tuple(frozenset(tokens) for tokens in filename_tokens),
+                sanitized_code,
+            )
+
+    index = _index_from_tokens(
+        examples,
+        tuple(str(example.get("title", "") or "").lower() for example in examples),
+        tuple(
+            frozenset(_tokenize(str(example.get("title", "") or "").lower()))
+            for example in examples
+        ),
+        tuple(
+            frozenset(_tokenize(str(example.get("filename", "") or "").lower()))
+            for example in examples
+        ),
+        [None] * len(examples),
+    )
+    if cache_path is not None:
+        # Sanitizing every snippet takes a while; requests keep filling theirs lazily.
+        threading.Thread(
+            target=_write_persisted_index,
+            args=(cache_path, cache_key, index),
+            name="gallery-index-persist",
+            daemon=True,
+        ).start()
+    return index
+
+
+def _index_from_tokens(
+    examples: Tuple[Dict[str, object], ...],
+    titles_lower: Tuple[str, ...],
+    title_tokens: Tuple[FrozenSet[str], ...],
+    filename_tokens: Tuple[FrozenSet[str], ...],
+    sanitized_code: List[Optional[str]],
+) -> _GalleryIndex:
+    postings: Dict[str, List[int]] = {}
+    for position, tokens in enumerate(zip(title_tokens, filename_tokens)):
+        for token in tokens[0] | tokens[1]:
+            postings.setdefault(token, []).append(position)
+    return _GalleryIndex(
+        examples=examples,
+        titles_lower=titles_lower,
+        title_tokens=title_tokens,
+        filename_tokens=filename_tokens,
+        postings={token: tuple(positions) for token, positions in postings.items()},
+        sanitized_code=sanitized_code,
+    )
+
+
+def _index_cache_location(
+    loader: GalleryLoader, example_count: int
+) -> Tuple[Optional[Path], List[int]]:
+    """Return where the loader's index is persisted and the key that validates it."""
+    gallery_file = getattr(loader, "gallery_file", None)
+    if not gallery_file or not os.path.isfile(gallery_file):
+        return None, []
+    cache_path = Path(gallery_file).with_name(_INDEX_CACHE_NAME)
+    if not os.access(cache_path.parent, os.W_OK):
+        return None, []
+    stat = os.stat(gallery_file)
+    return cache_path, [_INDEX_CACHE_VERSION, stat.st_mtime_ns, stat.st_size, example_count]
+
+
+def _read_persisted_index(cache_path: Path, cache_key: List[int]) -> Optional[Tuple[list, ...]]:
+    """Return the persisted fields, or None when the file is missing, stale or unusable."""
+    if not cache_path.is_file():
+        return None
+    try:
+        with open(cache_path, "rb") as handle:
+            payload = json.load(handle)
+    except (OSError, ValueError):
+        payload = None
+    if isinstance(payload, dict) and payload.get("key") == cache_key:
+        fields = tuple(payload.get(name) for name in _INDEX_FIELDS)
+        if _valid_index_fields(fields, cache_key[-1]):
+            return fields
+    elif isinstance(payload, dict) and isinstance(payload.get("key"), list):
+        # Written for another gallery file or version; the rebuild replaces it.
+        return None
+    _LOGGER.warning("gallery_index_unreadable path=%s", cache_path)
+    try:
+        cache_path.unlink()
+    except OSError:
+        pass
+    return None
+
+
+def _valid_index_fields(fields: Tuple[object, ...], example_count: int) -> bool:
+    titles_lower, title_tokens, filename_tokens, sanitized_code = fields
+    if not all(isinstance(field, list) and len(field) == example_count for field in fields):
+        return False
+    return (
+        all(isinstance(title, str) for title in titles_lower)
+        and all(
+            isinstance(tokens, list) and all(isinstance(token, str) for token in tokens)
+            for tokens in title_tokens + filename_tokens
+        )
+        and all(code is None or isinstance(code, str) for code in sanitized_code)
+    )
+
+
+def _write_persisted_index(cache_path: Path, cache_key: List[int], index: _GalleryIndex) -> None:
+    """Fill every snippet not yet sanitized, then save the index as plain JSON."""
+    for position, example in enumerate(index.examples):
+        if index.sanitized_code[position] is None:
+            index.sanitized_code[position] = sanitize_gallery_code_for_prompt(
+                str(example.get("code", "") or "")
+            )
+    payload = {
+        "key": cache_key,
+        "titles_lower": list(index.titles_lower),
+        "title_tokens": [sorted(tokens) for tokens in index.title_tokens],
+        "filename_tokens": [sorted(tokens) for tokens in index.filename_tokens],
+        "sanitized_code": list(index.sanitized_code),
+    }
+    # Write beside the target and rename, so readers never see a partial file.
+    temp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+    try:
+        with open(temp_path, "w", encoding="utf-8") as handle:
+            json.dump(payload, handle)
+        os.replace(temp_path, cache_path)
+    except OSError as exc:
+        _LOGGER.warning("gallery_index_write_failed path=%s error=%s", cache_path, exc)
+        try:
+            temp_path.unlink()
+        except OSError:
+            pass
 
 
 def _score_example(
     normalized_query: str,
     query_tokens: Set[str],
-    title: str,
-    filename: str,
+    title_lower: str,
+    title_tokens: FrozenSet[str],
+    filename_tokens: FrozenSet[str],
 ) -> float:
-    title_lower = title.lower()
-    filename_lower = filename.lower()
-
-    title_tokens = _tokenize(title_lower)
-    filename_tokens = _tokenize(filename_lower)
-
     overlap_title = len(query_tokens & title_tokens)
     overlap_filename = len(query_tokens & filename_tokens)
 
@@ -200,4 +378,3 @@ def _score_example(
         score += 2.0
 
     return score
-
@@ -6,47 +6,99 @@ Handles URL analysis, example extraction, and intelligent plot suggestions
 import requests
 from bs4 import BeautifulSoup
 import re
-from typing import Dict, Optional
+import threading
+import time
+from importlib.util import find_spec
+from typing import Callable, Dict, List, Optional, Tuple
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# selectolax's lexbor backend is a C HTML parser far faster than html.parser
+if find_spec("selectolax") is not None and find_spec("selectolax.lexbor") is not None:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+else:
+    HTMLParser = None
+
+# BeautifulSoup fallback uses the C-based lxml parser when it is installed
+_SOUP_PARSER = "lxml" if find_spec("lxml") is not None else "html.parser"
+
+# (connect, read) timeouts in seconds for URL analysis fetches
+_HTTP_TIMEOUT = (3, 10)
+
+_URL_PATTERN = re.compile(r'https?://[^\s]+')
+# GitHub repositories and Matplotlib gallery pages, recognised in a single scan
+_KNOWN_URL_PATTERN = re.compile(
+    r'github\.com/(?P<gh_owner>[^/]+)/(?P<gh_repo>[^/]+)'
+    r'|matplotlib\.org/stable/gallery/(?P<mpl_category>[^/]+)/(?P<mpl_example>[^.]+)\.html'
+)
+_HELP_KEYWORDS = ('help', 'suggest', 'recommend', 'what should', 'how to', 'ideas', 'unsure', 'don\'t know')
+
+# Successful analysis results are reused for this long and for at most this many URLs
+_URL_CACHE_TTL_SECONDS = 600
+_URL_CACHE_MAX_ENTRIES = 256
 
 class IntelligentAssistant:
     def __init__(self):
-        self.github_pattern = re.compile(r'github\.com/([^/]+)/([^/]+)')
-        self.matplotlib_gallery_pattern = re.compile(r'matplotlib\.org/stable/gallery/([^/]+)/([^.]+)\.html')
+        # One keep-alive pool for all URL analysis requests
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=8,
+            max_retries=Retry(total=2, backoff_factor=0.3),
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._url_cache: Dict[str, Tuple[float, Dict]] = {}
+        # Conditional-request validators and the parsed body they describe, per URL
+        self._http_cache: Dict[str, Tuple[Dict[str, str], object]] = {}
+        # analyze_url runs in worker threads; guards both caches (never held while fetching)
+        self._cache_lock = threading.Lock()
     
     def analyze_url(self, url: str) -> Dict:
-        """Analyze a URL and extract plot information"""
+        """Analyze a URL and extract plot information, reusing recent results"""
+        
+        now = time.monotonic()
+        with self._cache_lock:
+            cached = self._url_cache.get(url)
+        if cached is not None and now - cached[0] < _URL_CACHE_TTL_SECONDS:
+            return dict(cached[1])
+        
+        result, fetched = self._analyze_url_uncached(url)
+        if not fetched:
+            # A failed fetch may be transient, so the next request tries again
+            return dict(result)
+        with self._cache_lock:
+            self._url_cache.pop(url, None)
+            if len(self._url_cache) >= _URL_CACHE_MAX_ENTRIES:
+                # Dicts keep insertion order, so the first key is the oldest entry
+                del self._url_cache[next(iter(self._url_cache))]
+            self._url_cache[url] = (now, result)
+        return dict(result)
+    
+    def _analyze_url_uncached(self, url: str) -> Tuple[Dict, bool]:
+        """Return the analysis and whether it may be cached (False when a fetch failed)"""
+        
+        match = _KNOWN_URL_PATTERN.search(url)
         
         # Check if it's a GitHub repository
-        github_match = self.github_pattern.search(url)
-        if github_match:
-            return self._analyze_github_repo(url, github_match.group(1), github_match.group(2))
+        if match and match.group('gh_owner'):
+            return self._analyze_github_repo(url, match.group('gh_owner'), match.group('gh_repo'))
         
         # Check if it's a Matplotlib gallery example
-        mpl_match = self.matplotlib_gallery_pattern.search(url)
-        if mpl_match:
-            return self._analyze_matplotlib_example(url, mpl_match.group(1), mpl_match.group(2))
+        if match:
+            return self._analyze_matplotlib_example(url, match.group('mpl_category'), match.group('mpl_example')), True
         
         # Try generic URL analysis
         return self._analyze_generic_url(url)
     
-    def _analyze_github_repo(self, url: str, owner: str, repo: str) -> Dict:
+    def _analyze_github_repo(self, url: str, owner: str, repo: str) -> Tuple[Dict, bool]:
         """Analyze a GitHub repository for plotting examples"""
         
-        # Fetch README
-        readme_url = f"https://raw.githubusercontent.com/{owner}/{repo}/main/README.md"
-        response = requests.get(readme_url, timeout=10)
+        # Fetch README from the default branch; the HEAD ref resolves it in one request
+        readme_url = f"https://raw.githubusercontent.com/{owner}/{repo}/HEAD/README.md"
+        status_code, images = self._get_parsed(readme_url, _extract_readme_images)
         
-        if response.status_code != 200:
-            # Try master branch
-            readme_url = f"https://raw.githubusercontent.com/{owner}/{repo}/master/README.md"
-            response = requests.get(readme_url, timeout=10)
-        
-        if response.status_code == 200:
-            readme_content = response.text
-            
-            # Extract plot descriptions and images
-            images = re.findall(r'!\[([^\]]*)\]\(([^)]+)\)', readme_content)
-            
+        if status_code == 200:
             return {
                 "type": "github_repo",
                 "owner": owner,
@@ -54,7 +106,7 @@ class IntelligentAssistant:
                 "description": f"GitHub repository: {owner}/{repo}",
                 "images": images[:5],  # First 5 images
                 "suggestion": f"This appears to be a plotting library/tool. I can help you create similar visualizations. Please describe what specific plot type you'd like to create, or upload your data and I'll suggest appropriate visualizations."
-            }
+            }, True
         
         return {
             "type": "github_repo",
@@ -62,7 +114,7 @@ class IntelligentAssistant:
             "repo": repo,
             "description": f"GitHub repository: {owner}/{repo}",
             "suggestion": "I can help you create plots similar to this repository. Please describe the visualization you want or upload your data."
-        }
+        }, False
             
     
     def _analyze_matplotlib_example(self, url: str, category: str, example: str) -> Dict:
@@ -75,26 +127,48 @@ class IntelligentAssistant:
             "suggestion": f"This is a Matplotlib gallery example from the '{category}' category. I have this example in my knowledge base. Would you like me to adapt it to your data?"
         }
     
-    def _analyze_generic_url(self, url: str) -> Dict:
+    def _analyze_generic_url(self, url: str) -> Tuple[Dict, bool]:
         """Analyze a generic URL for plot information"""
         
-        response = requests.get(url, timeout=10)
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Extract images
-        images = soup.find_all('img')
-        image_urls = [img.get('src') for img in images[:5] if img.get('src')]
-        
-        # Extract title
-        title = soup.find('title')
-        title_text = title.get_text() if title else "Unknown"
+        status_code, (title_text, image_urls) = self._get_parsed(
+            url, lambda response: _extract_title_and_images(response.content)
+        )
         
         return {
             "type": "generic_url",
             "title": title_text,
             "images": image_urls,
             "suggestion": f"I found a page titled '{title_text}'. Please describe what kind of plot you'd like to create based on this example, and I'll help you build it with your data."
-        }
+        }, status_code == 200
+    
+    def _get_parsed(self, url: str, parse: Callable[[requests.Response], object]) -> Tuple[int, object]:
+        """GET a URL and parse it, revalidating earlier results with ETag/Last-Modified"""
+        
+        with self._cache_lock:
+            cached = self._http_cache.get(url)
+        headers = cached[0] if cached is not None else None
+        response = self.session.get(url, headers=headers, timeout=_HTTP_TIMEOUT)
+        
+        # 304 Not Modified carries no body; the parse from last time still holds
+        if response.status_code == 304 and cached is not None:
+            return 200, cached[1]
+        
+        parsed = parse(response)
+        validators = {}
+        etag = response.headers.get("ETag")
+        if etag:
+            validators["If-None-Match"] = etag
+        last_modified = response.headers.get("Last-Modified")
+        if last_modified:
+            validators["If-Modified-Since"] = last_modified
+        
+        if response.status_code == 200 and validators:
+            with self._cache_lock:
+                self._http_cache.pop(url, None)
+                if len(self._http_cache) >= _URL_CACHE_MAX_ENTRIES:
+                    del self._http_cache[next(iter(self._http_cache))]
+                self._http_cache[url] = (validators, parsed)
+        return response.status_code, parsed
     
     def generate_suggestion_prompt(self, user_message: str, data_analysis: Optional[Dict] = None) -> str:
         """Generate an intelligent suggestion prompt based on user message and data"""
@@ -102,8 +176,8 @@ class IntelligentAssistant:
         prompt = ""
         
         # Check if user is asking for help/suggestions
-        help_keywords = ['help', 'suggest', 'recommend', 'what should', 'how to', 'ideas', 'unsure', 'don\'t know']
-        is_asking_for_help = any(keyword in user_message.lower() for keyword in help_keywords)
+        lowered = user_message.lower()
+        is_asking_for_help = any(keyword in lowered for keyword in _HELP_KEYWORDS)
         
         if is_asking_for_help and data_analysis:
             prompt += f"""
@@ -122,8 +196,7 @@ Be conversational and helpful, not technical.
 """
         
         # Check if user provided a URL
-        url_pattern = re.compile(r'https?://[^\s]+')
-        urls = url_pattern.findall(user_message)
+        urls = _URL_PATTERN.findall(user_message)
         
         if urls:
             prompt += f"""
@@ -135,6 +208,27 @@ Offer to help adapt it to their data.
         
         return prompt
 
+def _extract_readme_images(response: requests.Response) -> List[Tuple[str, str]]:
+    """Return (alt text, source) pairs for the Markdown images of a README"""
+    if response.status_code != 200:
+        return []
+    return re.findall(r'!\[([^\]]*)\]\(([^)]+)\)', response.text)
+
+def _extract_title_and_images(content: bytes) -> Tuple[str, List[str]]:
+    """Return the page title and the sources of the first 5 <img> tags"""
+    if HTMLParser is not None:
+        tree = HTMLParser(content)
+        title_node = tree.css_first('title')
+        title_text = title_node.text() if title_node is not None else "Unknown"
+        sources = [img.attributes.get('src') for img in tree.css('img')[:5]]
+        return title_text, [src for src in sources if src]
+    
+    soup = BeautifulSoup(content, _SOUP_PARSER)
+    title = soup.find('title')
+    title_text = title.get_text() if title else "Unknown"
+    images = soup.find_all('img', limit=5)
+    return title_text, [img.get('src') for img in images if img.get('src')]
+
 # Global instance
 _assistant = None
 
@@ -2,10 +2,30 @@
 
 from __future__ import annotations
 
-from typing import Dict, List
+import functools
+from typing import Dict, List, Tuple
 
 import pandas as pd
 
+# Join-compatibility buckets; keys join only within the same bucket.
+_BUCKET_OTHER = -1
+_BUCKET_NUMERIC = 0
+_BUCKET_TEXT = 1
+_BUCKET_DATETIME = 2
+
+
+@functools.lru_cache(maxsize=64)
+def _dtype_bucket(dtype: str) -> int:
+    """Map a dtype name to its join-compatibility bucket."""
+    if dtype.startswith(("int", "float")) and not dtype.startswith("interval"):
+        return _BUCKET_NUMERIC
+    # pandas >= 3 infers text columns as "str" rather than "object".
+    if dtype in ("object", "str", "string"):
+        return _BUCKET_TEXT
+    if "datetime" in dtype:
+        return _BUCKET_DATETIME
+    return _BUCKET_OTHER
+
 
 class JoinAssistant:
     """Analyze datasets for potential join keys and warnings."""
@@ -14,18 +34,30 @@ class JoinAssistant:
         """Return join suggestions based on shared columns and uniqueness."""
         aliases = list(dataframes.keys())
         suggestions: List[Dict[str, object]] = []
+        # A column shared with several datasets is profiled only once.
+        stats_cache: Dict[Tuple[str, str], Dict[str, object]] = {}
+
+        def stats_for(alias: str, column: str) -> Dict[str, object]:
+            key = (alias, column)
+            stats = stats_cache.get(key)
+            if stats is None:
+                stats = self._column_stats(dataframes[alias], column)
+                stats_cache[key] = stats
+            return stats
+
+        column_sets = {alias: frozenset(df.columns) for alias, df in dataframes.items()}
 
         for i, left_alias in enumerate(aliases):
+            left_columns = column_sets[left_alias]
             for right_alias in aliases[i + 1 :]:
-                left_df = dataframes[left_alias]
-                right_df = dataframes[right_alias]
-                shared = self._shared_columns(left_df, right_df)
-                if not shared:
+                common = left_columns & column_sets[right_alias]
+                if not common:
                     continue
+                shared = sorted(common)
 
                 for column in shared:
-                    left_stats = self._column_stats(left_df, column)
-                    right_stats = self._column_stats(right_df, column)
+                    left_stats = stats_for(left_alias, column)
+                    right_stats = stats_for(right_alias, column)
                     if not self._compatible_types(left_stats["dtype"], right_stats["dtype"]):
                         continue
 
@@ -67,36 +99,27 @@ class JoinAssistant:
             "dataset_count": len(aliases),
         }
 
-    def _shared_columns(self, left_df: pd.DataFrame, right_df: pd.DataFrame) -> List[str]:
-        left_cols = set(left_df.columns)
-        right_cols = set(right_df.columns)
-        return sorted(left_cols.intersection(right_cols))
-
     def _column_stats(self, df: pd.DataFrame, column: str) -> Dict[str, object]:
         series = df[column]
         total = len(series)
+        if not total:
+            return {
+                "dtype": str(series.dtype),
+                "rows": 0,
+                "unique": 0,
+                "uniqueness": 0,
+                "null_ratio": 0,
+            }
+        null_count = int(series.isna().to_numpy().sum())
         unique = series.nunique(dropna=True)
-        uniqueness = unique / total if total else 0
-        null_ratio = series.isnull().mean() if total else 0
         return {
             "dtype": str(series.dtype),
             "rows": total,
             "unique": unique,
-            "uniqueness": uniqueness,
-            "null_ratio": null_ratio,
+            "uniqueness": unique / total,
+            "null_ratio": null_count / total,
         }
 
     def _compatible_types(self, left_dtype: str, right_dtype: str) -> bool:
-        if left_dtype.startswith("int") and right_dtype.startswith("int"):
-            return True
-        if left_dtype.startswith("float") and right_dtype.startswith("float"):
-            return True
-        if left_dtype.startswith("int") and right_dtype.startswith("float"):
-            return True
-        if left_dtype.startswith("float") and right_dtype.startswith("int"):
-            return True
-        if left_dtype == "object" and right_dtype == "object":
-            return True
-        if "datetime" in left_dtype and "datetime" in right_dtype:
-            return True
-        return False
+        left_bucket = _dtype_bucket(left_dtype)
+        return left_bucket != _BUCKET_OTHER and left_bucket == _dtype_bucket(right_dtype)
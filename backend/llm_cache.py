@@ -0,0 +1,273 @@
+"""Response cache for deterministic LLM calls."""
+
+from __future__ import annotations
+
+import atexit
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from importlib.util import find_spec
+from typing import Callable, Dict, List, Optional, Protocol, Tuple
+
+import numpy as np
+
+_SEMANTIC_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+# Minimum time between rewrites of a persisted semantic cache; pending entries
+# are also written at exit.
+_SEMANTIC_SAVE_INTERVAL_SECONDS = 30.0
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class CacheBackend(Protocol):
+    """Storage used by ``LLMCache``; values are ``(stored_at, response_text)``."""
+
+    def get(self, key: str) -> Optional[Tuple[float, str]]:
+        ...
+
+    def set(self, key: str, value: Tuple[float, str]) -> None:
+        ...
+
+    def delete(self, key: str) -> None:
+        ...
+
+    def clear(self) -> None:
+        ...
+
+
+class MemoryBackend:
+    """In-process LRU storage."""
+
+    def __init__(self, maxsize: int = 512) -> None:
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Tuple[float, str]]:
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Tuple[float, str]) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class LLMCache:
+    """Map a provider request to its response text, with expiry and hit counts."""
+
+    def __init__(self, backend: CacheBackend, ttl_seconds: float = 3600.0) -> None:
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def cache_key(
+        provider_name: str,
+        model_name: str,
+        prompt: str,
+        system_instruction: Optional[str],
+        temperature: float,
+    ) -> str:
+        payload = {
+            "provider": provider_name,
+            "model": model_name,
+            "prompt": prompt,
+            "system": system_instruction,
+            "temperature": temperature,
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self.backend.get(key)
+        if entry is not None and time.monotonic() - entry[0] < self.ttl_seconds:
+            self.hits += 1
+            return entry[1]
+        if entry is not None:
+            self.backend.delete(key)
+        self.misses += 1
+        return None
+
+    def set(self, key: str, response_text: str) -> None:
+        self.backend.set(key, (time.monotonic(), response_text))
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    @property
+    def stats(self) -> Dict[str, object]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0,
+        }
+
+
+class SemanticCache:
+    """Reuse results for paraphrased queries whose embeddings are near-identical.
+
+    Entries only match within the same ``scope`` (a fingerprint of everything
+    besides the query wording that shapes the answer). Embeddings are unit
+    vectors, so a matrix-vector product gives every cosine similarity at once.
+    Lookups and adds come from worker threads, so the entries are guarded by a
+    lock; queries are embedded outside it.
+    """
+
+    def __init__(
+        self,
+        embed: Callable[[str], np.ndarray],
+        threshold: float = 0.92,
+        maxsize: int = 512,
+        path: Optional[str] = None,
+    ) -> None:
+        self.embed = embed
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._vectors: Optional[np.ndarray] = None
+        self._scopes: List[str] = []
+        self._results: List[Dict[str, object]] = []
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        self._lock = threading.Lock()
+        if path:
+            self._load()
+            atexit.register(self.flush)
+
+    def _load(self) -> None:
+        if not os.path.isfile(self.path):
+            return
+        try:
+            with open(self.path, "rb") as handle:
+                vectors, scopes, results = pickle.load(handle)
+        except (
+            OSError,
+            pickle.UnpicklingError,
+            EOFError,
+            AttributeError,
+            ImportError,
+            ValueError,
+            TypeError,
+        ):
+            # A corrupt or foreign file only costs the cached entries.
+            _LOGGER.warning("semantic_cache_unreadable path=%s", self.path)
+            return
+        if isinstance(vectors, np.ndarray) and len(vectors) == len(scopes) == len(results):
+            self._vectors, self._scopes, self._results = vectors, list(scopes), list(results)
+
+    @staticmethod
+    def scope_key(*parts: object) -> str:
+        encoded = json.dumps(parts, sort_keys=True, default=str).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _unit_vector(self, query: str) -> np.ndarray:
+        vector = np.asarray(self.embed(" ".join(query.lower().split())), dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+    def lookup(self, query: str, scope: str) -> Optional[Dict[str, object]]:
+        with self._lock:
+            if self._vectors is None or scope not in self._scopes:
+                self.misses += 1
+                return None
+        unit = self._unit_vector(query)
+        with self._lock:
+            # Entries may have been trimmed or cleared while the query was embedded.
+            if self._vectors is None:
+                self.misses += 1
+                return None
+            similarities = np.where(np.asarray(self._scopes) == scope, self._vectors @ unit, -1.0)
+            best_index = int(np.argmax(similarities))
+            if similarities[best_index] < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return dict(self._results[best_index])
+
+    def add(self, query: str, scope: str, result: Dict[str, object]) -> None:
+        vector = self._unit_vector(query)[np.newaxis, :]
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = vector
+            else:
+                # Keep the newest maxsize - 1 entries (none when maxsize is 1).
+                start = max(len(self._results) - (self.maxsize - 1), 0)
+                self._vectors = np.vstack([self._vectors[start:], vector])
+                self._scopes = self._scopes[start:]
+                self._results = self._results[start:]
+            self._scopes.append(scope)
+            self._results.append(dict(result))
+            if self.path:
+                self._dirty = True
+                if time.monotonic() - self._saved_at >= _SEMANTIC_SAVE_INTERVAL_SECONDS:
+                    self._save()
+
+    def flush(self) -> None:
+        """Write pending entries to ``path``."""
+        with self._lock:
+            if self.path and self._dirty:
+                self._save()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._vectors = None
+            self._scopes = []
+            self._results = []
+            self._dirty = False
+            if self.path and os.path.isfile(self.path):
+                os.remove(self.path)
+
+    def _save(self) -> None:
+        # Called with the lock held. Write beside the target and rename, so readers never see a partial file.
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, "wb") as handle:
+                pickle.dump((self._vectors, self._scopes, self._results), handle, protocol=5)
+            os.replace(temp_path, self.path)
+        except OSError as exc:
+            _LOGGER.warning("semantic_cache_write_failed path=%s error=%s", self.path, exc)
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return
+        self._dirty = False
+        self._saved_at = time.monotonic()
+
+    @property
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._results)}
+
+
+def build_semantic_cache() -> Optional[SemanticCache]:
+    """Return a semantic cache when enabled via PLOT_LLM_SEMANTIC_CACHE and installable."""
+    mode = os.getenv("PLOT_LLM_SEMANTIC_CACHE", "off").strip().lower()
+    if mode in {"off", "0", "false", "disabled"} or find_spec("sentence_transformers") is None:
+        return None
+    # Importing sentence_transformers pulls in torch, so only pay for it when enabled.
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(os.getenv("PLOT_LLM_SEMANTIC_MODEL", _SEMANTIC_MODEL))
+    return SemanticCache(
+        embed=model.encode,
+        threshold=float(os.getenv("PLOT_LLM_SEMANTIC_THRESHOLD", "0.92")),
+        path=os.getenv("PLOT_LLM_SEMANTIC_CACHE_PATH") or None,
+    )
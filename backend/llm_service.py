@@ -2,18 +2,375 @@
 
 from __future__ import annotations
 
+import ast
+import asyncio
+import copy
+import functools
+import hashlib
 import json
 import logging
 import os
+import random
+import re
+import weakref
 from abc import ABC, abstractmethod
 from importlib.util import find_spec
-from typing import Dict, List, Optional
+from json.encoder import encode_basestring_ascii
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
 
 import requests
+from requests.adapters import HTTPAdapter
 
-from gallery_loader import get_gallery_prompt
+if find_spec("httpx") is not None:
+    import httpx
+else:
+    httpx = None
+
+from app_logger import setup_app_logger
+from gallery_loader import get_gallery_loader, get_gallery_prompt
+from llm_cache import LLMCache, MemoryBackend, build_semantic_cache
 from gallery_rag import gallery_rag_enabled, retrieve_gallery_examples
 
+# HTTP/2 needs the optional h2 package; TLS endpoints then multiplex concurrent requests.
+_HTTP2_AVAILABLE = find_spec("h2") is not None
+
+# "example: <title>" (also "based on this example:" / "apply example:") in a
+# lowercased query; the title runs to the next period or repeated phrase.
+_EXAMPLE_REQUEST_PATTERN = re.compile(r"example:((?:(?!example:)[^.])*)")
+
+# Substring gates for _needs_clarification; like the old any(... in ...) checks
+# they also match inside longer words ("plotting", "scatterplot").
+_PLOT_KEYWORD_PATTERN = re.compile(
+    "|".join(
+        [
+            "plot",
+            "scatter",
+            "line",
+            "bar",
+            "hist",
+            "box",
+            "heatmap",
+            "violin",
+            "density",
+            "curve",
+            "trend",
+            "time series",
+            "wave",
+            "sine",
+            "cos",
+            "square",
+            "sawtooth",
+        ]
+    )
+)
+_JOIN_KEYWORD_PATTERN = re.compile("join|merge|combine")
+
+# Tweaks to existing code ("change the title", "move the legend") that need no
+# gallery overview in the prompt.
+_SMALL_EDIT_PATTERN = re.compile(r"\b(?:change|move|rename|rotate|colou?r|label|title|legend)")
+
+# Small edits to code at least this long ask for a unified diff instead of the
+# whole script, so the reply is a few lines rather than a full rewrite.
+_DIFF_EDIT_MIN_CODE_CHARS = 2048
+_DIFF_EDIT_INSTRUCTIONS = (
+    "\n### Reply Format\n"
+    "The current code is long. Reply with ONLY a unified diff against it in a ```diff``` block: "
+    "hunks starting with @@, unchanged context lines prefixed with a space, removed lines with "
+    "'-' and added lines with '+'.\n"
+)
+
+_GREETINGS = frozenset({"hi", "hello", "hey"})
+
+# Replies that answer the assistant's previous question rather than start a new request.
+_SHORT_REPLIES = frozenset(
+    {
+        "2d",
+        "3d",
+        "2-d",
+        "3-d",
+        "yes",
+        "no",
+        "ok",
+        "okay",
+        "sure",
+        "line",
+        "scatter",
+        "bar",
+        "hist",
+        "histogram",
+    }
+)
+
+# Bare greetings and thanks get a fixed reply without prompting the model.
+_CANNED_REPLIES = {
+    "hi": "Hello! What would you like to plot?",
+    "hello": "Hello! What would you like to plot?",
+    "hey": "Hey! What would you like to plot?",
+    "thanks": "You're welcome! Let me know if you'd like to adjust the plot.",
+    "thank you": "You're welcome! Let me know if you'd like to adjust the plot.",
+}
+
+# "change the title to X" style requests, answered by rewriting the one matching
+# call in the current code. Each entry maps a phrasing to the call names it edits.
+# Unquoted values stop short of "and"/"then" and punctuation, so compound
+# requests ("change the title to X and make it bold") still go to the model.
+_EDIT_VALUE = (
+    r"""\s+to\s+(?:"(?P<double>[^"]+)"|'(?P<single>[^']+)'"""
+    r"|(?P<bare>(?:(?!\s(?:and|then)\s)[^?,;])+?))\.?\s*"
+)
+_EDIT_PREFIX = r"(?:please\s+)?(?:change|set|rename|update)\s+(?:the\s+)?"
+_LOCAL_LABEL_EDITS = (
+    (
+        re.compile(_EDIT_PREFIX + r"(?:plot\s+|figure\s+)?title" + _EDIT_VALUE, re.I),
+        frozenset({"title", "set_title"}),
+    ),
+    (
+        re.compile(_EDIT_PREFIX + r"(?:x[- ]?axis\s+(?:label|title)|x[- ]?label)" + _EDIT_VALUE, re.I),
+        frozenset({"xlabel", "set_xlabel"}),
+    ),
+    (
+        re.compile(_EDIT_PREFIX + r"(?:y[- ]?axis\s+(?:label|title)|y[- ]?label)" + _EDIT_VALUE, re.I),
+        frozenset({"ylabel", "set_ylabel"}),
+    ),
+)
+_LOCAL_LEGEND_EDIT = re.compile(
+    r"(?:please\s+)?(?:move|put|place)\s+(?:the\s+)?legend\s+(?:to\s+)?(?:the\s+)?"
+    r"(?P<loc>best|(?:upper|lower)\s+(?:left|right|center)|center(?:\s+(?:left|right))?|right)"
+    r"(?:\s+corner)?\.?\s*",
+    re.I,
+)
+
+
+def _source_offset(line_starts: List[int], lines: List[str], lineno: int, col: int) -> int:
+    # ast column offsets count UTF-8 bytes, not characters.
+    line = lines[lineno - 1]
+    return line_starts[lineno - 1] + len(line.encode("utf-8")[:col].decode("utf-8"))
+
+
+def _rewrite_single_call(
+    code: str, names: frozenset, rewrite: Callable[[ast.Call], Optional[Tuple[ast.AST, str]]]
+) -> Optional[str]:
+    """Replace part of the only call to one of ``names`` in ``code``.
+
+    ``rewrite`` returns the node to replace and its new source. Code with zero
+    or several such calls (subplots) is left to the model, as is anything
+    that does not parse.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+    calls = [
+        node
+        for node in ast.walk(tree)
+        if isinstance(node, ast.Call)
+        and (
+            node.func.attr if isinstance(node.func, ast.Attribute) else getattr(node.func, "id", None)
+        )
+        in names
+    ]
+    if len(calls) != 1:
+        return None
+    target = rewrite(calls[0])
+    if target is None:
+        return None
+    node, text = target
+
+    lines = code.splitlines(keepends=True)
+    line_starts = [0]
+    for line in lines:
+        line_starts.append(line_starts[-1] + len(line))
+    start = _source_offset(line_starts, lines, node.lineno, node.col_offset)
+    end = _source_offset(line_starts, lines, node.end_lineno, node.end_col_offset)
+    return code[:start] + text + code[end:]
+
+
+def _apply_unified_diff(code: str, reply: str) -> Optional[str]:
+    """Apply the ```diff block in ``reply`` to ``code`` by matching hunk context.
+
+    Hunk line numbers are ignored since models often get them wrong. Returns
+    None when there is no diff, a hunk's context is not found, or the result
+    does not parse.
+    """
+    start = reply.find("```diff")
+    if start == -1:
+        return None
+    end = reply.find("```", start + 7)
+    diff_lines = reply[start + 7 : end if end != -1 else len(reply)].strip("\n").split("\n")
+
+    hunks: List[List[str]] = []
+    for line in diff_lines:
+        if line.startswith("@@"):
+            hunks.append([])
+        elif hunks and not line.startswith(("---", "+++")):
+            hunks[-1].append(line)
+    if not hunks:
+        return None
+
+    lines = code.split("\n")
+    cursor = 0
+    for hunk in hunks:
+        # Blank context lines often lose their leading space.
+        old = [line[1:] for line in hunk if line[:1] in (" ", "-", "")]
+        new = [line[1:] for line in hunk if line[:1] in (" ", "+", "")]
+        width = len(old)
+        position = next(
+            (index for index in range(cursor, len(lines) - width + 1) if lines[index : index + width] == old),
+            None,
+        )
+        if not width or position is None:
+            return None
+        lines[position : position + width] = new
+        cursor = position + len(new)
+
+    patched = "\n".join(lines)
+    try:
+        ast.parse(patched)
+    except SyntaxError:
+        return None
+    return patched
+
+
+# First line of a generic ``` fence that is a bare language tag ("py", "python3"):
+# one token with no space, "(", "=" or "#", so it cannot be a line of code.
+_LANGUAGE_TAG_PATTERN = re.compile(r"[^\S\n]*[^\s(=#](?:[^ (=#\n]*[^\s(=#])?[^\S\n]*\n")
+
+_SYSTEM_INSTRUCTION = (
+    "You are a friendly data visualization expert using Python and Matplotlib.\n"
+    "Your goal is to assist the user in creating high-quality, publication-ready plots, "
+    "and to chat naturally.\n"
+    "Prefer generating runnable plot code over asking clarifying questions. "
+    "Only ask questions when you genuinely cannot proceed.\n"
+    "Default to 2D plots unless the user explicitly asks for 3D.\n"
+    "If the user requests multiple series/functions, plot all of them together with a legend.\n"
+    "If the user's latest message is a short reply (e.g., '2d', 'yes'), "
+    "treat it as an answer to the previous context in the conversation history and proceed.\n"
+    "If the user greets you, respond naturally without generating code.\n"
+    "If the user asks for a plot, output valid Python code inside markdown code blocks."
+)
+
+# Fixed "### Instructions" sections of the plot prompt; item 2 depends on the data provided.
+_BASE_INSTRUCTIONS = (
+    "\n### Instructions\n"
+    "1. Use 'matplotlib.pyplot' as 'plt'. Seaborn ('sns') is also available.\n"
+    "   Do NOT import modules; use the provided `plt`, `pd`, `np`, and `sns` objects.\n"
+    "   Do NOT load data from files; use the provided dataframes only."
+)
+_FILE_INSTRUCTIONS = (
+    "2. Multiple datasets are preloaded. Use `dfs['alias']` to access them.\n"
+    "   Each alias is also available as a variable (for example, `df_sales`).\n"
+    "   The variable `df` refers to the first selected file."
+)
+_SINGLE_DATA_INSTRUCTIONS = (
+    "2. Assume 'df' is already loaded with the data. "
+    "Use the columns provided in the 'Data Structure' section."
+)
+_NO_DATA_INSTRUCTIONS = (
+    "2. IMPORTANT: No data file has been provided. Do NOT use a variable named 'df'. "
+    "If the user's request requires data, ask them to upload a file. "
+    "If the request is for a general plot, generate synthetic data with numpy."
+)
+_STATIC_INSTRUCTIONS = (
+    "   If the user requests multiple series/functions, plot all of them together with a legend "
+    "(unless they explicitly ask for separate figures).\n"
+    """3. Publication Quality:
+    - Use a professional style (e.g., `plt.style.use('seaborn-v0_8-whitegrid')` or `sns.set_style()`).
+    - Ensure fonts are readable.
+    - Add clear titles, labels, and legends.
+    - Use high-contrast, colorblind-friendly colors where possible.
+4. Code Requirements:
+    - Generate ONLY the Python code inside markdown code blocks.
+    - Do NOT use `plt.show()`.
+    - Handle potential NaN values.
+    - When using categorical data for colors (e.g., `c=` in scatter), use `pd.Categorical(df['column']).codes`.
+5. Editing Existing Plots:
+    - When the user asks to change a specific element (title, xlabel, ylabel, legend, colors, etc.), modify ONLY that element.
+    - Keep all other aspects of the plot unchanged unless explicitly requested.
+    - If the user says "change the title to X", only modify `plt.title()` or `ax.set_title()`.
+    - If the user says "change the x-axis label to Y", only modify `plt.xlabel()` or `ax.set_xlabel()`.
+    - If the user says "change the y-axis label to Z", only modify `plt.ylabel()` or `ax.set_ylabel()`.
+    - If the user says "move legend to upper left", only modify the legend location parameter.
+    - Do NOT change the data being plotted unless explicitly asked.
+6. Matplotlib Capabilities:
+    - You can use ANY Matplotlib feature (subplots, 3D, animations, etc.) if appropriate.
+"""
+)
+
+
+@functools.lru_cache(maxsize=8)
+def _stable_system_prompt(
+    system_instruction: str, data_instructions: str, include_gallery: bool = True
+) -> str:
+    """Join everything that does not depend on the request into one reusable block.
+
+    Sent as the system message, this prefix stays byte-identical across
+    requests with the same kind of data (none, one file, several files), so
+    providers with prefix caching (OpenAI, Ollama's KV cache) reuse it.
+    """
+    parts = [system_instruction, _BASE_INSTRUCTIONS, data_instructions, _STATIC_INSTRUCTIONS]
+    if include_gallery:
+        parts.append(get_gallery_prompt())
+    return "\n".join(parts)
+
+
+# Distinct provider/key/model combinations kept alive by set_provider.
+_PROVIDER_CACHE_MAX_ENTRIES = 8
+
+# Responses sampled at or below this temperature are stable enough to reuse.
+_CACHEABLE_MAX_TEMPERATURE = 0.2
+
+# LLM_DRAFTS > 1 samples that many replies at once, each draft this much hotter.
+_MAX_DRAFTS = 3
+_DRAFT_TEMPERATURE_STEP = 0.2
+
+# Plot code rarely needs more; the cap bounds how long a rambling reply can run.
+_MAX_OUTPUT_TOKENS = 1024
+
+
+# Transient upstream failures are retried with jittered exponential backoff.
+_RETRYABLE_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504})
+_RETRY_ATTEMPTS = 4
+_RETRY_BASE_DELAY_SECONDS = 0.5
+_RETRY_MAX_DELAY_SECONDS = 8.0
+
+
+def _is_retryable(exc: Optional[BaseException]) -> bool:
+    """Return True for timeouts, dropped connections, rate limits and 5xx responses.
+
+    Provider errors are often wrapped (``RuntimeError(...) from exc``, SDK
+    error types), so the ``__cause__`` chain is inspected as well.
+    """
+    while exc is not None:
+        status = getattr(exc, "status_code", None)
+        if status is None:
+            status = getattr(getattr(exc, "response", None), "status_code", None)
+        if status is None:
+            # google.api_core errors carry the HTTP status as ``code``.
+            status = getattr(exc, "code", None)
+        if isinstance(status, int):
+            return status in _RETRYABLE_STATUS_CODES
+        if isinstance(
+            exc,
+            (TimeoutError, ConnectionError, requests.exceptions.ConnectionError, requests.exceptions.Timeout),
+        ):
+            return True
+        if httpx is not None and isinstance(exc, httpx.TransportError):
+            return True
+        exc = exc.__cause__
+    return False
+
+
+def _retry_after_seconds(exc: Optional[BaseException]) -> Optional[float]:
+    """Return the wait a rate-limited response asked for via ``Retry-After``, if any."""
+    while exc is not None:
+        headers = getattr(getattr(exc, "response", None), "headers", None)
+        value = headers.get("retry-after") if headers is not None else None
+        # HTTP-date values are rare from these APIs and fall back to backoff.
+        if value is not None and value.strip().replace(".", "", 1).isdigit():
+            return float(value)
+        exc = exc.__cause__
+    return None
+
 
 def _read_timeout_env(name: str, default: float) -> float:
     value = os.getenv(name, "").strip()
@@ -28,14 +385,146 @@ def _read_timeout_env(name: str, default: float) -> float:
     return parsed
 
 
+def _read_positive_int_env(name: str, default: int) -> int:
+    value = os.getenv(name, "").strip()
+    if not value.isdigit() or int(value) < 1:
+        return default
+    return int(value)
+
+
+# Full prompts and responses are only written with PLOT_LLM_LOG_PROMPTS=1.
+_LOGGER = setup_app_logger(
+    "llm_service",
+    "llm.log",
+    level=logging.DEBUG if os.getenv("PLOT_LLM_LOG_PROMPTS") == "1" else logging.INFO,
+)
+
+# Blocking Ollama calls share one keep-alive pool instead of reconnecting per request.
+_HTTP_SESSION = requests.Session()
+_HTTP_ADAPTER = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+_HTTP_SESSION.mount("https://", _HTTP_ADAPTER)
+_HTTP_SESSION.mount("http://", _HTTP_ADAPTER)
+
+# Per-provider request semaphores; like httpx pools they belong to one event loop.
+_REQUEST_SLOTS: "weakref.WeakKeyDictionary[LLMProvider, Tuple[asyncio.AbstractEventLoop, asyncio.Semaphore]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _request_slot(provider: LLMProvider) -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    entry = _REQUEST_SLOTS.get(provider)
+    if entry is None or entry[0] is not loop:
+        entry = (loop, asyncio.Semaphore(provider.max_concurrency))
+        _REQUEST_SLOTS[provider] = entry
+    return entry[1]
+
+
+# Every OpenAIProvider, whatever its key or model, shares these pools ("sync", "async").
+_OPENAI_HTTP_CLIENTS: Dict[str, object] = {}
+
+
+def _get_openai_http_client(kind: str) -> object:
+    client = _OPENAI_HTTP_CLIENTS.get(kind)
+    if client is None:
+        import openai
+
+        factory = openai.DefaultAsyncHttpxClient if kind == "async" else openai.DefaultHttpxClient
+        client = factory(http2=_HTTP2_AVAILABLE)
+        _OPENAI_HTTP_CLIENTS[kind] = client
+    return client
+
+
+# httpx pools are bound to the event loop that opened them, so Ollama keeps one
+# shared client per running loop.
+_ASYNC_HTTP_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _get_async_http_client() -> "httpx.AsyncClient":
+    loop = asyncio.get_running_loop()
+    client = _ASYNC_HTTP_CLIENTS.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(http2=_HTTP2_AVAILABLE)
+        _ASYNC_HTTP_CLIENTS[loop] = client
+    return client
+
+
+def format_catalog_entry(alias: str, filename: str, analysis: Dict[str, object]) -> str:
+    """Render one file's "### Selected Files" block for the plot prompt."""
+    return (
+        f"- {alias} (source: {filename})\n"
+        f"  Shape: {analysis.get('shape', 'unknown')}\n"
+        f"  Columns: {', '.join(analysis.get('columns', []))}\n"
+        f"  Numeric columns: {', '.join(analysis.get('numeric_cols', []))}\n"
+        f"  Categorical columns: {', '.join(analysis.get('categorical_cols', []))}"
+    )
+
+
+def _format_alias_map(alias_map: Dict[str, str]) -> str:
+    """Render ``json.dumps(alias_map, indent=2)`` without the pure-Python indent encoder."""
+    if not alias_map:
+        return "{}"
+    entries = ",\n".join(
+        f"  {encode_basestring_ascii(alias)}: {encode_basestring_ascii(filename)}"
+        for alias, filename in alias_map.items()
+    )
+    return f"{{\n{entries}\n}}"
+
+
 class LLMProvider(ABC):
     """Abstract interface for LLM providers."""
 
+    temperature: float = 0.2
+    # False when requests ignore ``temperature``, so hotter drafts would be duplicates.
+    honours_temperature: bool = True
+    model_name: str = ""
+    # Requests this provider may have in flight at once; the rest queue.
+    max_concurrency: int = 8
+    max_output_tokens: int = _MAX_OUTPUT_TOKENS
+
     @abstractmethod
     def generate(self, prompt: str, system_instruction: Optional[str] = None) -> str:
         """Generate a response for the given prompt."""
         raise NotImplementedError
 
+    async def agenerate(self, prompt: str, system_instruction: Optional[str] = None) -> str:
+        """Generate without blocking the event loop; defaults to a worker thread."""
+        return await asyncio.to_thread(self.generate, prompt, system_instruction)
+
+    async def astream(
+        self, prompt: str, system_instruction: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """Yield the response text as it is produced; defaults to a single chunk."""
+        yield await self.agenerate(prompt, system_instruction)
+
+    async def agenerate_n(
+        self, prompt: str, system_instruction: Optional[str] = None, n: int = 2
+    ) -> List[str]:
+        """Sample ``n`` drafts concurrently and return those that succeeded, in order.
+
+        Draft ``i`` runs on a shallow copy (sharing clients) sampled
+        ``i * _DRAFT_TEMPERATURE_STEP`` hotter. The first error is raised only
+        when every draft fails.
+        """
+        drafts = [self]
+        for index in range(1, n):
+            draft = copy.copy(self)
+            draft.temperature = self.temperature + index * _DRAFT_TEMPERATURE_STEP
+            drafts.append(draft)
+        results = await asyncio.gather(
+            *(draft.agenerate(prompt, system_instruction) for draft in drafts),
+            return_exceptions=True,
+        )
+        responses = [result for result in results if isinstance(result, str)]
+        if not responses:
+            raise results[0]
+        return responses
+
+    def activate(self) -> None:
+        """Restore any process-wide state when a cached provider is selected again."""
+
 
 class OllamaProvider(LLMProvider):
     """Ollama provider wrapper."""
@@ -47,25 +536,28 @@ class OllamaProvider(LLMProvider):
         timeout_seconds: float = 60.0,
         connect_timeout_seconds: float = 5.0,
     ) -> None:
-        self.model = model
+        self.model_name = model
         self.api_url = api_url
         self.timeout_seconds = timeout_seconds
         self.connect_timeout_seconds = connect_timeout_seconds
+        # Match the server's parallel slots so extra requests wait here, not in Ollama.
+        self.max_concurrency = _read_positive_int_env("OLLAMA_NUM_PARALLEL", 4)
+
+    def _payload(self, prompt: str, system_instruction: Optional[str], stream: bool) -> Dict[str, object]:
+        return {
+            "model": self.model_name,
+            "prompt": prompt,
+            # A separate system field lets Ollama reuse its cache for the fixed prefix.
+            "system": system_instruction or "",
+            "stream": stream,
+            "options": {"temperature": self.temperature, "num_predict": self.max_output_tokens},
+        }
 
     def generate(self, prompt: str, system_instruction: Optional[str] = None) -> str:
-        full_prompt = prompt
-        if system_instruction:
-            full_prompt = f"{system_instruction}\n\n{prompt}"
-
-        payload = {
-            "model": self.model,
-            "prompt": full_prompt,
-            "stream": False,
-            "options": {"temperature": 0.2, "num_predict": 2048},
-        }
+        payload = self._payload(prompt, system_instruction, stream=False)
 
         try:
-            response = requests.post(
+            response = _HTTP_SESSION.post(
                 self.api_url,
                 json=payload,
                 timeout=(self.connect_timeout_seconds, self.timeout_seconds),
@@ -75,10 +567,56 @@ class OllamaProvider(LLMProvider):
             raise RuntimeError(f"Ollama request failed: {exc}") from exc
         return response.json().get("response", "")
 
+    async def agenerate(self, prompt: str, system_instruction: Optional[str] = None) -> str:
+        if httpx is None:
+            return await super().agenerate(prompt, system_instruction)
+
+        payload = self._payload(prompt, system_instruction, stream=False)
+
+        try:
+            response = await _get_async_http_client().post(
+                self.api_url,
+                json=payload,
+                timeout=httpx.Timeout(self.timeout_seconds, connect=self.connect_timeout_seconds),
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as exc:
+            raise RuntimeError(f"Ollama request failed: {exc}") from exc
+        return response.json().get("response", "")
+
+    async def astream(
+        self, prompt: str, system_instruction: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        if httpx is None:
+            async for chunk in super().astream(prompt, system_instruction):
+                yield chunk
+            return
+
+        payload = self._payload(prompt, system_instruction, stream=True)
+
+        # Ollama streams one JSON object per line, each carrying the next piece of text.
+        try:
+            async with _get_async_http_client().stream(
+                "POST",
+                self.api_url,
+                json=payload,
+                timeout=httpx.Timeout(self.timeout_seconds, connect=self.connect_timeout_seconds),
+            ) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if line:
+                        yield json.loads(line).get("response", "")
+        except httpx.HTTPError as exc:
+            raise RuntimeError(f"Ollama request failed: {exc}") from exc
+
 
 class GeminiProvider(LLMProvider):
     """Google Gemini provider wrapper."""
 
+    # Requests leave sampling at the SDK default, so responses are not reused.
+    temperature = 1.0
+    honours_temperature = False
+
     def __init__(
         self, api_key: str, model: str = "gemini-1.5-flash", timeout_seconds: float = 60.0
     ) -> None:
@@ -86,90 +624,221 @@ class GeminiProvider(LLMProvider):
             raise ValueError("Gemini provider requires 'google-generativeai' to be installed")
         import google.generativeai as genai
 
+        self._genai = genai
+        self._api_key = api_key
         genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel(model)
+        self.model_name = model
+        # One model per system instruction, which Gemini takes at construction.
+        self._models: Dict[Optional[str], object] = {}
         self.timeout_seconds = timeout_seconds
 
+    def activate(self) -> None:
+        # The SDK key is global and models bind to it lazily, so re-apply ours.
+        self._genai.configure(api_key=self._api_key)
+
+    def _model_for(self, system_instruction: Optional[str]) -> object:
+        model = self._models.get(system_instruction)
+        if model is None:
+            model = self._genai.GenerativeModel(
+                self.model_name,
+                system_instruction=system_instruction or None,
+                generation_config={"max_output_tokens": self.max_output_tokens},
+            )
+            self._models[system_instruction] = model
+        return model
+
     def generate(self, prompt: str, system_instruction: Optional[str] = None) -> str:
-        full_prompt = prompt
-        if system_instruction:
-            full_prompt = f"{system_instruction}\n\n{prompt}"
+        model = self._model_for(system_instruction)
+
+        try:
+            response = model.generate_content(
+                prompt,
+                request_options={"timeout": self.timeout_seconds},
+            )
+        except TypeError:
+            response = model.generate_content(prompt)
+        return response.text
+
+    async def agenerate(self, prompt: str, system_instruction: Optional[str] = None) -> str:
+        model = self._model_for(system_instruction)
 
         try:
-            response = self.model.generate_content(
-                full_prompt,
+            response = await model.generate_content_async(
+                prompt,
                 request_options={"timeout": self.timeout_seconds},
             )
         except TypeError:
-            response = self.model.generate_content(full_prompt)
+            response = await model.generate_content_async(prompt)
         return response.text
 
+    async def astream(
+        self, prompt: str, system_instruction: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        model = self._model_for(system_instruction)
+
+        try:
+            response = await model.generate_content_async(
+                prompt,
+                stream=True,
+                request_options={"timeout": self.timeout_seconds},
+            )
+        except TypeError:
+            response = await model.generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            yield chunk.text
+
 
 class OpenAIProvider(LLMProvider):
     """OpenAI provider wrapper."""
 
+    max_concurrency = 16
+
     def __init__(
         self, api_key: str, model: str = "gpt-4o", timeout_seconds: float = 60.0
     ) -> None:
         if find_spec("openai") is None:
             raise ValueError("OpenAI provider requires the 'openai' package to be installed")
-        from openai import OpenAI
-
-        self.client = OpenAI(api_key=api_key, timeout=timeout_seconds)
-        self.model = model
+        from openai import AsyncOpenAI, OpenAI
+
+        # LLMService retries transient failures itself, so the SDK's own retries are off.
+        self.client = OpenAI(
+            api_key=api_key,
+            timeout=timeout_seconds,
+            max_retries=0,
+            http_client=_get_openai_http_client("sync"),
+        )
+        self.async_client = AsyncOpenAI(
+            api_key=api_key,
+            timeout=timeout_seconds,
+            max_retries=0,
+            http_client=_get_openai_http_client("async"),
+        )
+        self.model_name = model
 
-    def generate(self, prompt: str, system_instruction: Optional[str] = None) -> str:
+    def _messages(self, prompt: str, system_instruction: Optional[str]) -> List[Dict[str, str]]:
         messages = []
         if system_instruction:
             messages.append({"role": "system", "content": system_instruction})
         messages.append({"role": "user", "content": prompt})
+        return messages
 
+    def generate(self, prompt: str, system_instruction: Optional[str] = None) -> str:
         response = self.client.chat.completions.create(
-            model=self.model, messages=messages, temperature=0.2
+            model=self.model_name,
+            messages=self._messages(prompt, system_instruction),
+            temperature=self.temperature,
+            max_completion_tokens=self.max_output_tokens,
         )
         return response.choices[0].message.content
 
+    async def agenerate(self, prompt: str, system_instruction: Optional[str] = None) -> str:
+        response = await self.async_client.chat.completions.create(
+            model=self.model_name,
+            messages=self._messages(prompt, system_instruction),
+            temperature=self.temperature,
+            max_completion_tokens=self.max_output_tokens,
+        )
+        return response.choices[0].message.content
+
+    async def astream(
+        self, prompt: str, system_instruction: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        stream = await self.async_client.chat.completions.create(
+            model=self.model_name,
+            messages=self._messages(prompt, system_instruction),
+            temperature=self.temperature,
+            max_completion_tokens=self.max_output_tokens,
+            stream=True,
+        )
+        async for chunk in stream:
+            if chunk.choices:
+                yield chunk.choices[0].delta.content or ""
+
 
 class LLMService:
     """Service wrapper that prepares prompts and parses LLM output."""
 
     def __init__(self) -> None:
-        default_model = os.getenv("OLLAMA_MODEL", "llama3")
         self.timeout_seconds = _read_timeout_env("PLOT_LLM_TIMEOUT", 60.0)
         self.connect_timeout_seconds = _read_timeout_env("PLOT_LLM_CONNECT_TIMEOUT", 5.0)
-        self.provider: LLMProvider = OllamaProvider(
-            model=default_model,
-            timeout_seconds=self.timeout_seconds,
-            connect_timeout_seconds=self.connect_timeout_seconds,
-        )
-        self.system_instruction = self._construct_system_instruction()
-        self.logger = self._setup_logger()
+        # Providers keyed by (name, api key digest, model); reusing one keeps its HTTP pool warm.
+        self._provider_cache: Dict[Tuple[str, Optional[bytes], str], LLMProvider] = {}
+        # Provider whose process-wide state was applied last; see ``get_provider``.
+        self._active_provider: Optional[LLMProvider] = None
+        # Default for callers that do not pass a provider per request.
+        self.provider: LLMProvider
+        self.set_provider("ollama")
+        self.system_instruction = _SYSTEM_INSTRUCTION
+        self.logger = _LOGGER
+        self.cache = LLMCache(MemoryBackend(maxsize=512), ttl_seconds=3600)
+        self.semantic_cache = build_semantic_cache()
+        self.draft_count = min(_read_positive_int_env("LLM_DRAFTS", 1), _MAX_DRAFTS)
+        # Futures for cacheable requests currently being generated, by cache key.
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    def clear_caches(self) -> None:
+        """Drop every stored response, e.g. after a model was updated in place."""
+        self.cache.clear()
+        if self.semantic_cache is not None:
+            self.semantic_cache.clear()
 
     def set_provider(
         self, provider_name: str, api_key: Optional[str] = None, model_name: Optional[str] = None
     ) -> None:
-        if provider_name.lower() == "gemini":
+        """Select the default provider used when a query does not pass its own."""
+        self.provider = self.get_provider(provider_name, api_key, model_name)
+
+    @property
+    def model_name(self) -> str:
+        return self.provider.model_name
+
+    def get_provider(
+        self, provider_name: str, api_key: Optional[str] = None, model_name: Optional[str] = None
+    ) -> LLMProvider:
+        """Return the cached provider for these settings, building it on first use.
+
+        Nothing is stored on the service, so concurrent requests can each use
+        their own provider without switching it under one another.
+        """
+        name = provider_name.lower()
+        if name == "gemini":
             if not api_key:
                 raise ValueError("API Key required for Gemini")
-            self.provider = GeminiProvider(
-                api_key,
-                model=model_name or "gemini-1.5-flash",
-                timeout_seconds=self.timeout_seconds,
-            )
-        elif provider_name.lower() == "openai":
+            model = model_name or "gemini-1.5-flash"
+        elif name == "openai":
             if not api_key:
                 raise ValueError("API Key required for OpenAI")
-            self.provider = OpenAIProvider(
-                api_key, model=model_name or "gpt-4o", timeout_seconds=self.timeout_seconds
-            )
+            model = model_name or "gpt-4o"
         else:
-            default_model = os.getenv("OLLAMA_MODEL", "llama3")
-            self.provider = OllamaProvider(
-                model=model_name or default_model,
-                timeout_seconds=self.timeout_seconds,
-                connect_timeout_seconds=self.connect_timeout_seconds,
-            )
-        self.system_instruction = self._construct_system_instruction()
+            name = "ollama"
+            api_key = None
+            model = model_name or os.getenv("OLLAMA_MODEL", "llama3")
+
+        key_digest = hashlib.sha256(api_key.encode("utf-8")).digest() if api_key else None
+        cache_key = (name, key_digest, model)
+        provider = self._provider_cache.pop(cache_key, None)
+        if provider is None:
+            provider = self._build_provider(name, api_key, model)
+        elif provider is not self._active_provider:
+            # Most requests repeat the last settings; nothing to re-apply then.
+            provider.activate()
+        self._active_provider = provider
+        if len(self._provider_cache) >= _PROVIDER_CACHE_MAX_ENTRIES:
+            # Dicts keep insertion order, so the first key is the least recently selected
+            del self._provider_cache[next(iter(self._provider_cache))]
+        self._provider_cache[cache_key] = provider
+        return provider
+
+    def _build_provider(self, name: str, api_key: Optional[str], model: str) -> LLMProvider:
+        if name == "gemini":
+            return GeminiProvider(api_key, model=model, timeout_seconds=self.timeout_seconds)
+        if name == "openai":
+            return OpenAIProvider(api_key, model=model, timeout_seconds=self.timeout_seconds)
+        return OllamaProvider(
+            model=model,
+            timeout_seconds=self.timeout_seconds,
+            connect_timeout_seconds=self.connect_timeout_seconds,
+        )
 
     async def process_query(
         self,
@@ -180,13 +849,91 @@ class LLMService:
         data_analysis: Optional[Dict[str, object]] = None,
         url_analysis: Optional[Dict[str, object]] = None,
         file_catalog: Optional[List[Dict[str, object]]] = None,
+        provider: Optional[LLMProvider] = None,
     ) -> Dict[str, object]:
         """Process a user query with structured context."""
-        clarification = self._needs_clarification(query, file_catalog, history)
+        result: Dict[str, object] = {}
+        async for event in self.stream_query(
+            query,
+            context=context,
+            current_code=current_code,
+            history=history,
+            data_analysis=data_analysis,
+            url_analysis=url_analysis,
+            file_catalog=file_catalog,
+            provider=provider,
+        ):
+            if "type" in event:
+                result = event
+        return result
+
+    async def stream_query(
+        self,
+        query: str,
+        context: Optional[str] = None,
+        current_code: Optional[str] = None,
+        history: Optional[str] = None,
+        data_analysis: Optional[Dict[str, object]] = None,
+        url_analysis: Optional[Dict[str, object]] = None,
+        file_catalog: Optional[List[Dict[str, object]]] = None,
+        provider: Optional[LLMProvider] = None,
+    ) -> AsyncIterator[Dict[str, object]]:
+        """Process a query, yielding model text as it arrives.
+
+        Yields ``{"delta": text}`` events while the model writes and
+        ``{"reset": True}`` before a forced-code retry replaces that text.
+        The last event is the same result ``process_query`` returns.
+        ``provider`` defaults to the one chosen with ``set_provider``.
+        """
+        # Read once: the default may be switched by another request while this one awaits.
+        provider = provider or self.provider
+        # Lowercased once here and shared by the keyword and phrase checks below.
+        normalized_query = query.lower().strip()
+        canned_reply = _CANNED_REPLIES.get(normalized_query.rstrip("!."))
+        if canned_reply is not None:
+            yield {"type": "text", "text": canned_reply}
+            return
+
+        if current_code:
+            edited_code = self._try_local_edit(query, current_code)
+            if edited_code is not None:
+                yield {
+                    "type": "plot_code",
+                    "code": edited_code,
+                    "text": "I have updated the plot code for you.",
+                }
+                return
+
+        clarification = self._needs_clarification(normalized_query, file_catalog, history)
         if clarification:
-            return {"type": "clarify", "text": clarification}
+            yield {"type": "clarify", "text": clarification}
+            return
+
+        # Paraphrases of an earlier request over the same data reuse its result.
+        # Results tied to code being edited are never shared.
+        semantic_scope: Optional[str] = None
+        if (
+            self.semantic_cache is not None
+            and not current_code
+            and provider.temperature <= _CACHEABLE_MAX_TEMPERATURE
+        ):
+            semantic_scope = self.semantic_cache.scope_key(
+                type(provider).__name__,
+                provider.model_name,
+                self.system_instruction,
+                context,
+                history,
+                data_analysis,
+                url_analysis,
+                file_catalog,
+            )
+            cached = await asyncio.to_thread(self.semantic_cache.lookup, query, semantic_scope)
+            if cached is not None:
+                yield cached
+                return
 
-        prompt = self._construct_plot_prompt(
+        diff_edit = self._wants_diff_edit(normalized_query, current_code)
+        system_prompt, prompt = self._construct_plot_prompt(
             query,
             context=context,
             current_code=current_code,
@@ -194,27 +941,39 @@ class LLMService:
             data_analysis=data_analysis,
             url_analysis=url_analysis,
             file_catalog=file_catalog,
+            normalized_query=normalized_query,
         )
 
+        first_prompt = f"{prompt}{_DIFF_EDIT_INSTRUCTIONS}" if diff_edit else prompt
+        parts: List[str] = []
         try:
-            response_text = self.provider.generate(prompt, self.system_instruction)
+            async for delta in self._stream_generate(provider, first_prompt, system_prompt, parts):
+                yield {"delta": delta}
         except Exception as exc:
             self.logger.exception("llm_provider_error")
-            return {
+            yield {
                 "type": "text",
                 "text": (
                     "LLM request failed: "
                     f"{exc}. Check that your provider is running and configured."
                 ),
             }
-        self.logger.info("prompt=%s", prompt)
-        self.logger.info("response=%s", response_text)
-        code = self._extract_code(response_text)
+            return
+        response_text = "".join(parts)
+        self.logger.debug("prompt=%s", prompt)
+        self.logger.debug("response=%s", response_text)
+        if diff_edit:
+            # A failed patch falls through to the full-code retry below.
+            code = _apply_unified_diff(current_code, response_text)
+            if code is None and "```python" in response_text:
+                code = self._extract_code(response_text)
+        else:
+            code = self._extract_code(response_text)
 
         if (
             not code
             and self._should_force_code_retry(
-                query=query,
+                normalized_query=normalized_query,
                 response_text=response_text,
                 current_code=current_code,
                 history=history,
@@ -229,110 +988,186 @@ class LLMService:
                 "- Use reasonable defaults.\n"
                 "- If no data is provided, generate synthetic data with numpy.\n"
             )
+            yield {"reset": True}
+            parts = []
             try:
-                response_text = self.provider.generate(retry_prompt, self.system_instruction)
+                async for delta in self._stream_generate(provider, retry_prompt, system_prompt, parts):
+                    yield {"delta": delta}
             except Exception as exc:
                 self.logger.exception("llm_provider_error_retry")
-                return {
+                yield {
                     "type": "text",
                     "text": (
                         "LLM request failed: "
                         f"{exc}. Check that your provider is running and configured."
                     ),
                 }
-            self.logger.info("retry_response=%s", response_text)
+                return
+            response_text = "".join(parts)
+            self.logger.debug("retry_response=%s", response_text)
             code = self._extract_code(response_text)
 
         if code:
-            return {
+            result: Dict[str, object] = {
                 "type": "plot_code",
                 "code": code,
                 "text": "I have generated the plot code for you.",
             }
+        else:
+            result = {"type": "text", "text": response_text}
+
+        if semantic_scope is not None:
+            await asyncio.to_thread(self.semantic_cache.add, query, semantic_scope, result)
+        yield result
+
+    async def _stream_generate(
+        self, provider: LLMProvider, prompt: str, system_prompt: str, parts: List[str]
+    ) -> AsyncIterator[str]:
+        """Stream the provider's reply into ``parts`` and yield each piece.
+
+        A repeated low-temperature request replays its stored reply as one piece,
+        and identical ones arriving while it runs wait for it instead of calling
+        the provider again. With ``draft_count > 1`` the first draft containing
+        code is used; each draft holds its own request slot. Transient failures
+        before any text arrives are retried.
+        """
+        temperature = provider.temperature
+        key: Optional[str] = None
+        if temperature <= _CACHEABLE_MAX_TEMPERATURE:
+            key = self.cache.cache_key(
+                type(provider).__name__,
+                provider.model_name,
+                prompt,
+                system_prompt,
+                temperature=temperature,
+            )
+            cached = self.cache.get(key)
+            if cached is not None:
+                parts.append(cached)
+                yield cached
+                return
+            # Identical concurrent requests wait for the one already in flight.
+            while (in_flight := self._in_flight.get(key)) is not None:
+                shared = await asyncio.shield(in_flight)
+                if shared:
+                    parts.append(shared)
+                    yield shared
+                    return
+            self._in_flight[key] = asyncio.get_running_loop().create_future()
+
+        response_text: Optional[str] = None
+        try:
+            slot = _request_slot(provider)
+            async with slot:
+                # Drafts run concurrently, so each extra one takes a free slot of its own;
+                # when none are free the request goes ahead with fewer drafts.
+                extra_slots = 0
+                if provider.honours_temperature:
+                    while extra_slots < self.draft_count - 1 and not slot.locked():
+                        await slot.acquire()
+                        extra_slots += 1
+                try:
+                    async for piece in self._retrying_pieces(
+                        provider, prompt, system_prompt, draft_count=1 + extra_slots
+                    ):
+                        parts.append(piece)
+                        yield piece
+                finally:
+                    for _ in range(extra_slots):
+                        slot.release()
+            response_text = "".join(parts)
+        finally:
+            # Waiters get None on failure and then issue their own request.
+            if key is not None:
+                self._in_flight.pop(key).set_result(response_text or None)
+
+        if key is not None and response_text:
+            self.cache.set(key, response_text)
+
+    async def _retrying_pieces(
+        self, provider: LLMProvider, prompt: str, system_prompt: str, draft_count: int
+    ) -> AsyncIterator[str]:
+        for attempt in range(_RETRY_ATTEMPTS):
+            sent = False
+            try:
+                async for piece in self._provider_pieces(
+                    provider, prompt, system_prompt, draft_count=draft_count
+                ):
+                    sent = True
+                    yield piece
+                return
+            except Exception as exc:
+                # Text already sent to the caller cannot be taken back.
+                if sent or attempt == _RETRY_ATTEMPTS - 1 or not _is_retryable(exc):
+                    raise
+                delay = random.uniform(
+                    0, min(_RETRY_MAX_DELAY_SECONDS, _RETRY_BASE_DELAY_SECONDS * 2**attempt)
+                )
+                # Honour the provider's requested wait; give up if it is too long.
+                retry_after = _retry_after_seconds(exc)
+                if retry_after is not None:
+                    if retry_after > _RETRY_MAX_DELAY_SECONDS:
+                        raise
+                    delay = max(delay, retry_after)
+                self.logger.warning(
+                    "llm_provider_retry attempt=%d delay=%.2f error=%s", attempt + 1, delay, exc
+                )
+                await asyncio.sleep(delay)
+
+    async def _provider_pieces(
+        self, provider: LLMProvider, prompt: str, system_prompt: str, draft_count: int = 1
+    ) -> AsyncIterator[str]:
+        if draft_count > 1:
+            # Drafts finish together, so the chosen one arrives as a single piece.
+            drafts = await provider.agenerate_n(prompt, system_prompt, n=draft_count)
+            chosen = next((draft for draft in drafts if self._extract_code(draft)), drafts[0])
+            if chosen:
+                yield chosen
+            return
 
-        return {"type": "text", "text": response_text}
-
-    def _construct_system_instruction(self) -> str:
-        return (
-            "You are a friendly data visualization expert using Python and Matplotlib.\n"
-            "Your goal is to assist the user in creating high-quality, publication-ready plots, "
-            "and to chat naturally.\n"
-            "Prefer generating runnable plot code over asking clarifying questions. "
-            "Only ask questions when you genuinely cannot proceed.\n"
-            "Default to 2D plots unless the user explicitly asks for 3D.\n"
-            "If the user requests multiple series/functions, plot all of them together with a legend.\n"
-            "If the user's latest message is a short reply (e.g., '2d', 'yes'), "
-            "treat it as an answer to the previous context in the conversation history and proceed.\n"
-            "If the user greets you, respond naturally without generating code.\n"
-            "If the user asks for a plot, output valid Python code inside markdown code blocks."
-        )
-
-    def _setup_logger(self) -> logging.Logger:
-        log_dir = os.path.join("backend", "logs")
-        if not os.path.exists(log_dir):
-            os.makedirs(log_dir)
-        logger = logging.getLogger("llm_service")
-        if logger.handlers:
-            return logger
-        logger.setLevel(logging.INFO)
-        handler = logging.FileHandler(os.path.join(log_dir, "llm.log"))
-        formatter = logging.Formatter("%(asctime)s %(levelname)s %(message)s")
-        handler.setFormatter(formatter)
-        logger.addHandler(handler)
-        return logger
+        # Only the first ```python block is used, so stop reading once it closes
+        # rather than waiting for the closing remarks.
+        stream = provider.astream(prompt, system_prompt)
+        received = ""
+        try:
+            async for delta in stream:
+                if not delta:
+                    continue
+                received += delta
+                yield delta
+                code_start = received.find("```python")
+                if code_start != -1 and received.find("```", code_start + 9) != -1:
+                    break
+        finally:
+            await stream.aclose()
 
     def _needs_clarification(
         self,
-        query: str,
+        normalized: str,
         file_catalog: Optional[List[Dict[str, object]]],
         history: Optional[str],
     ) -> Optional[str]:
-        normalized = query.lower().strip()
+        """Return a clarifying question for the lowercased, stripped query, if one is needed."""
         if not normalized:
             return "What would you like to plot?"
 
         if self._is_followup_reply(normalized, history):
             return None
 
-        plot_keywords = {
-            "plot",
-            "scatter",
-            "line",
-            "bar",
-            "hist",
-            "histogram",
-            "box",
-            "boxplot",
-            "heatmap",
-            "violin",
-            "density",
-            "curve",
-            "trend",
-            "time series",
-            "wave",
-            "sine",
-            "cos",
-            "cosine",
-            "square",
-            "sawtooth",
-        }
-
-        if normalized in {"hi", "hello", "hey"} or normalized.startswith("hi "):
+        if normalized in _GREETINGS or normalized.startswith("hi "):
             return None
 
         if file_catalog and len(file_catalog) > 1:
-            aliases = [entry.get("alias", "") for entry in file_catalog]
-            filenames = [entry.get("filename", "") for entry in file_catalog]
-            mentions_alias = any(alias and alias in normalized for alias in aliases)
-            mentions_file = any(name and name.lower() in normalized for name in filenames)
-            mentions_join = any(token in normalized for token in ["join", "merge", "combine"])
-            if not mentions_alias and not mentions_file and not mentions_join:
+            names = [entry.get("alias", "") for entry in file_catalog]
+            names.extend(entry.get("filename", "").lower() for entry in file_catalog)
+            mentions_dataset = any(name and name in normalized for name in names)
+            if not mentions_dataset and _JOIN_KEYWORD_PATTERN.search(normalized) is None:
                 return (
                     "You selected multiple files. Which files should I use, and how should they be joined "
                     "(e.g., merge on a shared column or overlay as separate series)?"
                 )
 
-        if not any(keyword in normalized for keyword in plot_keywords):
+        if _PLOT_KEYWORD_PATTERN.search(normalized) is None:
             return "What kind of visualization would you like me to create?"
 
         return None
@@ -341,24 +1176,7 @@ class LLMService:
         if not history:
             return False
 
-        short_replies = {
-            "2d",
-            "3d",
-            "2-d",
-            "3-d",
-            "yes",
-            "no",
-            "ok",
-            "okay",
-            "sure",
-            "line",
-            "scatter",
-            "bar",
-            "hist",
-            "histogram",
-        }
-
-        if normalized in short_replies:
+        if normalized in _SHORT_REPLIES:
             return True
 
         if len(normalized) <= 6:
@@ -379,7 +1197,11 @@ class LLMService:
         data_analysis: Optional[Dict[str, object]] = None,
         url_analysis: Optional[Dict[str, object]] = None,
         file_catalog: Optional[List[Dict[str, object]]] = None,
-    ) -> str:
+        normalized_query: Optional[str] = None,
+    ) -> Tuple[str, str]:
+        """Return ``(system_prompt, prompt)``: the cacheable prefix and the per-request part."""
+        if normalized_query is None:
+            normalized_query = query.lower().strip()
         prompt_parts: List[str] = []
 
         prompt_parts.append("### Task")
@@ -398,21 +1220,11 @@ class LLMService:
 
         has_single_data = bool(data_analysis and data_analysis.get("columns"))
 
-        if any(
-            phrase in query.lower()
-            for phrase in ["example:", "based on this example:", "apply example:"]
-        ):
-            from gallery_loader import GalleryLoader
-
-            loader = GalleryLoader()
-            example_title = None
-            for phrase in ["example:", "based on this example:", "apply example:"]:
-                if phrase in query.lower():
-                    example_title = query.lower().split(phrase)[1].split(".")[0].strip()
-                    break
-
+        example_match = _EXAMPLE_REQUEST_PATTERN.search(normalized_query)
+        if example_match:
+            example_title = example_match.group(1).strip()
             if example_title:
-                examples = loader.search_examples(example_title, limit=1)
+                examples = get_gallery_loader().search_examples(example_title, limit=1)
                 if examples:
                     prompt_parts.append("\n### GALLERY EXAMPLE REQUEST:")
                     prompt_parts.append(
@@ -433,51 +1245,36 @@ class LLMService:
         if file_catalog:
             alias_map = {entry.get("alias", ""): entry.get("filename", "") for entry in file_catalog}
             prompt_parts.append("\n### Selected Files")
-            for entry in file_catalog:
-                alias = entry.get("alias", "")
-                filename = entry.get("filename", "")
-                analysis = entry.get("analysis", {})
-                prompt_parts.append(f"- {alias} (source: {filename})")
-                prompt_parts.append(
-                    f"  Shape: {analysis.get('shape', 'unknown')}"
-                )
-                prompt_parts.append(
-                    f"  Columns: {', '.join(analysis.get('columns', []))}"
-                )
-                prompt_parts.append(
-                    f"  Numeric columns: {', '.join(analysis.get('numeric_cols', []))}"
-                )
-                prompt_parts.append(
-                    "  Categorical columns: "
-                    f"{', '.join(analysis.get('categorical_cols', []))}"
+            # Catalog builders precompute each block as entry["summary"].
+            prompt_parts.extend(
+                entry.get("summary")
+                or format_catalog_entry(
+                    entry.get("alias", ""), entry.get("filename", ""), entry.get("analysis", {})
                 )
+                for entry in file_catalog
+            )
             prompt_parts.append("\n### Dataset Alias Map")
-            prompt_parts.append(json.dumps(alias_map, indent=2))
+            prompt_parts.append(_format_alias_map(alias_map))
 
         if has_single_data:
-            prompt_parts.append("\n### Data Structure")
-            prompt_parts.append(f"Shape: {data_analysis.get('shape', 'unknown')}")
-            prompt_parts.append(
-                f"Columns: {', '.join(data_analysis.get('columns', []))}"
-            )
-            prompt_parts.append(
-                f"Numeric columns: {', '.join(data_analysis.get('numeric_cols', []))}"
-            )
             prompt_parts.append(
+                "\n### Data Structure\n"
+                f"Shape: {data_analysis.get('shape', 'unknown')}\n"
+                f"Columns: {', '.join(data_analysis.get('columns', []))}\n"
+                f"Numeric columns: {', '.join(data_analysis.get('numeric_cols', []))}\n"
                 f"Categorical columns: {', '.join(data_analysis.get('categorical_cols', []))}"
             )
 
             if data_analysis.get("suggested_plots"):
                 prompt_parts.append("\n### Suggested Plot Types (based on data structure):")
-                for suggestion in data_analysis["suggested_plots"][:3]:
-                    prompt_parts.append(
-                        f"- {suggestion['type']}: {suggestion['reason']}"
-                    )
+                prompt_parts.extend(
+                    f"- {suggestion['type']}: {suggestion['reason']}"
+                    for suggestion in data_analysis["suggested_plots"][:3]
+                )
 
             if data_analysis.get("warnings"):
                 prompt_parts.append("\n### Data Warnings:")
-                for warning in data_analysis["warnings"]:
-                    prompt_parts.append(f"- {warning}")
+                prompt_parts.extend(f"- {warning}" for warning in data_analysis["warnings"])
 
         if url_analysis:
             prompt_parts.append("\n### User Provided Example")
@@ -499,89 +1296,64 @@ class LLMService:
         if history:
             prompt_parts.append(f"\n### Conversation History\n{history}\n")
 
-        self._append_gallery_rag(prompt_parts, query=query, history=history, current_code=current_code)
-
-        prompt_parts.append("\n### Instructions")
-        prompt_parts.append("1. Use 'matplotlib.pyplot' as 'plt'. Seaborn ('sns') is also available.")
-        prompt_parts.append("   Do NOT import modules; use the provided `plt`, `pd`, `np`, and `sns` objects.")
-        prompt_parts.append("   Do NOT load data from files; use the provided dataframes only.")
+        self._append_gallery_rag(
+            prompt_parts,
+            query=query,
+            normalized_query=normalized_query,
+            history=history,
+            current_code=current_code,
+            example_requested=example_match is not None,
+        )
 
         if file_catalog:
-            prompt_parts.append(
-                "2. Multiple datasets are preloaded. Use `dfs['alias']` to access them."
-            )
-            prompt_parts.append(
-                "   Each alias is also available as a variable (for example, `df_sales`)."
-            )
-            prompt_parts.append("   The variable `df` refers to the first selected file.")
+            data_instructions = _FILE_INSTRUCTIONS
         elif has_single_data:
-            prompt_parts.append(
-                "2. Assume 'df' is already loaded with the data. "
-                "Use the columns provided in the 'Data Structure' section."
-            )
+            data_instructions = _SINGLE_DATA_INSTRUCTIONS
         else:
-            prompt_parts.append(
-                "2. IMPORTANT: No data file has been provided. Do NOT use a variable named 'df'. "
-                "If the user's request requires data, ask them to upload a file. "
-                "If the request is for a general plot, generate synthetic data with numpy."
-            )
-
-        prompt_parts.append(
-            "   If the user requests multiple series/functions, plot all of them together with a legend "
-            "(unless they explicitly ask for separate figures)."
+            data_instructions = _NO_DATA_INSTRUCTIONS
+        small_edit = self._is_small_edit(normalized_query, current_code)
+        system_prompt = _stable_system_prompt(
+            self.system_instruction, data_instructions, include_gallery=not small_edit
         )
+        return system_prompt, "\n".join(prompt_parts)
 
-        prompt_parts.append(
-            """3. Publication Quality:
-    - Use a professional style (e.g., `plt.style.use('seaborn-v0_8-whitegrid')` or `sns.set_style()`).
-    - Ensure fonts are readable.
-    - Add clear titles, labels, and legends.
-    - Use high-contrast, colorblind-friendly colors where possible.
-4. Code Requirements:
-    - Generate ONLY the Python code inside markdown code blocks.
-    - Do NOT use `plt.show()`.
-    - Handle potential NaN values.
-    - When using categorical data for colors (e.g., `c=` in scatter), use `pd.Categorical(df['column']).codes`.
-5. Editing Existing Plots:
-    - When the user asks to change a specific element (title, xlabel, ylabel, legend, colors, etc.), modify ONLY that element.
-    - Keep all other aspects of the plot unchanged unless explicitly requested.
-    - If the user says "change the title to X", only modify `plt.title()` or `ax.set_title()`.
-    - If the user says "change the x-axis label to Y", only modify `plt.xlabel()` or `ax.set_xlabel()`.
-    - If the user says "change the y-axis label to Z", only modify `plt.ylabel()` or `ax.set_ylabel()`.
-    - If the user says "move legend to upper left", only modify the legend location parameter.
-    - Do NOT change the data being plotted unless explicitly asked.
-6. Matplotlib Capabilities:
-    - You can use ANY Matplotlib feature (subplots, 3D, animations, etc.) if appropriate.
-"""
-        )
+    def _is_small_edit(self, normalized_query: str, current_code: Optional[str]) -> bool:
+        return bool(current_code) and _SMALL_EDIT_PATTERN.search(normalized_query) is not None
 
-        prompt_parts.append(get_gallery_prompt())
-        return "\n".join(prompt_parts)
+    def _wants_diff_edit(self, normalized_query: str, current_code: Optional[str]) -> bool:
+        return (
+            current_code is not None
+            and len(current_code) >= _DIFF_EDIT_MIN_CODE_CHARS
+            and self._is_small_edit(normalized_query, current_code)
+        )
 
     def _append_gallery_rag(
         self,
         prompt_parts: List[str],
         query: str,
+        normalized_query: str,
         history: Optional[str],
         current_code: Optional[str],
+        example_requested: bool,
     ) -> None:
-        """Inject a small number of relevant Matplotlib gallery snippets (RAG)."""
-        if current_code:
+        """Inject a small number of relevant Matplotlib gallery snippets (RAG).
+
+        Skipped when the user named a gallery example ("example: <title>"),
+        which ``_EXAMPLE_REQUEST_PATTERN`` has already detected.
+        """
+        if current_code or example_requested:
             return
         if not gallery_rag_enabled():
             return
 
-        normalized_query = " ".join((query or "").strip().split())
-        if not normalized_query:
+        lowered_query = " ".join(normalized_query.split())
+        if not lowered_query:
             return
 
-        if self._is_explicit_gallery_request(normalized_query):
+        if not self._should_include_gallery_rag(lowered_query, history):
             return
 
-        if not self._should_include_gallery_rag(normalized_query, history):
-            return
-
-        retrieval_query = self._build_gallery_rag_query(normalized_query, history)
+        retrieval_query = self._build_gallery_rag_query(query, history)
         examples = retrieve_gallery_examples(retrieval_query, limit=3)
         if not examples:
             return
@@ -597,8 +1369,7 @@ class LLMService:
             prompt_parts.append(f"\n#### {title} ({descriptor})")
             prompt_parts.append(f"```python\n{example.code}\n```")
 
-    def _should_include_gallery_rag(self, query: str, history: Optional[str]) -> bool:
-        lowered = query.lower()
+    def _should_include_gallery_rag(self, lowered: str, history: Optional[str]) -> bool:
         plot_tokens = [
             "plot",
             "chart",
@@ -637,16 +1408,9 @@ class LLMService:
         combined = f"{tail} {normalized}".strip()
         return " ".join(combined.split())
 
-    def _is_explicit_gallery_request(self, query: str) -> bool:
-        lowered = query.lower()
-        return any(
-            phrase in lowered
-            for phrase in ["based on this example:", "apply example:", "example:"]
-        )
-
     def _should_force_code_retry(
         self,
-        query: str,
+        normalized_query: str,
         response_text: str,
         current_code: Optional[str],
         history: Optional[str],
@@ -654,7 +1418,7 @@ class LLMService:
         file_catalog: Optional[List[Dict[str, object]]],
     ) -> bool:
         """Return True when the LLM should be re-asked to output runnable code."""
-        normalized_query = " ".join((query or "").strip().lower().split())
+        normalized_query = " ".join(normalized_query.split())
         if not normalized_query:
             return False
 
@@ -688,29 +1452,63 @@ class LLMService:
         ]
         return any(phrase in normalized_response for phrase in refusal_phrases)
 
+    def _try_local_edit(self, query: str, current_code: str) -> Optional[str]:
+        """Apply a title, axis label or legend move without calling the model.
+
+        Returns None when the request is not one of those edits or the code
+        does not have exactly one call to change.
+        """
+        query = query.strip()
+        for pattern, names in _LOCAL_LABEL_EDITS:
+            match = pattern.fullmatch(query)
+            if match is not None:
+                value = match.group("double") or match.group("single") or match.group("bare")
+                return _rewrite_single_call(
+                    current_code,
+                    names,
+                    lambda call: (call.args[0], repr(value)) if call.args else None,
+                )
+
+        match = _LOCAL_LEGEND_EDIT.fullmatch(query)
+        if match is None:
+            return None
+        loc = repr(" ".join(match.group("loc").lower().split()))
+
+        def move_legend(call: ast.Call) -> Tuple[ast.AST, str]:
+            for keyword in call.keywords:
+                if keyword.arg == "loc":
+                    return keyword.value, loc
+            arguments = [*call.args, *call.keywords]
+            if not arguments:
+                return call, f"{ast.get_source_segment(current_code, call.func)}(loc={loc})"
+            last = max(arguments, key=lambda node: (node.end_lineno, node.end_col_offset))
+            return last, f"{ast.get_source_segment(current_code, last)}, loc={loc}"
+
+        return _rewrite_single_call(current_code, frozenset({"legend"}), move_legend)
+
     def _extract_code(self, text: str) -> Optional[str]:
-        if "```python" in text:
-            code = text.split("```python")[1].split("```")[0]
-        elif "```" in text:
-            parts = text.split("```")
-            if len(parts) >= 3:
-                code = parts[1]
-                if "\n" in code:
-                    first_line = code.split("\n")[0].strip()
-                    if first_line and not any(c in first_line for c in [" ", "(", "=", "#"]):
-                        code = "\n".join(code.split("\n")[1:])
-            else:
-                return None
-        else:
+        # Chat-only replies have no fence; one scan settles them.
+        first_fence = text.find("```")
+        if first_fence == -1:
             return None
 
-        code = code.strip()
-        lines = code.split("\n")
-        filtered_lines = []
-        for line in lines:
-            if line.lower().startswith("here is"):
-                continue
-            if "plt.show()" in line:
-                continue
-            filtered_lines.append(line)
-        return "\n".join(filtered_lines)
+        start = text.find("```python", first_fence)
+        if start != -1:
+            start += len("```python")
+            end = text.find("```", start)
+            code = text[start:] if end == -1 else text[start:end]
+        else:
+            start = first_fence
+            end = text.find("```", start + 3)
+            if end == -1:
+                return None
+            code = text[start + 3 : end]
+            language_tag = _LANGUAGE_TAG_PATTERN.match(code)
+            if language_tag is not None:
+                code = code[language_tag.end() :]
+
+        return "\n".join(
+            line
+            for line in code.strip().split("\n")
+            if "plt.show()" not in line and not line.lower().startswith("here is")
+        )
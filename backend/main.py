@@ -2,6 +2,8 @@
 
 from __future__ import annotations
 
+import asyncio
+import functools
 import io
 import json
 import os
@@ -11,15 +13,19 @@ import socket
 import subprocess
 import shutil
 import time
-from typing import Dict, List, Optional, Tuple
+from dataclasses import dataclass, field
+from importlib.util import find_spec
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
 
 import pandas as pd
 import uvicorn
-from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi import Depends, FastAPI, File, HTTPException, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from pydantic import BaseModel, Field
 
+from admission import AdmissionGate
 from app_logger import setup_app_logger
 from data_manager import DataManager
 from data_validator import get_validator
@@ -31,7 +37,7 @@ from gallery_adapters import (
 )
 from intelligent_assistant import get_intelligent_assistant
 from join_assistant import JoinAssistant
-from llm_service import LLMService
+from llm_service import LLMProvider, LLMService, format_catalog_entry
 from plot_storage import create_thumbnail, save_plot_assets
 from plot_engine import PlotEngine
 from plot_templates import maybe_generate_template_plot
@@ -40,6 +46,22 @@ from project_manifest import ProjectManifestManager
 from session_manager import SessionManager
 from metrics import MetricsStore
 
+if find_spec("orjson") is not None:
+    import orjson
+else:
+    orjson = None
+
+# Candidates for pasted CSV, in tie-break order.
+_PASTE_DELIMITERS = (",", "\t", " ", ";", "|")
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+_URL_PATTERN = re.compile(r"https?://[^\s]+")
+
+
+def _read_capacity_env(name: str, default: int) -> int:
+    value = os.getenv(name, "")
+    return int(value) if value.isdigit() and int(value) > 0 else default
+
+
 app = FastAPI(title="Local Matplotlib LLM Plotter")
 
 app.add_middleware(
@@ -59,6 +81,9 @@ session_manager = SessionManager()
 join_assistant = JoinAssistant()
 metrics_store = MetricsStore()
 app_logger = setup_app_logger()
+# Requests beyond these limits get a quick 503 instead of joining an unbounded queue.
+chat_gate = AdmissionGate("chat", _read_capacity_env("PLOT_CHAT_MAX_INFLIGHT", 8))
+plot_gate = AdmissionGate("plot", _read_capacity_env("PLOT_EXEC_MAX_INFLIGHT", os.cpu_count() or 4))
 
 
 @app.middleware("http")
@@ -144,19 +169,48 @@ async def root() -> Dict[str, str]:
 
 @app.get("/metrics")
 async def get_metrics() -> Dict[str, object]:
-    return metrics_store.snapshot()
+    snapshot = metrics_store.snapshot()
+    snapshot["admission"] = {gate.name: gate.snapshot() for gate in (chat_gate, plot_gate)}
+    return snapshot
+
+
+@app.get("/cache_stats")
+async def get_cache_stats() -> Dict[str, object]:
+    stats = dict(llm_service.cache.stats)
+    if llm_service.semantic_cache is not None:
+        stats["semantic"] = llm_service.semantic_cache.stats
+    return stats
+
+
+@app.delete("/cache")
+async def clear_cache() -> Dict[str, str]:
+    llm_service.clear_caches()
+    return {"status": "cleared"}
 
 
 @app.get("/gallery")
-async def get_gallery_kb() -> Dict[str, object]:
+async def get_gallery_kb() -> Response:
     kb_path = os.path.join(os.path.dirname(__file__), "matplotlib_gallery_kb.json")
     if not os.path.isfile(kb_path):
         raise HTTPException(status_code=404, detail="Gallery knowledge base not found")
-    with open(kb_path, "r") as f:
-        data = json.load(f)
+    stat = os.stat(kb_path)
+    body = _gallery_kb_body(kb_path, stat.st_mtime_ns, stat.st_size)
+    return Response(content=body, media_type="application/json")
+
+
+@functools.lru_cache(maxsize=1)
+def _gallery_kb_body(kb_path: str, mtime_ns: int, size: int) -> bytes:
+    """Parse and serialise the knowledge base once per (path, mtime, size)."""
+    if orjson is not None:
+        data = orjson.loads(Path(kb_path).read_bytes())
+    else:
+        with open(kb_path, "r") as f:
+            data = json.load(f)
     if not isinstance(data, dict):
         raise HTTPException(status_code=500, detail="Invalid gallery knowledge base")
-    return data
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":")).encode("utf-8")
 
 
 @app.get("/projects")
@@ -167,7 +221,7 @@ async def list_projects() -> Dict[str, List[str]]:
 @app.post("/projects")
 async def create_project(request: ProjectRequest) -> Dict[str, str]:
     name = _validate_project_name(request.name)
-    if name in project_manager.list_projects():
+    if project_manager.project_exists(name):
         raise HTTPException(status_code=400, detail="Project already exists")
     project = project_manager.create_project(name)
     manifest_manager.ensure_manifest(name)
@@ -177,7 +231,7 @@ async def create_project(request: ProjectRequest) -> Dict[str, str]:
 @app.get("/projects/{name}/files")
 async def list_project_files(name: str, recursive: bool = False) -> Dict[str, object]:
     project_name = _validate_project_name(name)
-    if project_name not in project_manager.list_projects():
+    if not project_manager.project_exists(project_name):
         raise HTTPException(status_code=404, detail="Project not found")
     entries = project_manager.list_entries(project_name, include_dirs=True, recursive=recursive)
     manifest = manifest_manager.ensure_manifest(project_name)
@@ -192,7 +246,7 @@ async def list_project_files(name: str, recursive: bool = False) -> Dict[str, ob
 @app.get("/projects/{name}/manifest")
 async def get_project_manifest(name: str) -> Dict[str, object]:
     project_name = _validate_project_name(name)
-    if project_name not in project_manager.list_projects():
+    if not project_manager.project_exists(project_name):
         raise HTTPException(status_code=404, detail="Project not found")
     manifest = manifest_manager.ensure_manifest(project_name)
     return {"manifest": manifest}
@@ -201,16 +255,16 @@ async def get_project_manifest(name: str) -> Dict[str, object]:
 @app.get("/projects/{name}/plots")
 async def get_project_plots(name: str) -> Dict[str, List[Dict[str, object]]]:
     project_name = _validate_project_name(name)
-    if project_name not in project_manager.list_projects():
+    if not project_manager.project_exists(project_name):
         raise HTTPException(status_code=404, detail="Project not found")
     plots = manifest_manager.get_plot_history(project_name)
     return {"plots": plots}
 
 
 @app.get("/projects/{name}/plots/{plot_id}/image")
-async def get_plot_image(name: str, plot_id: str) -> StreamingResponse:
+async def get_plot_image(name: str, plot_id: str, request: Request) -> Response:
     project_name = _validate_project_name(name)
-    if project_name not in project_manager.list_projects():
+    if not project_manager.project_exists(project_name):
         raise HTTPException(status_code=404, detail="Project not found")
     plot_entry = manifest_manager.get_plot_by_id(project_name, plot_id)
     if not plot_entry:
@@ -222,13 +276,13 @@ async def get_plot_image(name: str, plot_id: str) -> StreamingResponse:
     image_path = os.path.join(project_path, rel_image_path)
     if not os.path.isfile(image_path):
         raise HTTPException(status_code=404, detail="Image file not found")
-    return StreamingResponse(open(image_path, "rb"), media_type="image/png")
+    return _png_response(request, image_path)
 
 
 @app.get("/projects/{name}/plots/{plot_id}/thumbnail")
-async def get_plot_thumbnail(name: str, plot_id: str) -> StreamingResponse:
+async def get_plot_thumbnail(name: str, plot_id: str, request: Request) -> Response:
     project_name = _validate_project_name(name)
-    if project_name not in project_manager.list_projects():
+    if not project_manager.project_exists(project_name):
         raise HTTPException(status_code=404, detail="Project not found")
     plot_entry = manifest_manager.get_plot_by_id(project_name, plot_id)
     if not plot_entry:
@@ -246,19 +300,30 @@ async def get_plot_thumbnail(name: str, plot_id: str) -> StreamingResponse:
         rel_thumb_path = f"{os.path.splitext(rel_image_path)[0]}_thumb.png"
         thumbnail_path = os.path.join(project_path, rel_thumb_path)
         if not os.path.isfile(thumbnail_path):
-            create_thumbnail(image_path, thumbnail_path)
+            await asyncio.to_thread(create_thumbnail, image_path, thumbnail_path)
         manifest_manager.set_plot_thumbnail_path(project_name, plot_id, rel_thumb_path)
     else:
         thumbnail_path = os.path.join(project_path, rel_thumb_path)
     if not os.path.isfile(thumbnail_path):
         raise HTTPException(status_code=404, detail="Thumbnail file not found")
-    return StreamingResponse(open(thumbnail_path, "rb"), media_type="image/png")
+    return _png_response(request, thumbnail_path)
+
+
+def _png_response(request: Request, path: str) -> Response:
+    """Send a PNG with an mtime/size ETag, answering 304 when the client's copy matches."""
+    stat = os.stat(path)
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    # no-cache still lets the browser keep the image, but it revalidates first.
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type="image/png", headers=headers, stat_result=stat)
 
 
 @app.patch("/projects/{name}/ui_state")
 async def update_project_ui_state(name: str, request: UIStateUpdate) -> Dict[str, object]:
     project_name = _validate_project_name(name)
-    if project_name not in project_manager.list_projects():
+    if not project_manager.project_exists(project_name):
         raise HTTPException(status_code=404, detail="Project not found")
     updates = request.model_dump(exclude_none=True)
     ui_state = manifest_manager.update_ui_state(project_name, updates)
@@ -268,17 +333,13 @@ async def update_project_ui_state(name: str, request: UIStateUpdate) -> Dict[str
 @app.post("/projects/{name}/upload")
 async def upload_to_project(name: str, file: UploadFile = File(...)) -> Dict[str, object]:
     project_name = _validate_project_name(name)
-    if project_name not in project_manager.list_projects():
+    if not project_manager.project_exists(project_name):
         project_manager.create_project(project_name)
     manifest_manager.ensure_manifest(project_name)
     project_path = project_manager.get_project_path(project_name)
 
     file_path = await data_manager.save_file(file, target_dir=project_path)
-    preview = data_manager.get_preview(file_path)
-
-    validator = get_validator()
-    df = data_manager.load_data(file_path)
-    analysis = validator.analyze_data(df)
+    preview, analysis = await asyncio.to_thread(_summarize_dataset, file_path)
     dataset = manifest_manager.register_dataset(project_name, file_path)
 
     return {
@@ -295,7 +356,7 @@ async def create_session(request: SessionCreateRequest) -> Dict[str, object]:
     session = session_manager.create_session(request.title, request.project_name)
     if request.project_name:
         project_name = _validate_project_name(request.project_name)
-        if project_name in project_manager.list_projects():
+        if project_manager.project_exists(project_name):
             manifest_manager.update_ui_state(
                 project_name, {"last_session_id": session.get("id")}
             )
@@ -324,11 +385,7 @@ async def get_session_messages(session_id: str) -> Dict[str, object]:
 @app.post("/upload")
 async def upload_file(file: UploadFile = File(...)) -> Dict[str, object]:
     file_path = await data_manager.save_file(file)
-    preview = data_manager.get_preview(file_path)
-
-    validator = get_validator()
-    df = data_manager.load_data(file_path)
-    analysis = validator.analyze_data(df)
+    preview, analysis = await asyncio.to_thread(_summarize_dataset, file_path)
 
     return {
         "path": file_path,
@@ -353,57 +410,35 @@ async def paste_data(request: PasteDataRequest) -> Dict[str, object]:
     target_dir = data_manager.upload_dir
     if request.project_name:
         project_name = _validate_project_name(request.project_name)
-        if project_name not in project_manager.list_projects():
+        if not project_manager.project_exists(project_name):
             project_manager.create_project(project_name)
         manifest_manager.ensure_manifest(project_name)
         target_dir = project_manager.get_project_path(project_name)
 
     if format_type == "csv":
-        delimiters = [",", "\t", " ", ";", "|"]
-        best_delimiter = ","
-        max_columns = 0
-
         lines = data_content.strip().split("\n")
-        check_lines = lines[:5] if len(lines) > 5 else lines
-
-        if check_lines:
-            for delim in delimiters:
-                first_line_cols = len(check_lines[0].split(delim))
-                if first_line_cols > 1:
-                    consistent = True
-                    for line in check_lines:
-                        if not line.strip():
-                            continue
-                        if len(line.split(delim)) != first_line_cols:
-                            consistent = False
-                            break
-                    if consistent and first_line_cols > max_columns:
-                        max_columns = first_line_cols
-                        best_delimiter = delim
+        best_delimiter = _detect_delimiter(lines[:5])
 
         if best_delimiter == " ":
-            cleaned_lines = []
-            for line in lines:
-                cleaned_line = re.sub(r"\s+", ",", line.strip())
-                cleaned_lines.append(cleaned_line)
-            data_content = "\n".join(cleaned_lines)
+            data_content = "\n".join(
+                _WHITESPACE_PATTERN.sub(",", line.strip()) for line in lines
+            )
             best_delimiter = ","
 
         filename = f"pasted_data_{format_type}.{format_type}"
         file_path = await data_manager.save_text_data(
             data_content, filename, target_dir=target_dir
         )
-        df = pd.read_csv(io.StringIO(data_content), sep=best_delimiter)
+        df = await asyncio.to_thread(data_manager.parse_csv_text, data_content, best_delimiter)
     else:
         filename = f"pasted_data_{format_type}.{format_type}"
         file_path = await data_manager.save_text_data(
             data_content, filename, target_dir=target_dir
         )
-        df = pd.read_json(io.StringIO(data_content))
+        df = await asyncio.to_thread(pd.read_json, io.StringIO(data_content))
 
-    validator = get_validator()
-    analysis = validator.analyze_data(df)
-    preview = data_manager.get_preview(file_path)
+    analysis = await asyncio.to_thread(get_validator().analyze_data, df)
+    preview = await asyncio.to_thread(data_manager.get_preview, file_path)
 
     parsing_info = {
         "detected_delimiter": best_delimiter if format_type == "csv" else "N/A",
@@ -435,8 +470,12 @@ async def join_suggestions(request: JoinRequest) -> Dict[str, object]:
         raise HTTPException(status_code=400, detail="Some selected files are missing")
 
     alias_map = build_alias_map(existing_files)
-    dataframes = {alias: data_manager.load_data(path) for alias, path in alias_map.items()}
-    suggestions = join_assistant.suggest_joins(dataframes)
+
+    def suggest() -> Dict[str, object]:
+        dataframes = {alias: data_manager.load_data(path) for alias, path in alias_map.items()}
+        return join_assistant.suggest_joins(dataframes)
+
+    suggestions = await asyncio.to_thread(suggest)
     suggestions["alias_map"] = alias_map
     return suggestions
 
@@ -445,25 +484,71 @@ async def join_suggestions(request: JoinRequest) -> Dict[str, object]:
 async def preview_data(request: PreviewRequest) -> Dict[str, object]:
     if not os.path.isfile(request.file_path):
         raise HTTPException(status_code=404, detail="File not found")
-    df = data_manager.load_data(request.file_path)
-    validator = get_validator()
-    analysis = validator.analyze_data(df)
-    analysis["dtypes"] = {col: str(dtype) for col, dtype in df.dtypes.items()}
-    preview = df.head(10).to_dict(orient="records")
-    return {"preview": preview, "analysis": analysis}
+
+    def summarize() -> Dict[str, object]:
+        df = data_manager.load_data(request.file_path)
+        analysis = get_validator().analyze_data(df)
+        analysis["dtypes"] = {col: str(dtype) for col, dtype in df.dtypes.items()}
+        return {"preview": df.head(10).to_dict(orient="records"), "analysis": analysis}
+
+    return await asyncio.to_thread(summarize)
 
 
-@app.post("/chat")
+@app.post("/chat", dependencies=[Depends(chat_gate.slot)])
 async def chat(request: ChatRequest) -> Dict[str, object]:
     """Handle chat requests with optional multi-file plot context."""
+    chat_context = await _prepare_chat(request)
+    if isinstance(chat_context, dict):
+        return chat_context
+    response = _direct_chat_reply(request, chat_context)
+    if response is None:
+        response = await llm_service.process_query(**_chat_query_args(request, chat_context))
+    return await _finish_chat(request, chat_context, response)
+
+
+@app.post("/chat/stream", dependencies=[Depends(chat_gate.slot)])
+async def chat_stream(request: ChatRequest) -> StreamingResponse:
+    """Handle a chat request as server-sent events, forwarding model text as it arrives.
+
+    Events are ``{"delta": text}`` while the model writes, ``{"reset": true}``
+    when a retry discards that text, ``{"code": code}`` once plot code is ready
+    and about to run, and finally ``{"result": ...}`` carrying the ``/chat`` reply.
+    """
+    # Prepared before the response starts so a missing session still gets a 404.
+    chat_context = await _prepare_chat(request)
+    return StreamingResponse(
+        _chat_events(request, chat_context),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@dataclass
+class _ChatContext:
+    """Inputs gathered for one chat turn."""
+
+    provider: Optional[LLMProvider] = None
+    history_text: Optional[str] = None
+    data_context: str = ""
+    data_analysis: Optional[Dict[str, object]] = None
+    file_catalog: Optional[List[Dict[str, object]]] = None
+    alias_map: Dict[str, str] = field(default_factory=dict)
+    data_paths: Optional[object] = None
+    selected_files: List[str] = field(default_factory=list)
+    url_analysis: Optional[Dict[str, object]] = None
+    gallery_title: Optional[str] = None
+
+
+async def _prepare_chat(request: ChatRequest) -> Union[_ChatContext, Dict[str, object]]:
+    """Load history and data context for a chat turn, or return the error reply."""
     if request.provider == "gemini" and not request.api_key:
         return {"response": "API Key required for Gemini", "type": "error"}
     if request.provider == "openai" and not request.api_key:
         return {"response": "API Key required for OpenAI", "type": "error"}
 
-    llm_service.set_provider(request.provider, request.api_key, request.model)
-
-    history_text = None
+    chat_context = _ChatContext(
+        provider=llm_service.get_provider(request.provider, request.api_key, request.model)
+    )
     if request.session_id:
         if not _session_exists(request.session_id):
             raise HTTPException(status_code=404, detail="Session not found")
@@ -471,80 +556,119 @@ async def chat(request: ChatRequest) -> Dict[str, object]:
         session_manager.update_session_context(
             request.session_id, request.project_name, request.selected_files
         )
-        history_text = _build_history(session_messages)
-
-    data_context = ""
-    data_analysis = None
-    file_catalog = None
-    alias_map: Dict[str, str] = {}
-    data_paths: Optional[object] = None
+        chat_context.history_text = _build_history(session_messages)
 
-    selected_files = _unique_paths(request.selected_files)
-    if selected_files:
-        existing_files, missing_files = _split_existing_files(selected_files)
+    chat_context.selected_files = _unique_paths(request.selected_files)
+    if chat_context.selected_files:
+        existing_files, missing_files = _split_existing_files(chat_context.selected_files)
         if missing_files:
             return {
                 "response": f"Missing files: {', '.join(missing_files)}",
                 "type": "error",
             }
         alias_map = build_alias_map(existing_files)
-        data_context = data_manager.get_multi_data_context(alias_map)
-        file_catalog = _build_file_catalog(alias_map)
-        data_paths = existing_files
+        chat_context.alias_map = alias_map
+        chat_context.data_context = await asyncio.to_thread(
+            data_manager.get_multi_data_context, alias_map
+        )
+        chat_context.file_catalog = await asyncio.to_thread(_build_file_catalog, alias_map)
+        chat_context.data_paths = existing_files
     elif request.context:
         if not os.path.exists(request.context):
             return {"response": "Data file not found", "type": "error"}
-        data_context = data_manager.get_data_context(request.context)
-        validator = get_validator()
-        df = data_manager.load_data(request.context)
-        data_analysis = validator.analyze_data(df)
-        data_paths = request.context
+        chat_context.data_context = await asyncio.to_thread(
+            data_manager.get_data_context, request.context
+        )
+        _, chat_context.data_analysis = await asyncio.to_thread(_summarize_dataset, request.context)
+        chat_context.data_paths = request.context
 
-    url_analysis = None
-    url_pattern = re.compile(r"https?://[^\s]+")
-    urls = url_pattern.findall(request.message)
+    urls = _URL_PATTERN.findall(request.message)
     if urls:
         assistant = get_intelligent_assistant()
-        url_analysis = assistant.analyze_url(urls[0])
+        chat_context.url_analysis = await asyncio.to_thread(assistant.analyze_url, urls[0])
+
+    chat_context.gallery_title = extract_gallery_example_title(request.message)
+    return chat_context
+
 
-    response: Dict[str, object]
-    gallery_title = extract_gallery_example_title(request.message)
-    gallery_adaptation = None
-    if gallery_title:
+def _direct_chat_reply(
+    request: ChatRequest, chat_context: _ChatContext
+) -> Optional[Dict[str, object]]:
+    """Answer from a gallery adaptation or plot template, when one applies, without the LLM."""
+    if chat_context.gallery_title:
         gallery_adaptation = maybe_adapt_gallery_example(
-            gallery_title, data_analysis=data_analysis, file_catalog=file_catalog
+            chat_context.gallery_title,
+            data_analysis=chat_context.data_analysis,
+            file_catalog=chat_context.file_catalog,
         )
+        if gallery_adaptation:
+            return {
+                "type": "plot_code",
+                "code": gallery_adaptation.code,
+                "text": f"I generated a plot based on the gallery example: {gallery_adaptation.description}.",
+            }
 
-    if gallery_adaptation:
-        response = {
-            "type": "plot_code",
-            "code": gallery_adaptation.code,
-            "text": f"I generated a plot based on the gallery example: {gallery_adaptation.description}.",
-        }
-    else:
-        template_plot = None
-        template_mode = os.getenv("PLOT_TEMPLATE_MODE", "off").strip().lower()
-        templates_enabled = template_mode not in {"off", "0", "false", "disabled"}
-        if templates_enabled and data_paths is None and not request.current_code:
-            template_plot = maybe_generate_template_plot(request.message)
-
+    template_mode = os.getenv("PLOT_TEMPLATE_MODE", "off").strip().lower()
+    templates_enabled = template_mode not in {"off", "0", "false", "disabled"}
+    if templates_enabled and chat_context.data_paths is None and not request.current_code:
+        template_plot = maybe_generate_template_plot(request.message)
         if template_plot:
-            response = {
+            return {
                 "type": "plot_code",
                 "code": template_plot.code,
                 "text": f"I generated a {template_plot.description}.",
             }
-        else:
-            response = await llm_service.process_query(
-                query=request.message,
-                context=data_context,
-                current_code=request.current_code,
-                history=history_text,
-                data_analysis=data_analysis,
-                url_analysis=url_analysis,
-                file_catalog=file_catalog,
-            )
+    return None
+
 
+def _chat_query_args(request: ChatRequest, chat_context: _ChatContext) -> Dict[str, object]:
+    return {
+        "query": request.message,
+        "context": chat_context.data_context,
+        "current_code": request.current_code,
+        "history": chat_context.history_text,
+        "data_analysis": chat_context.data_analysis,
+        "url_analysis": chat_context.url_analysis,
+        "file_catalog": chat_context.file_catalog,
+        "provider": chat_context.provider,
+    }
+
+
+async def _chat_events(
+    request: ChatRequest, chat_context: Union[_ChatContext, Dict[str, object]]
+) -> AsyncIterator[str]:
+    if isinstance(chat_context, dict):
+        yield _sse_frame({"result": chat_context})
+        return
+    # The 200 status is already sent, so failures end the stream with an error result.
+    try:
+        response = _direct_chat_reply(request, chat_context)
+        if response is None:
+            async for event in llm_service.stream_query(**_chat_query_args(request, chat_context)):
+                if "type" in event:
+                    response = event
+                else:
+                    yield _sse_frame(event)
+        if response.get("type") == "plot_code":
+            yield _sse_frame({"code": response["code"]})
+        final = _sse_frame({"result": await _finish_chat(request, chat_context, response)})
+    except HTTPException as exc:
+        final = _sse_frame({"result": {"response": str(exc.detail), "type": "error"}})
+    except Exception:
+        app_logger.exception("chat_stream_failed")
+        final = _sse_frame({"result": {"response": "Chat request failed", "type": "error"}})
+    yield final
+
+
+def _sse_frame(event: Dict[str, object]) -> str:
+    payload = orjson.dumps(event).decode("utf-8") if orjson is not None else json.dumps(event)
+    return f"data: {payload}\n\n"
+
+
+async def _finish_chat(
+    request: ChatRequest, chat_context: _ChatContext, response: Dict[str, object]
+) -> Dict[str, object]:
+    """Record the turn, run any generated plot code and build the chat reply."""
     if request.session_id:
         session_manager.append_message(request.session_id, "user", request.message)
         session_manager.append_message(
@@ -555,36 +679,45 @@ async def chat(request: ChatRequest) -> Dict[str, object]:
         )
 
     if response.get("type") == "plot_code":
-        plot_result = plot_engine.execute_code(
-            response["code"], data_paths, file_aliases=alias_map or None
+        plot_result = await asyncio.to_thread(
+            plot_engine.execute_code,
+            response["code"],
+            chat_context.data_paths,
+            file_aliases=chat_context.alias_map or None,
         )
         if plot_result.get("error"):
             fallback_plot = None
-            if gallery_title:
+            if chat_context.gallery_title:
                 fallback_plot = generate_gallery_fallback_plot(
-                    data_analysis=data_analysis, file_catalog=file_catalog
+                    data_analysis=chat_context.data_analysis,
+                    file_catalog=chat_context.file_catalog,
                 )
             if fallback_plot:
-                fallback_result = plot_engine.execute_code(
-                    fallback_plot.code, data_paths, file_aliases=alias_map or None
+                fallback_result = await asyncio.to_thread(
+                    plot_engine.execute_code,
+                    fallback_plot.code,
+                    chat_context.data_paths,
+                    file_aliases=chat_context.alias_map or None,
                 )
                 if not fallback_result.get("error"):
                     plot_entry = None
                     if request.project_name and fallback_result.get("image"):
                         project_name = _validate_project_name(request.project_name)
-                        if project_name in project_manager.list_projects():
+                        if project_manager.project_exists(project_name):
                             project_path = project_manager.get_project_path(project_name)
-                            image_path, thumbnail_path = save_plot_assets(
-                                project_path, fallback_result["image"]
+                            image_path, thumbnail_path = await asyncio.to_thread(
+                                save_plot_assets, project_path, fallback_result["image"]
                             )
                             plot_entry = manifest_manager.register_plot(
                                 project_name=project_name,
                                 code=fallback_plot.code,
-                                selected_files=selected_files,
+                                selected_files=chat_context.selected_files,
                                 image_path=image_path,
                                 thumbnail_path=thumbnail_path,
                                 session_id=request.session_id,
-                                description=f"Fallback plot for gallery example: {gallery_title}",
+                                description=(
+                                    f"Fallback plot for gallery example: {chat_context.gallery_title}"
+                                ),
                             )
                             if request.session_id and plot_entry:
                                 session_manager.append_plot(request.session_id, plot_entry)
@@ -608,15 +741,15 @@ async def chat(request: ChatRequest) -> Dict[str, object]:
         plot_entry = None
         if request.project_name and plot_result.get("image"):
             project_name = _validate_project_name(request.project_name)
-            if project_name in project_manager.list_projects():
+            if project_manager.project_exists(project_name):
                 project_path = project_manager.get_project_path(project_name)
-                image_path, thumbnail_path = save_plot_assets(
-                    project_path, plot_result["image"]
+                image_path, thumbnail_path = await asyncio.to_thread(
+                    save_plot_assets, project_path, plot_result["image"]
                 )
                 plot_entry = manifest_manager.register_plot(
                     project_name=project_name,
                     code=response["code"],
-                    selected_files=selected_files,
+                    selected_files=chat_context.selected_files,
                     image_path=image_path,
                     thumbnail_path=thumbnail_path,
                     session_id=request.session_id,
@@ -642,7 +775,7 @@ async def chat(request: ChatRequest) -> Dict[str, object]:
     return {"response": response.get("text", "")}
 
 
-@app.post("/execute_plot")
+@app.post("/execute_plot", dependencies=[Depends(plot_gate.slot)])
 async def execute_plot(request: ExecutePlotRequest) -> Dict[str, object]:
     """Execute user-supplied plot code directly (no LLM rewrite)."""
     if not request.code.strip():
@@ -663,7 +796,8 @@ async def execute_plot(request: ExecutePlotRequest) -> Dict[str, object]:
             raise HTTPException(status_code=404, detail="Data file not found")
         data_paths = request.context
 
-    plot_result = plot_engine.execute_code(
+    plot_result = await asyncio.to_thread(
+        plot_engine.execute_code,
         request.code,
         data_paths,
         dpi=request.dpi,
@@ -682,9 +816,11 @@ async def execute_plot(request: ExecutePlotRequest) -> Dict[str, object]:
     plot_entry = None
     if request.project_name and plot_result.get("image"):
         project_name = _validate_project_name(request.project_name)
-        if project_name in project_manager.list_projects():
+        if project_manager.project_exists(project_name):
             project_path = project_manager.get_project_path(project_name)
-            image_path, thumbnail_path = save_plot_assets(project_path, plot_result["image"])
+            image_path, thumbnail_path = await asyncio.to_thread(
+                save_plot_assets, project_path, plot_result["image"]
+            )
             plot_entry = manifest_manager.register_plot(
                 project_name=project_name,
                 code=request.code,
@@ -710,11 +846,11 @@ async def execute_plot(request: ExecutePlotRequest) -> Dict[str, object]:
 async def validate_plot_type(plot_type: str, file_path: str) -> Dict[str, object]:
     """Validate if data is suitable for a specific plot type."""
     validator = get_validator()
-    df = data_manager.load_data(file_path)
-    is_valid, message = validator.validate_for_plot_type(df, plot_type)
+    _, analysis = await asyncio.to_thread(_summarize_dataset, file_path)
+    is_valid, message = validator.validate_for_plot_type(analysis, plot_type)
 
     if not is_valid:
-        suggestion = validator.suggest_data_transformation(df, plot_type)
+        suggestion = validator.suggest_data_transformation(analysis, plot_type)
         schema = validator.get_plot_schema(plot_type)
         return {
             "valid": False,
@@ -726,7 +862,7 @@ async def validate_plot_type(plot_type: str, file_path: str) -> Dict[str, object
     return {"valid": True, "message": message}
 
 
-@app.post("/download_plot")
+@app.post("/download_plot", dependencies=[Depends(plot_gate.slot)])
 async def download_plot(request: DownloadRequest) -> StreamingResponse:
     """Generate a plot download using the provided code and dataset context."""
     data_paths: Optional[object] = None
@@ -742,7 +878,8 @@ async def download_plot(request: DownloadRequest) -> StreamingResponse:
     elif request.context:
         data_paths = request.context
 
-    result = plot_engine.execute_code(
+    result = await asyncio.to_thread(
+        plot_engine.execute_code,
         request.code,
         data_paths,
         dpi=request.dpi,
@@ -773,13 +910,7 @@ async def download_plot(request: DownloadRequest) -> StreamingResponse:
 
 def _unique_paths(paths: List[str]) -> List[str]:
     """Return a de-duplicated list while preserving order."""
-    seen = set()
-    unique = []
-    for path in paths:
-        if path not in seen:
-            unique.append(path)
-            seen.add(path)
-    return unique
+    return list(dict.fromkeys(paths))
 
 
 def _split_existing_files(paths: List[str]) -> Tuple[List[str], List[str]]:
@@ -794,6 +925,34 @@ def _split_existing_files(paths: List[str]) -> Tuple[List[str], List[str]]:
     return existing, missing
 
 
+def _summarize_dataset(file_path: str) -> Tuple[List[Dict[str, object]], Dict[str, object]]:
+    """Return (preview records, analysis) for a saved dataset.
+
+    Parsing and analysis are CPU-bound, so async handlers run this through
+    asyncio.to_thread to keep the event loop free.
+    """
+    preview = data_manager.get_preview(file_path)
+    analysis = get_validator().analyze_data(data_manager.load_data(file_path))
+    return preview, analysis
+
+
+def _detect_delimiter(sample: List[str]) -> str:
+    """Pick the delimiter splitting every non-blank line into the same, largest column count.
+
+    The first line sets the expected count; ties go to the earlier candidate.
+    """
+    best_delimiter = ","
+    max_count = 0
+    for delimiter in _PASTE_DELIMITERS:
+        count = sample[0].count(delimiter)
+        if count > max_count and all(
+            line.count(delimiter) == count for line in sample if line.strip()
+        ):
+            max_count = count
+            best_delimiter = delimiter
+    return best_delimiter
+
+
 def _build_history(messages: List[Dict[str, object]], max_messages: int = 12) -> str:
     """Format a compact conversation history string for the LLM."""
     lines = []
@@ -807,21 +966,26 @@ def _build_history(messages: List[Dict[str, object]], max_messages: int = 12) ->
 def _build_file_catalog(alias_map: Dict[str, str]) -> List[Dict[str, object]]:
     """Assemble file summaries for prompt context."""
     catalog = []
-    validator = get_validator()
     for alias, path in alias_map.items():
-        df = data_manager.load_data(path)
-        analysis = validator.analyze_data(df)
-        catalog.append(
-            {
-                "alias": alias,
-                "filename": os.path.basename(path),
-                "path": os.path.abspath(path),
-                "analysis": analysis,
-            }
-        )
+        stat = os.stat(path)
+        catalog.append(_catalog_entry(alias, path, stat.st_mtime_ns, stat.st_size))
     return catalog
 
 
+@functools.lru_cache(maxsize=64)
+def _catalog_entry(alias: str, path: str, mtime_ns: int, size: int) -> Dict[str, object]:
+    """Analyze a file once per (alias, path, mtime, size); callers must not mutate it."""
+    analysis = get_validator().analyze_data(data_manager.load_data(path))
+    filename = os.path.basename(path)
+    return {
+        "alias": alias,
+        "filename": filename,
+        "path": os.path.abspath(path),
+        "analysis": analysis,
+        "summary": format_catalog_entry(alias, filename, analysis),
+    }
+
+
 def _validate_project_name(project_name: str) -> str:
     """Validate and normalize a project name."""
     name = project_name.strip()
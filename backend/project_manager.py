@@ -42,6 +42,10 @@ class ProjectManager:
         ]
         return sorted(projects)
 
+    def project_exists(self, project_name: str) -> bool:
+        """Return True if the project directory exists, with one stat instead of a listing."""
+        return os.path.isdir(self._get_project_path(project_name))
+
     def create_project(self, project_name: str) -> Dict[str, str]:
         """Create a new project directory."""
         name = self._validate_project_name(project_name)
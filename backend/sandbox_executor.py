@@ -8,7 +8,6 @@ import os
 import subprocess
 import sys
 import tempfile
-import time
 from typing import Dict, Optional
 
 
@@ -63,15 +62,14 @@ class SandboxExecutor:
                 text=True,
             )
 
-            start = time.monotonic()
-            while process.poll() is None:
-                if time.monotonic() - start > self.timeout_seconds:
-                    process.terminate()
-                    process.wait()
-                    return {"error": True, "error_message": "Plot execution timed out"}
-                time.sleep(0.05)
-
-            stdout, stderr = process.communicate()
+            # communicate() drains both pipes while waiting, so a chatty script
+            # cannot fill one and stall, and the result is read as soon as it exits.
+            try:
+                stdout, stderr = process.communicate(timeout=self.timeout_seconds)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.communicate()
+                return {"error": True, "error_message": "Plot execution timed out"}
             if process.returncode != 0:
                 detail = (stderr or stdout or "").strip()
                 if detail:
@@ -23,6 +23,8 @@ import numpy as np
 import pandas as pd
 import seaborn as sns
 
+from csv_reader import read_csv
+
 
 ALLOWED_IMPORTS = {
     "matplotlib",
@@ -132,7 +134,9 @@ def _load_dataframes(data_paths: Dict[str, str]) -> Dict[str, pd.DataFrame]:
     dataframes: Dict[str, pd.DataFrame] = {}
     for alias, path in data_paths.items():
         if path.endswith(".csv"):
-            dataframes[alias] = pd.read_csv(path)
+            # Same parser as DataManager, so the dtypes described to the LLM match.
+            with open(path, "rb") as handle:
+                dataframes[alias] = read_csv(handle)
         elif path.endswith(".json"):
             dataframes[alias] = pd.read_json(path)
         else:
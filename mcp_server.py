@@ -292,11 +292,11 @@ async def plot_data(
             "text": f"I generated a {template_plot.description}.",
         }
     else:
-        LLM_SERVICE.set_provider(provider, api_key, model)
         response = await LLM_SERVICE.process_query(
             query=instruction,
             context=context,
             data_analysis=analysis,
+            provider=LLM_SERVICE.get_provider(provider, api_key, model),
         )
 
     if response.get("type") == "clarify":
@@ -359,11 +359,11 @@ async def plot_file(
     validator = get_validator()
     analysis = validator.analyze_data(df)
 
-    LLM_SERVICE.set_provider(provider, api_key, model)
     response = await LLM_SERVICE.process_query(
         query=instruction,
         context=DATA_MANAGER.get_data_context(str(resolved)),
         data_analysis=analysis,
+        provider=LLM_SERVICE.get_provider(provider, api_key, model),
     )
 
     if response.get("type") == "clarify":
@@ -0,0 +1,34 @@
+"""Tests for endpoint admission control."""
+
+import asyncio
+import sys
+import unittest
+from pathlib import Path
+
+from fastapi import HTTPException
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "backend"))
+
+from admission import AdmissionGate
+
+
+class TestAdmissionGate(unittest.TestCase):
+    """Validate slot accounting and fast rejection."""
+
+    def test_rejects_when_full_and_recovers(self) -> None:
+        gate = AdmissionGate("plot", capacity=1, max_wait_seconds=0.01)
+
+        async def run() -> int:
+            holder = gate.slot()
+            await holder.__anext__()
+            with self.assertRaises(HTTPException) as raised:
+                await gate.slot().__anext__()
+            self.assertEqual(gate.in_flight, 1)
+            await holder.aclose()
+            second = gate.slot()
+            await second.__anext__()
+            await second.aclose()
+            return raised.exception.status_code
+
+        self.assertEqual(asyncio.run(run()), 503)
+        self.assertEqual(gate.snapshot(), {"capacity": 1, "in_flight": 0, "admitted": 2, "rejected": 1})
@@ -4,8 +4,12 @@ import asyncio
 import os
 import sys
 import tempfile
+import json
 import unittest
 from pathlib import Path
+from unittest import mock
+
+from fastapi.testclient import TestClient
 
 
 class FakeUploadFile:
@@ -14,9 +18,13 @@ class FakeUploadFile:
     def __init__(self, filename: str, content: bytes) -> None:
         self.filename = filename
         self._content = content
+        self._offset = 0
 
-    async def read(self) -> bytes:
-        return self._content
+    async def read(self, size: int = -1) -> bytes:
+        end = len(self._content) if size < 0 else self._offset + size
+        chunk = self._content[self._offset:end]
+        self._offset += len(chunk)
+        return chunk
 
 
 class TestApiFlows(unittest.TestCase):
@@ -87,3 +95,130 @@ class TestApiFlows(unittest.TestCase):
         files_response = asyncio.run(self.main.list_project_files("Demo", recursive=False))
         plots = files_response.get("plots", [])
         self.assertEqual(len(plots), 1)
+
+        client = TestClient(self.main.app)
+        image_url = f"/projects/Demo/plots/{plots[0]['id']}/image"
+        image = client.get(image_url)
+        self.assertEqual(image.status_code, 200)
+        self.assertEqual(image.headers["content-type"], "image/png")
+        cached = client.get(image_url, headers={"If-None-Match": image.headers["etag"]})
+        self.assertEqual(cached.status_code, 304)
+
+    def test_chat_stream_forwards_deltas_then_plot_result(self) -> None:
+        asyncio.run(self.main.create_project(self.main.ProjectRequest(name="Demo")))
+        file_a = FakeUploadFile("a.csv", b"id,value\n1,10\n2,20\n")
+        file_path = asyncio.run(self.main.upload_to_project("Demo", file_a))["path"]
+        code = "fig, ax = plt.subplots()\nax.plot(df['id'], df['value'])"
+
+        async def fake_stream_query(**_kwargs):
+            yield {"delta": "Plotting "}
+            yield {"delta": "value by id."}
+            yield {"type": "plot_code", "code": code, "text": "Plotting value by id."}
+
+        client = TestClient(self.main.app)
+        with mock.patch.object(self.main.llm_service, "stream_query", fake_stream_query):
+            response = client.post(
+                "/chat/stream",
+                json={"message": "plot value", "selected_files": [file_path], "project_name": "Demo"},
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/event-stream"))
+        events = [json.loads(frame[len("data: "):]) for frame in response.text.split("\n\n") if frame]
+        self.assertEqual(events[:3], [{"delta": "Plotting "}, {"delta": "value by id."}, {"code": code}])
+        result = events[3]["result"]
+        self.assertEqual(result["response"], "Plotting value by id.")
+        self.assertTrue(result["plot"])
+        self.assertTrue(result["plot_entry"])
+
+    def test_chat_stream_ends_with_error_result_on_failure(self) -> None:
+        async def failing_stream_query(**_kwargs):
+            yield {"delta": "Plotting"}
+            raise RuntimeError("provider went away")
+
+        client = TestClient(self.main.app)
+        with mock.patch.object(self.main.llm_service, "stream_query", failing_stream_query):
+            response = client.post("/chat/stream", json={"message": "plot value"})
+        events = [json.loads(frame[len("data: "):]) for frame in response.text.split("\n\n") if frame]
+        self.assertEqual(events[0], {"delta": "Plotting"})
+        self.assertEqual(events[-1], {"result": {"response": "Chat request failed", "type": "error"}})
+
+        async def plot_stream_query(**_kwargs):
+            yield {"type": "plot_code", "code": "plt.plot([1])", "text": "Done."}
+
+        with mock.patch.object(self.main.llm_service, "stream_query", plot_stream_query):
+            response = client.post(
+                "/chat/stream", json={"message": "plot value", "project_name": "../escape"}
+            )
+        events = [json.loads(frame[len("data: "):]) for frame in response.text.split("\n\n") if frame]
+        self.assertEqual(
+            events[-1], {"result": {"response": "Project name cannot start with dot", "type": "error"}}
+        )
+
+    def test_concurrent_chats_keep_their_own_provider(self) -> None:
+        from llm_service import LLMProvider
+
+        class NamedProvider(LLMProvider):
+            def __init__(self, name: str) -> None:
+                self.model_name = name
+
+            def generate(self, prompt: str, system_instruction=None) -> str:
+                return f"answer from {self.model_name}"
+
+        providers = {"ollama": NamedProvider("local"), "openai": NamedProvider("remote")}
+        path = os.path.join(self.temp_dir.name, "a.csv")
+        with open(path, "w") as handle:
+            handle.write("id,value\n1,10\n2,20\n")
+
+        async def run_both():
+            # Each chat awaits its data context after picking a provider, so the two interleave.
+            return await asyncio.gather(
+                self.main.chat(
+                    self.main.ChatRequest(message="plot value by id", context=path, model="local")
+                ),
+                self.main.chat(
+                    self.main.ChatRequest(
+                        message="plot value by id", context=path, provider="openai", api_key="k"
+                    )
+                ),
+            )
+
+        build = lambda name, _key, _model: providers[name]
+        with mock.patch.object(self.main.llm_service, "_build_provider", side_effect=build):
+            local, remote = asyncio.run(run_both())
+        self.assertEqual(local["response"], "answer from local")
+        self.assertEqual(remote["response"], "answer from remote")
+
+    def test_file_catalog_entries_are_reused_until_file_changes(self) -> None:
+        path = os.path.join(self.temp_dir.name, "a.csv")
+        with open(path, "w") as handle:
+            handle.write("id,value\n1,10\n")
+        first = self.main._build_file_catalog({"df_a": path})[0]
+        self.assertIs(self.main._build_file_catalog({"df_a": path})[0], first)
+        self.assertIn("- df_a (source: a.csv)", first["summary"])
+
+        with open(path, "w") as handle:
+            handle.write("id,value,extra\n1,10,3\n")
+        changed = self.main._build_file_catalog({"df_a": path})[0]
+        self.assertIn("extra", changed["summary"])
+
+    def test_gallery_body_is_reused_until_file_changes(self) -> None:
+        kb_path = os.path.join(self.temp_dir.name, "kb.json")
+        Path(kb_path).write_text('{"categories": {"lines": 3}}')
+        stat = os.stat(kb_path)
+        body = self.main._gallery_kb_body(kb_path, stat.st_mtime_ns, stat.st_size)
+        self.assertEqual(body, b'{"categories":{"lines":3}}')
+
+        Path(kb_path).write_text('{"categories": {}}')
+        self.assertIs(self.main._gallery_kb_body(kb_path, stat.st_mtime_ns, stat.st_size), body)
+        stat = os.stat(kb_path)
+        self.assertEqual(
+            self.main._gallery_kb_body(kb_path, stat.st_mtime_ns, stat.st_size),
+            b'{"categories":{}}',
+        )
+
+    def test_detect_delimiter_prefers_consistent_widest_split(self) -> None:
+        detect = self.main._detect_delimiter
+        self.assertEqual(detect(["a;b;c", "1;2;3", "", "4;5;6"]), ";")
+        self.assertEqual(detect(["a b\tc", "1 2\t3"]), "\t")
+        self.assertEqual(detect(["a,b c d", "1,2 3"]), ",")
+        self.assertEqual(detect(["single"]), ",")
@@ -36,3 +36,29 @@ class TestCodeSafetyValidator(unittest.TestCase):
         result = self.validator.lint(code)
         self.assertFalse(result.ok)
         self.assertTrue(any("Placeholder" in error for error in result.errors))
+
+    def test_blocks_nested_import_and_call(self) -> None:
+        code = (
+            "def helper():\n"
+            "    import subprocess\n"
+            "    return [open(p) for p in ['a']]\n"
+            "helper()"
+        )
+        result = self.validator.lint(code)
+        self.assertFalse(result.ok)
+        self.assertIn("Import not allowed: subprocess", result.errors)
+        self.assertIn("Call not allowed: open", result.errors)
+
+    def test_cached_result_is_not_shared(self) -> None:
+        code = "import os"
+        first = self.validator.lint(code)
+        first.errors.append("mutated")
+        second = self.validator.lint(code)
+        self.assertEqual(second.errors, ["Import not allowed: os"])
+
+    def test_stops_after_error_limit(self) -> None:
+        code = "\n".join(f"import mod{i}" for i in range(20))
+        result = self.validator.lint(code)
+        self.assertFalse(result.ok)
+        self.assertEqual(len(result.errors), 5)
+        self.assertEqual(result.errors[0], "Import not allowed: mod0")
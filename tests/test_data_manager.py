@@ -0,0 +1,91 @@
+"""Tests for the DataManager loading helpers."""
+
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "backend"))
+
+from data_manager import DataManager
+from sandbox_runner import _load_dataframes
+
+
+class TestDataManager(unittest.TestCase):
+    """Validate cached loading and context generation."""
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.manager = DataManager(upload_dir=self.temp_dir.name)
+        self.file_path = os.path.join(self.temp_dir.name, "data.csv")
+        with open(self.file_path, "w") as f:
+            f.write("x,y\n1,2\n3,4\n")
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_load_data_returns_independent_copies(self) -> None:
+        first = self.manager.load_data(self.file_path)
+        first["z"] = 0
+        second = self.manager.load_data(self.file_path)
+        self.assertEqual(list(second.columns), ["x", "y"])
+
+    def test_reload_after_file_changes(self) -> None:
+        self.assertEqual(len(self.manager.load_data(self.file_path)), 2)
+        with open(self.file_path, "w") as f:
+            f.write("x,y\n1,2\n3,4\n5,6\n")
+        self.assertEqual(len(self.manager.load_data(self.file_path)), 3)
+        self.assertEqual(len(self.manager.get_preview(self.file_path)), 3)
+
+    def test_unsupported_format(self) -> None:
+        path = os.path.join(self.temp_dir.name, "notes.txt")
+        with open(path, "w") as f:
+            f.write("hello")
+        self.assertEqual(self.manager.get_preview(path), [])
+        self.assertEqual(self.manager.get_data_context(path), "No data available.")
+        with self.assertRaises(ValueError):
+            self.manager.load_data(path)
+
+    def test_save_text_data_writes_file(self) -> None:
+        path = asyncio.run(self.manager.save_text_data("a,b\n1,2\n", "pasted.csv"))
+        self.assertEqual(path, os.path.join(self.temp_dir.name, "pasted.csv"))
+        self.assertEqual(self.manager.get_preview(path), [{"a": 1, "b": 2}])
+
+    def test_parse_csv_text_pads_short_rows(self) -> None:
+        df = self.manager.parse_csv_text("a;b;c\n1;2\n3;4;5\n", sep=";")
+        self.assertEqual(list(df.columns), ["a", "b", "c"])
+        self.assertEqual(len(df), 2)
+        self.assertTrue(df["c"].isna().iloc[0])
+
+        path = asyncio.run(self.manager.save_text_data("a,b,c\n1,2\n3,4,5\n", "short.csv"))
+        self.assertEqual(len(self.manager.get_preview(path)), 2)
+
+    def test_sandbox_reads_csv_with_same_dtypes(self) -> None:
+        text = "when,day,value\n2024-01-01 10:00:00,2024-01-01,1\n2024-01-02 11:30:00,2024-01-02,2\n"
+        with open(self.file_path, "w") as f:
+            f.write(text)
+        expected = self.manager.load_data(self.file_path).dtypes
+        sandbox = _load_dataframes({"df": self.file_path})["df"].dtypes
+        self.assertEqual(sandbox.to_dict(), expected.to_dict())
+        self.assertEqual(self.manager.parse_csv_text(text).dtypes.to_dict(), expected.to_dict())
+
+    def test_data_context_truncates_wide_frames(self) -> None:
+        path = os.path.join(self.temp_dir.name, "wide.csv")
+        header = ",".join(f"c{i}" for i in range(25))
+        row = ",".join(str(i) for i in range(25))
+        with open(path, "w") as f:
+            f.write(f"{header}\n{row}\n")
+        context = self.manager.get_data_context(path, alias="df_wide")
+        self.assertIn("File: wide.csv (alias: df_wide)", context)
+        self.assertIn("... (+5 more cols)", context)
+        self.assertNotIn(" c24\n", context.split("First 3 rows:")[1])
+
+    def test_data_context_tracks_alias_and_file_changes(self) -> None:
+        first = self.manager.get_data_context(self.file_path, alias="df_a")
+        self.assertTrue(first.startswith("File: data.csv (alias: df_a)\n"))
+        self.assertTrue(self.manager.get_data_context(self.file_path).startswith("File: data.csv\n"))
+        with open(self.file_path, "w") as f:
+            f.write("x,y,z\n1,2,3\n")
+        self.assertIn("'z'", self.manager.get_data_context(self.file_path, alias="df_a"))
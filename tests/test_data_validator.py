@@ -0,0 +1,59 @@
+"""Tests for the data validator analysis helpers."""
+
+import sys
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "backend"))
+
+from data_validator import DataValidator
+
+
+class TestDataValidator(unittest.TestCase):
+    """Validate column classification and plot checks."""
+
+    def setUp(self) -> None:
+        self.validator = DataValidator()
+        self.df = pd.DataFrame(
+            {
+                "value": [1.0, None, 3.0],
+                "group": ["a", "b", None],
+                "when": pd.to_datetime(["2024-01-01", "2024-01-02", "2024-01-03"]),
+                "flag": [True, False, True],
+            }
+        )
+
+    def test_classifies_columns_by_dtype(self) -> None:
+        analysis = self.validator.analyze_data(self.df)
+        self.assertEqual(analysis["numeric_cols"], ["value", "flag"])
+        self.assertEqual(analysis["datetime_cols"], ["when"])
+        self.assertEqual(analysis["categorical_cols"], ["group"])
+        self.assertEqual(analysis["missing_values"], {"value": 1, "group": 1})
+
+    def test_timedelta_columns_are_not_numeric(self) -> None:
+        df = self.df.assign(elapsed=pd.to_timedelta([1, 2, 3], unit="s"))
+        analysis = self.validator.analyze_data(df)
+        self.assertEqual(analysis["numeric_cols"], ["value", "flag"])
+        self.assertEqual(analysis["categorical_cols"], ["group", "elapsed"])
+
+    def test_validate_for_plot_type(self) -> None:
+        ok, _ = self.validator.validate_for_plot_type(self.df, "bar")
+        self.assertTrue(ok)
+        ok, message = self.validator.validate_for_plot_type(self.df, "3d_scatter")
+        self.assertFalse(ok)
+        self.assertIn("requires at least 3 numeric columns", message)
+
+    def test_accepts_precomputed_analysis(self) -> None:
+        analysis = self.validator.analyze_data(self.df)
+        ok, _ = self.validator.validate_for_plot_type(analysis, "scatter")
+        self.assertTrue(ok)
+        suggestion = self.validator.suggest_data_transformation(analysis, "heatmap")
+        self.assertIn("heatmap", suggestion)
+
+    def test_plot_schema_is_a_copy(self) -> None:
+        schema = self.validator.get_plot_schema("scatter")
+        schema["min_numeric_cols"] = 99
+        self.assertEqual(self.validator.get_plot_schema("scatter")["min_numeric_cols"], 2)
+        self.assertEqual(self.validator.get_plot_schema("unknown"), {})
@@ -0,0 +1,38 @@
+"""Tests for file alias helpers."""
+
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "backend"))
+
+import file_utils
+from file_utils import build_alias_map, sanitize_alias
+
+
+class TestFileUtils(unittest.TestCase):
+    """Validate alias sanitization and collision handling."""
+
+    def test_sanitize_alias_collapses_invalid_runs(self) -> None:
+        self.assertEqual(sanitize_alias("/tmp/My File (1).csv"), "my_file_1")
+        self.assertEqual(sanitize_alias("a__b.csv"), "a__b")
+        self.assertEqual(sanitize_alias("données-été.csv"), "donn_es_t")
+
+    def test_non_ascii_names_do_not_grow_the_table(self) -> None:
+        size = len(file_utils._ALIAS_TABLE)
+        self.assertEqual(sanitize_alias("\u6570\u636e\u2603 sales.csv"), "sales")
+        self.assertEqual(len(file_utils._ALIAS_TABLE), size)
+
+    def test_sanitize_alias_edge_cases(self) -> None:
+        self.assertEqual(sanitize_alias("---.csv"), "dataset")
+        self.assertEqual(sanitize_alias("2024 data.csv"), "data_2024_data")
+
+    def test_build_alias_map_suffixes_duplicates(self) -> None:
+        alias_map = build_alias_map(["x/a.csv", "y/a.csv", "z/a.csv"])
+        self.assertEqual(list(alias_map), ["df_a", "df_a_2", "df_a_3"])
+
+    def test_build_alias_map_never_overwrites(self) -> None:
+        paths = ["x/a.csv", "y/a.csv", "z/a_2.csv"]
+        alias_map = build_alias_map(paths)
+        self.assertEqual(sorted(alias_map.values()), sorted(paths))
+        self.assertEqual(alias_map["df_a_2"], "y/a.csv")
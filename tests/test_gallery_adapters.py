@@ -6,7 +6,11 @@ from pathlib import Path
 
 sys.path.append(str(Path(__file__).resolve().parents[1] / "backend"))
 
-from gallery_adapters import extract_gallery_example_title, maybe_adapt_gallery_example
+from gallery_adapters import (
+    extract_gallery_example_title,
+    generate_gallery_fallback_plot,
+    maybe_adapt_gallery_example,
+)
 
 
 class TestGalleryAdapters(unittest.TestCase):
@@ -38,3 +42,17 @@ class TestGalleryAdapters(unittest.TestCase):
         assert adaptation is not None
         self.assertIn("np.linspace", adaptation.code)
         self.assertIn("fill_between", adaptation.code)
+
+    def test_fallback_plot_is_stable_across_calls(self) -> None:
+        analysis = {
+            "columns": ["when", "value"],
+            "numeric_cols": ["value"],
+            "datetime_cols": ["when"],
+        }
+        first = generate_gallery_fallback_plot(data_analysis=analysis)
+        second = generate_gallery_fallback_plot(data_analysis=dict(analysis))
+        self.assertIsNotNone(first)
+        assert first is not None
+        self.assertEqual(first, second)
+        self.assertIn("pd.to_datetime(df_local['when']", first.code)
+        self.assertIsNone(generate_gallery_fallback_plot())
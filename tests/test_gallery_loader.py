@@ -0,0 +1,42 @@
+"""Tests for gallery example search."""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "backend"))
+
+from gallery_loader import GalleryLoader
+
+
+class TestGallerySearch(unittest.TestCase):
+    """Validate substring search order and exact-title ranking."""
+
+    def setUp(self) -> None:
+        examples = {
+            "lines": [
+                {"title": "Bar Colors Legend", "filename": "legend_demo.py", "code": "a"},
+                {"title": "Stairs", "filename": "stairs_bar.py", "code": "b"},
+            ],
+            "bars": [{"title": "Bar Colors", "filename": "bar_colors.py", "code": "c"}],
+        }
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        path = os.path.join(temp_dir.name, "gallery.json")
+        with open(path, "w") as handle:
+            json.dump(examples, handle)
+        self.loader = GalleryLoader(gallery_file=path)
+
+    def test_matches_titles_and_filenames_in_gallery_order(self) -> None:
+        results = self.loader.search_examples("BAR", limit=5)
+        self.assertEqual([item["code"] for item in results], ["a", "b", "c"])
+        self.assertEqual(results[1]["category"], "lines")
+        self.assertEqual(self.loader.search_examples("bar", limit=2)[-1]["title"], "Stairs")
+        self.assertEqual(self.loader.search_examples("missing"), [])
+
+    def test_exact_title_ranks_first(self) -> None:
+        results = self.loader.search_examples("bar colors", limit=2)
+        self.assertEqual([item["title"] for item in results], ["Bar Colors", "Bar Colors Legend"])
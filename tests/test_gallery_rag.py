@@ -0,0 +1,152 @@
+"""Tests for gallery retrieval used in prompt grounding."""
+
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from typing import Dict, List
+from unittest import mock
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "backend"))
+
+import gallery_rag
+
+
+class _StubLoader:
+    """Loader stand-in exposing a fixed example list."""
+
+    def __init__(self, examples: List[Dict[str, object]]) -> None:
+        self._examples = examples
+
+    def get_all_examples(self) -> List[Dict[str, object]]:
+        return self._examples
+
+
+class TestGalleryRag(unittest.TestCase):
+    """Validate ranking and candidate selection."""
+
+    def setUp(self) -> None:
+        self.loader = _StubLoader(
+            [
+                {
+                    "title": "Simple Scatter",
+                    "filename": "simple_scatter.py",
+                    "category": "lines",
+                    "code": "import numpy as np\nplt.scatter([1], [2])\nplt.show()",
+                },
+                {
+                    "title": "Curve Error Band",
+                    "filename": "curve_error_band.py",
+                    "category": "lines",
+                    "code": "ax.fill_between(x, y - e, y + e)",
+                },
+                {
+                    "title": "Bar Colors",
+                    "filename": "bar_colors.py",
+                    "category": "bars",
+                    "code": "ax.bar(['a'], [1])",
+                },
+            ]
+        )
+        patcher = mock.patch.object(gallery_rag, "get_gallery_loader", return_value=self.loader)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_ranks_title_matches_first(self) -> None:
+        results = gallery_rag.retrieve_gallery_examples("curve error band", limit=3)
+        self.assertEqual([item.title for item in results], ["Curve Error Band"])
+        self.assertEqual(results[0].score, 12.0 + 9.0 + 3.0 + 4.0)
+
+    def test_substring_match_without_whole_token(self) -> None:
+        results = gallery_rag.retrieve_gallery_examples("scat", limit=3)
+        self.assertEqual([item.title for item in results], ["Simple Scatter"])
+        self.assertEqual(results[0].code, "plt.scatter([1], [2])")
+
+    def test_no_match_returns_empty(self) -> None:
+        self.assertEqual(gallery_rag.retrieve_gallery_examples("violin", limit=3), [])
+        self.assertEqual(gallery_rag.retrieve_gallery_examples("the plot", limit=3), [])
+
+    def test_sanitize_drops_docstrings_imports_and_markers(self) -> None:
+        code = "\n".join(
+            [
+                '"""',
+                "Title",
+                "import inside docstring",
+                '"""',
+                "import numpy as np",
+                "from matplotlib import pyplot as plt",
+                "# %%",
+                "x = [1, 2]",
+                "    '''inline'''",
+                "plt.plot(x)",
+                "# sphinx_gallery_thumbnail_number = 2",
+                "plt.show()",
+            ]
+        )
+        self.assertEqual(
+            gallery_rag.sanitize_gallery_code_for_prompt(code), "x = [1, 2]\nplt.plot(x)"
+        )
+        self.assertEqual(gallery_rag.sanitize_gallery_code_for_prompt(code, max_lines=1), "x = [1, 2]")
+
+
+class TestPersistedIndex(unittest.TestCase):
+    """Validate the on-disk index cache keyed on the gallery file."""
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.loader = _StubLoader(
+            [{"title": "Bar Colors", "filename": "bar_colors.py", "code": "import numpy\nax.bar(x, y)"}]
+        )
+        self.loader.gallery_file = os.path.join(self.temp_dir.name, "gallery.json")
+        with open(self.loader.gallery_file, "w") as handle:
+            handle.write("{}")
+        self.cache_path = os.path.join(self.temp_dir.name, ".gallery_index.json")
+        self.addCleanup(gallery_rag._build_index.cache_clear)
+
+    def _build_and_persist(self):
+        index = gallery_rag._build_index(self.loader)
+        for thread in threading.enumerate():
+            if thread.name == "gallery-index-persist":
+                thread.join()
+        return index
+
+    def test_second_build_reads_persisted_index(self) -> None:
+        built = self._build_and_persist()
+        self.assertTrue(os.path.isfile(self.cache_path))
+        self.assertEqual(built.sanitized_code, ["ax.bar(x, y)"])
+
+        gallery_rag._build_index.cache_clear()
+        with mock.patch.object(gallery_rag, "_tokenize", side_effect=AssertionError("rebuilt")):
+            loaded = gallery_rag._build_index(self.loader)
+        self.assertEqual(loaded.postings, built.postings)
+        self.assertEqual(loaded.title_tokens, built.title_tokens)
+        self.assertEqual(loaded.sanitized_code, built.sanitized_code)
+
+    def test_unreadable_index_is_rebuilt_and_removed(self) -> None:
+        self._build_and_persist()
+        with open(self.cache_path, "r+b") as handle:
+            handle.truncate(10)
+
+        gallery_rag._build_index.cache_clear()
+        with mock.patch.object(gallery_rag.threading, "Thread"):
+            index = gallery_rag._build_index(self.loader)
+        self.assertEqual(index.titles_lower, ("bar colors",))
+        self.assertFalse(os.path.exists(self.cache_path))
+
+    def test_failed_write_leaves_no_file(self) -> None:
+        with mock.patch.object(gallery_rag.os, "replace", side_effect=OSError("disk full")):
+            self._build_and_persist()
+        self.assertEqual(os.listdir(self.temp_dir.name), ["gallery.json"])
+
+    def test_changed_gallery_file_rebuilds(self) -> None:
+        self._build_and_persist()
+        with open(self.loader.gallery_file, "w") as handle:
+            handle.write('{"changed": []}')
+
+        gallery_rag._build_index.cache_clear()
+        with mock.patch.object(gallery_rag, "_tokenize", wraps=gallery_rag._tokenize) as tokenize:
+            self._build_and_persist()
+        self.assertTrue(tokenize.called)
@@ -0,0 +1,75 @@
+"""Tests for URL analysis in the intelligent assistant."""
+
+import sys
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest import mock
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "backend"))
+
+import intelligent_assistant
+from intelligent_assistant import IntelligentAssistant, _extract_title_and_images
+
+
+class TestIntelligentAssistant(unittest.TestCase):
+    """Validate URL dispatch and result caching without network access."""
+
+    def setUp(self) -> None:
+        self.assistant = IntelligentAssistant()
+        self.response = mock.Mock(status_code=200, text="![demo](plot.png)", headers={})
+        patcher = mock.patch.object(self.assistant.session, "get", return_value=self.response)
+        self.get = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_github_readme_is_fetched_once(self) -> None:
+        first = self.assistant.analyze_url("https://github.com/owner/repo")
+        second = self.assistant.analyze_url("https://github.com/owner/repo")
+        self.assertEqual(first, second)
+        self.assertEqual(first["images"], [("demo", "plot.png")])
+        self.assertEqual(self.get.call_count, 1)
+
+    def test_matplotlib_example_needs_no_request(self) -> None:
+        url = "https://matplotlib.org/stable/gallery/lines_bars_and_markers/bar_colors.html"
+        result = self.assistant.analyze_url(url)
+        self.assertEqual(result["type"], "matplotlib_example")
+        self.assertEqual(result["example"], "bar_colors")
+        self.get.assert_not_called()
+
+    def test_concurrent_eviction_keeps_cache_bounded(self) -> None:
+        urls = [f"https://matplotlib.org/stable/gallery/lines/example_{i}.html" for i in range(400)]
+        with mock.patch.object(intelligent_assistant, "_URL_CACHE_MAX_ENTRIES", 4):
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                results = list(pool.map(self.assistant.analyze_url, urls))
+        self.assertEqual(len(results), 400)
+        self.assertLessEqual(len(self.assistant._url_cache), 4)
+
+    def test_failed_fetch_is_not_cached(self) -> None:
+        self.response.status_code = 404
+        first = self.assistant.analyze_url("https://github.com/owner/repo")
+        self.assertNotIn("images", first)
+
+        self.get.return_value = mock.Mock(status_code=200, text="![demo](plot.png)", headers={})
+        second = self.assistant.analyze_url("https://github.com/owner/repo")
+        self.assertEqual(second["images"], [("demo", "plot.png")])
+        self.assertEqual(self.get.call_count, 2)
+
+    def test_extracts_title_and_first_images(self) -> None:
+        images = "".join(f'<img src="p{i}.png">' for i in range(7))
+        html = f"<html><head><title>Demo</title></head><body>{images}</body></html>"
+        title, sources = _extract_title_and_images(html.encode())
+        self.assertEqual(title, "Demo")
+        self.assertEqual(sources, [f"p{i}.png" for i in range(5)])
+        self.assertEqual(_extract_title_and_images(b"<p>x</p>"), ("Unknown", []))
+
+    def test_revalidates_with_etag_and_reuses_parse_on_304(self) -> None:
+        self.response.headers = {"ETag": '"v1"'}
+        first, _ = self.assistant._analyze_github_repo("https://github.com/o/r", "o", "r")
+
+        self.get.return_value = mock.Mock(status_code=304, text="", headers={})
+        second, fetched = self.assistant._analyze_github_repo("https://github.com/o/r", "o", "r")
+
+        self.assertTrue(fetched)
+        self.assertEqual(first, second)
+        self.assertEqual(second["images"], [("demo", "plot.png")])
+        self.assertEqual(self.get.call_args.kwargs["headers"], {"If-None-Match": '"v1"'})
@@ -23,3 +23,34 @@ class TestJoinAssistant(unittest.TestCase):
         suggestions = self.assistant.suggest_joins({"df_left": left, "df_right": right})
         self.assertTrue(suggestions["suggestions"])
         self.assertEqual(suggestions["suggestions"][0]["key"], "id")
+
+    def test_reports_low_uniqueness_and_nulls(self) -> None:
+        left = pd.DataFrame({"id": [1.0, 2.0, 2.0, None]})
+        middle = pd.DataFrame({"id": [1, 2, 3, 4]})
+        right = pd.DataFrame({"id": [5, 6, 7, 8]})
+        result = self.assistant.suggest_joins({"df_a": left, "df_b": middle, "df_c": right})
+        pairs = [(item["left"], item["right"]) for item in result["suggestions"]]
+        self.assertEqual(pairs, [("df_a", "df_b"), ("df_a", "df_c"), ("df_b", "df_c")])
+        first = result["suggestions"][0]
+        self.assertEqual(first["left_stats"]["null_ratio"], 0.25)
+        self.assertIn("df_a.id has low uniqueness (0.50)", first["warnings"])
+        self.assertIn("df_a.id has 0.25 null ratio", first["warnings"])
+        self.assertEqual(result["suggestions"][2]["warnings"], [])
+
+    def test_large_object_columns_report_exact_uniqueness(self) -> None:
+        # Every key appears twice; a small random sample would look almost unique.
+        keys = pd.Series([f"k{i // 2}" for i in range(20_000)], dtype=object)
+        left = pd.DataFrame({"key": keys})
+        right = pd.DataFrame({"key": keys.copy()})
+        suggestions = self.assistant.suggest_joins({"df_left": left, "df_right": right})
+        first = suggestions["suggestions"][0]
+        self.assertEqual(first["left_stats"]["unique"], 10_000)
+        self.assertEqual(first["left_stats"]["uniqueness"], 0.5)
+        self.assertIn("df_left.key has low uniqueness (0.50)", first["warnings"])
+
+    def test_text_keys_join_and_mixed_buckets_do_not(self) -> None:
+        left = pd.DataFrame({"name": ["a", "b"], "id": [1, 2]})
+        right = pd.DataFrame({"name": ["a", "b"], "id": ["1", "2"]})
+        suggestions = self.assistant.suggest_joins({"df_left": left, "df_right": right})
+        keys = [item["key"] for item in suggestions["suggestions"]]
+        self.assertEqual(keys, ["name"])
@@ -0,0 +1,129 @@
+"""Tests for the LLM response cache."""
+
+import os
+import sys
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "backend"))
+
+import llm_cache
+from llm_cache import LLMCache, MemoryBackend, SemanticCache
+
+
+class TestLLMCache(unittest.TestCase):
+    """Validate keying, eviction and expiry."""
+
+    def test_key_covers_every_request_field(self) -> None:
+        base = LLMCache.cache_key("OllamaProvider", "llama3", "p", "s", temperature=0.2)
+        self.assertEqual(base, LLMCache.cache_key("OllamaProvider", "llama3", "p", "s", temperature=0.2))
+        self.assertNotEqual(base, LLMCache.cache_key("OllamaProvider", "mistral", "p", "s", temperature=0.2))
+        self.assertNotEqual(base, LLMCache.cache_key("OllamaProvider", "llama3", "p", None, temperature=0.2))
+
+    def test_memory_backend_evicts_least_recently_used(self) -> None:
+        cache = LLMCache(MemoryBackend(maxsize=2))
+        cache.set("a", "1")
+        cache.set("b", "2")
+        cache.get("a")
+        cache.set("c", "3")
+        self.assertEqual(cache.get("a"), "1")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.stats["hits"], 2)
+
+    def test_expired_entries_miss(self) -> None:
+        cache = LLMCache(MemoryBackend(), ttl_seconds=10)
+        with mock.patch.object(llm_cache.time, "monotonic", return_value=100.0):
+            cache.set("a", "1")
+        with mock.patch.object(llm_cache.time, "monotonic", return_value=111.0):
+            self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats["misses"], 1)
+
+
+def _bag_of_words(text: str) -> np.ndarray:
+    vector = np.zeros(16, dtype=np.float32)
+    for word in text.split():
+        vector[sum(map(ord, word)) % 16] += 1.0
+    return vector
+
+
+class TestSemanticCache(unittest.TestCase):
+    """Validate similarity matching, scoping and persistence."""
+
+    def test_matches_rewording_only_within_scope(self) -> None:
+        cache = SemanticCache(_bag_of_words, threshold=0.9)
+        cache.add("scatter of a vs b", "data-1", {"type": "plot_code", "code": "x"})
+        self.assertEqual(cache.lookup("Scatter  of b vs a", "data-1"), {"type": "plot_code", "code": "x"})
+        self.assertIsNone(cache.lookup("scatter of b vs a", "data-2"))
+        self.assertIsNone(cache.lookup("histogram of price", "data-1"))
+
+    def test_persists_entries_to_path(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "semantic.pkl")
+            cache = SemanticCache(_bag_of_words, path=path)
+            cache.add("line of y", "s", {"type": "text", "text": "t"})
+            cache.flush()
+            reloaded = SemanticCache(_bag_of_words, path=path)
+            self.assertEqual(reloaded.lookup("line of y", "s"), {"type": "text", "text": "t"})
+
+    def test_writes_are_throttled(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = SemanticCache(_bag_of_words, path=os.path.join(temp_dir, "semantic.pkl"))
+            with mock.patch.object(cache, "_save", wraps=cache._save) as save:
+                cache.add("line of y", "s", {"type": "text", "text": "t"})
+                cache.add("bar of y", "s", {"type": "text", "text": "u"})
+                save.assert_not_called()
+                with mock.patch.object(llm_cache.time, "monotonic", return_value=time.monotonic() + 60):
+                    cache.add("pie of y", "s", {"type": "text", "text": "v"})
+                save.assert_called_once()
+                cache.flush()
+                save.assert_called_once()
+
+    def test_corrupt_file_starts_empty(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "semantic.pkl")
+            with open(path, "wb") as handle:
+                handle.write(b"\x80\x05truncated")
+            cache = SemanticCache(_bag_of_words, path=path)
+            self.assertIsNone(cache.lookup("line of y", "s"))
+            self.assertEqual(cache.stats["entries"], 0)
+
+    def test_maxsize_one_keeps_only_latest(self) -> None:
+        cache = SemanticCache(_bag_of_words, maxsize=1)
+        for index in range(3):
+            cache.add(f"line {index}", "s", {"type": "text", "text": str(index)})
+        self.assertEqual(cache.stats["entries"], 1)
+        self.assertEqual(cache._vectors.shape[0], 1)
+
+    def test_clear_removes_entries_and_file(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "semantic.pkl")
+            cache = SemanticCache(_bag_of_words, path=path)
+            cache.add("line of y", "s", {"type": "text", "text": "t"})
+            cache.clear()
+            self.assertIsNone(cache.lookup("line of y", "s"))
+            self.assertFalse(os.path.exists(path))
+
+    def test_concurrent_add_and_lookup(self) -> None:
+        cache = SemanticCache(_bag_of_words, threshold=0.9, maxsize=8)
+
+        def work(index: int) -> None:
+            cache.add(f"line of y{index}", "s", {"type": "text", "text": str(index)})
+            cache.lookup(f"line of y{index - 1}", "s")
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(work, range(400)))
+        stats = cache.stats
+        self.assertEqual(stats["entries"], 8)
+        self.assertEqual(stats["hits"] + stats["misses"], 400)
+        self.assertEqual(cache._vectors.shape[0], len(cache._scopes))
+
+    def test_disabled_cache_skips_embedding_import(self) -> None:
+        with mock.patch.dict(os.environ, {"PLOT_LLM_SEMANTIC_CACHE": "off"}):
+            self.assertIsNone(llm_cache.build_semantic_cache())
+        self.assertNotIn("sentence_transformers", sys.modules)
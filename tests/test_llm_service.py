@@ -0,0 +1,450 @@
+"""Tests for LLM prompt orchestration without a live provider."""
+
+import asyncio
+import json
+import sys
+import unittest
+from pathlib import Path
+from typing import List, Optional
+from unittest import mock
+
+import httpx
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "backend"))
+
+import llm_service
+from llm_cache import SemanticCache
+from llm_service import LLMProvider, LLMService, OllamaProvider
+
+
+class _ScriptedProvider(LLMProvider):
+    """Synchronous provider returning canned responses in order."""
+
+    def __init__(self, responses: List[str]) -> None:
+        self.responses = list(responses)
+        self.prompts: List[str] = []
+
+    def generate(self, prompt: str, system_instruction: Optional[str] = None) -> str:
+        self.prompts.append(prompt)
+        return self.responses.pop(0)
+
+
+class TestLLMService(unittest.TestCase):
+    """Validate query routing and code extraction."""
+
+    def setUp(self) -> None:
+        self.service = LLMService()
+
+    def test_sync_provider_runs_through_async_default(self) -> None:
+        provider = _ScriptedProvider(["```python\nplt.plot([1, 2])\nplt.show()\n```"])
+        self.service.provider = provider
+        result = asyncio.run(self.service.process_query("plot a line"))
+        self.assertEqual(result["type"], "plot_code")
+        self.assertEqual(result["code"], "plt.plot([1, 2])")
+        self.assertEqual(len(provider.prompts), 1)
+
+    def test_ollama_agenerate_posts_payload(self) -> None:
+        seen = {}
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            seen.update(json.loads(request.content))
+            return httpx.Response(200, json={"response": "hello"})
+
+        async def run() -> str:
+            client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            with mock.patch.object(llm_service, "_get_async_http_client", return_value=client):
+                return await OllamaProvider(model="demo").agenerate("prompt", "system")
+
+        self.assertEqual(asyncio.run(run()), "hello")
+        self.assertEqual(seen["model"], "demo")
+        self.assertEqual((seen["prompt"], seen["system"]), ("prompt", "system"))
+        self.assertFalse(seen["stream"])
+
+    def test_repeated_query_is_served_from_cache(self) -> None:
+        provider = _ScriptedProvider(["```python\nplt.plot([1])\n```"])
+        self.service.provider = provider
+        first = asyncio.run(self.service.process_query("plot a line"))
+        second = asyncio.run(self.service.process_query("plot a line"))
+        self.assertEqual(first, second)
+        self.assertEqual(len(provider.prompts), 1)
+        self.assertEqual(self.service.cache.stats["hits"], 1)
+
+    def test_high_temperature_provider_bypasses_cache(self) -> None:
+        provider = _ScriptedProvider(["```python\nplt.plot([1])\n```"] * 2)
+        provider.temperature = 0.9
+        self.service.provider = provider
+        asyncio.run(self.service.process_query("plot a line"))
+        asyncio.run(self.service.process_query("plot a line"))
+        self.assertEqual(len(provider.prompts), 2)
+
+    def test_semantic_cache_skips_provider_for_paraphrase(self) -> None:
+        self.service.semantic_cache = SemanticCache(
+            lambda text: np.array([1.0, float("line" in text)]), threshold=0.99
+        )
+        provider = _ScriptedProvider(["```python\nplt.plot([1])\n```"])
+        self.service.provider = provider
+        first = asyncio.run(self.service.process_query("plot a line please"))
+        second = asyncio.run(self.service.process_query("please plot one line"))
+        self.assertEqual(first, second)
+        self.assertEqual(len(provider.prompts), 1)
+
+    def test_example_request_embeds_gallery_code(self) -> None:
+        loader = mock.Mock()
+        loader.search_examples.return_value = [{"title": "Bar Colors", "code": "ax.bar(x, y)"}]
+        with mock.patch.object(llm_service, "get_gallery_loader", return_value=loader):
+            _, prompt = self.service._construct_plot_prompt("Based on this example: Bar Colors. Use my data")
+        loader.search_examples.assert_called_once_with("bar colors", limit=1)
+        self.assertIn("The user wants to adapt this example: Bar Colors", prompt)
+
+    def test_clarification_gates(self) -> None:
+        catalog = [
+            {"alias": "df_sales", "filename": "Sales.csv"},
+            {"alias": "df_costs", "filename": "costs.csv"},
+        ]
+        self.assertIsNone(self.service._needs_clarification("scatterplotting please", None, None))
+        self.assertEqual(
+            self.service._needs_clarification("show me something", None, None),
+            "What kind of visualization would you like me to create?",
+        )
+        self.assertIn("multiple files", self.service._needs_clarification("plot it", catalog, None))
+        self.assertIsNone(self.service._needs_clarification("plot sales.csv", catalog, None))
+        self.assertIsNone(self.service._needs_clarification("merge and plot", catalog, None))
+
+    def test_stream_query_yields_deltas_then_result(self) -> None:
+        class _ChunkedProvider(_ScriptedProvider):
+            async def astream(self, prompt, system_instruction=None):
+                for piece in ["```python\n", "plt.plot([1])\n", "```"]:
+                    yield piece
+
+        self.service.provider = _ChunkedProvider([])
+
+        async def collect():
+            return [event async for event in self.service.stream_query("plot a line")]
+
+        events = asyncio.run(collect())
+        deltas = [event.get("delta") for event in events[:-1]]
+        self.assertEqual(deltas, ["```python\n", "plt.plot([1])\n", "```"])
+        self.assertEqual(events[-1]["type"], "plot_code")
+        self.assertEqual(events[-1]["code"], "plt.plot([1])")
+
+    def test_ollama_astream_parses_json_lines(self) -> None:
+        body = b'{"response": "a"}\n{"response": "b"}\n{"response": "", "done": true}\n'
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            self.assertTrue(json.loads(request.content)["stream"])
+            return httpx.Response(200, content=body)
+
+        async def run() -> List[str]:
+            client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            with mock.patch.object(llm_service, "_get_async_http_client", return_value=client):
+                return [chunk async for chunk in OllamaProvider(model="demo").astream("prompt")]
+
+        self.assertEqual(asyncio.run(run()), ["a", "b", ""])
+
+    def test_set_provider_reuses_instances(self) -> None:
+        ollama = self.service.provider
+        self.service.set_provider("openai", "key-1", "gpt-4o")
+        openai_provider = self.service.provider
+        self.service.set_provider("ollama")
+        self.assertIs(self.service.provider, ollama)
+        self.service.set_provider("openai", "key-1", "gpt-4o")
+        self.assertIs(self.service.provider, openai_provider)
+        self.service.set_provider("openai", "key-2", "gpt-4o")
+        self.assertIsNot(self.service.provider, openai_provider)
+        self.assertEqual(self.service.model_name, "gpt-4o")
+
+    def test_reselecting_current_provider_skips_activation(self) -> None:
+        with mock.patch.object(OllamaProvider, "activate") as activate:
+            self.service.set_provider("ollama")
+            activate.assert_not_called()
+            self.service.set_provider("openai", "key-1", "gpt-4o")
+            self.service.set_provider("ollama")
+            activate.assert_called_once()
+
+    def test_extract_code_handles_fences(self) -> None:
+        extract = self.service._extract_code
+        self.assertEqual(extract("Here is it:\n```python\nHere is x\nx = 1\nplt.show()\n```"), "x = 1")
+        self.assertEqual(extract("```py\nplt.plot(x)\n```"), "plt.plot(x)")
+        self.assertEqual(extract("```\nprint(1)\n```"), "print(1)")
+        self.assertEqual(extract("```python\nx = 1"), "x = 1")
+        self.assertIsNone(extract("```\nx = 1"))
+        self.assertIsNone(extract("no code here"))
+
+    def test_greeting_gets_canned_reply_without_provider(self) -> None:
+        provider = _ScriptedProvider([])
+        self.service.provider = provider
+        result = asyncio.run(self.service.process_query("  Hello! "))
+        self.assertEqual(result, {"type": "text", "text": "Hello! What would you like to plot?"})
+        self.assertEqual(provider.prompts, [])
+
+    def test_ollama_generate_uses_shared_session(self) -> None:
+        response = mock.Mock(json=mock.Mock(return_value={"response": "hi"}))
+        with mock.patch.object(llm_service._HTTP_SESSION, "post", return_value=response) as post:
+            self.assertEqual(OllamaProvider(model="demo").generate("prompt"), "hi")
+        self.assertEqual(post.call_args.kwargs["json"]["model"], "demo")
+
+    def test_drafts_prefer_first_reply_with_code(self) -> None:
+        class _TemperatureProvider(_ScriptedProvider):
+            def generate(self, prompt, system_instruction=None):
+                self.prompts.append(prompt)
+                if self.temperature > 0.3:
+                    return "```python\nplt.bar([1], [2])\n```"
+                return "Which columns should I use?"
+
+        provider = _TemperatureProvider([])
+        self.service.provider = provider
+        self.service.draft_count = 2
+        result = asyncio.run(self.service.process_query("plot a bar chart"))
+        self.assertEqual(result["code"], "plt.bar([1], [2])")
+        self.assertEqual(len(provider.prompts), 2)
+        self.assertEqual(provider.temperature, 0.2)
+
+    def test_drafts_are_skipped_when_temperature_is_ignored(self) -> None:
+        provider = _ScriptedProvider(["```python\nplt.bar([1], [2])\n```"])
+        provider.honours_temperature = False
+        self.service.provider = provider
+        self.service.draft_count = 3
+        asyncio.run(self.service.process_query("plot a bar chart"))
+        self.assertEqual(len(provider.prompts), 1)
+
+    def test_drafts_count_against_provider_concurrency(self) -> None:
+        active = []
+        peak = []
+
+        class _CountingProvider(_ScriptedProvider):
+            max_concurrency = 3
+
+            async def agenerate(self, prompt, system_instruction=None):
+                active.append(prompt)
+                peak.append(len(active))
+                await asyncio.sleep(0.01)
+                active.remove(prompt)
+                return "```python\nplt.plot([1])\n```"
+
+        self.service.provider = _CountingProvider([])
+        self.service.draft_count = 3
+
+        async def run():
+            await asyncio.gather(
+                *(self.service.process_query(f"plot line {index}") for index in range(4))
+            )
+
+        asyncio.run(run())
+        self.assertEqual(max(peak), 3)
+
+    def test_alias_map_matches_indented_json(self) -> None:
+        for alias_map in [{}, {"df_a": "a.csv"}, {"df_ü": 'we"ird\\name\n.csv', "df_b": "b.csv"}]:
+            self.assertEqual(llm_service._format_alias_map(alias_map), json.dumps(alias_map, indent=2))
+
+    def test_clear_caches_forces_a_new_provider_call(self) -> None:
+        provider = _ScriptedProvider(["```python\nplt.plot([1])\n```"] * 2)
+        self.service.provider = provider
+        asyncio.run(self.service.process_query("plot a line"))
+        self.service.clear_caches()
+        asyncio.run(self.service.process_query("plot a line"))
+        self.assertEqual(len(provider.prompts), 2)
+
+    def test_system_prompt_is_shared_across_queries(self) -> None:
+        first_system, first_prompt = self.service._construct_plot_prompt("plot a sine wave")
+        second_system, second_prompt = self.service._construct_plot_prompt("plot a cosine wave")
+        self.assertIs(first_system, second_system)
+        self.assertIn("### Instructions", first_system)
+        self.assertNotIn("### Instructions", first_prompt)
+        self.assertIn("plot a cosine wave", second_prompt)
+
+    def test_identical_concurrent_requests_share_one_call(self) -> None:
+        class _SlowProvider(_ScriptedProvider):
+            async def agenerate(self, prompt, system_instruction=None):
+                self.prompts.append(prompt)
+                await asyncio.sleep(0.01)
+                return "```python\nplt.plot([1])\n```"
+
+        provider = _SlowProvider([])
+        self.service.provider = provider
+
+        async def run():
+            return await asyncio.gather(
+                *(self.service.process_query("plot a line") for _ in range(3))
+            )
+
+        results = asyncio.run(run())
+        self.assertEqual(len(provider.prompts), 1)
+        self.assertTrue(all(result["code"] == "plt.plot([1])" for result in results))
+        self.assertEqual(self.service._in_flight, {})
+
+    def test_provider_concurrency_is_capped(self) -> None:
+        active = []
+        peak = []
+
+        class _CountingProvider(_ScriptedProvider):
+            max_concurrency = 2
+
+            async def agenerate(self, prompt, system_instruction=None):
+                active.append(prompt)
+                peak.append(len(active))
+                await asyncio.sleep(0.01)
+                active.remove(prompt)
+                return "ok"
+
+        self.service.provider = _CountingProvider([])
+
+        async def run():
+            await asyncio.gather(
+                *(self.service.process_query(f"plot line {index}") for index in range(5))
+            )
+
+        asyncio.run(run())
+        self.assertEqual(max(peak), 2)
+
+    def test_openai_providers_share_connection_pools(self) -> None:
+        first = llm_service.OpenAIProvider(api_key="key-1", model="gpt-4o")
+        second = llm_service.OpenAIProvider(api_key="key-2", model="gpt-4o-mini")
+        self.assertIs(first.async_client._client, second.async_client._client)
+        self.assertIs(first.client._client, second.client._client)
+
+    def test_small_edit_omits_gallery_overview(self) -> None:
+        gallery = llm_service.get_gallery_prompt()
+        edit_system, _ = self.service._construct_plot_prompt(
+            "change the title to Sales", current_code="plt.plot([1])"
+        )
+        rewrite_system, _ = self.service._construct_plot_prompt(
+            "turn this into a histogram", current_code="plt.plot([1])"
+        )
+        self.assertNotIn(gallery, edit_system)
+        self.assertIn(gallery, rewrite_system)
+
+    def test_transient_errors_are_retried_before_any_text(self) -> None:
+        request = httpx.Request("POST", "http://localhost")
+        errors = [
+            httpx.ConnectError("refused", request=request),
+            RuntimeError("wrapped"),
+        ]
+        errors[1].__cause__ = httpx.HTTPStatusError(
+            "busy", request=request, response=httpx.Response(503, request=request)
+        )
+
+        class _FlakyProvider(_ScriptedProvider):
+            async def agenerate(self, prompt, system_instruction=None):
+                self.prompts.append(prompt)
+                if errors:
+                    raise errors.pop(0)
+                return "```python\nplt.plot([1])\n```"
+
+        provider = _FlakyProvider([])
+        self.service.provider = provider
+        with mock.patch.object(llm_service, "_RETRY_BASE_DELAY_SECONDS", 0):
+            result = asyncio.run(self.service.process_query("plot a line"))
+        self.assertEqual(result["type"], "plot_code")
+        self.assertEqual(len(provider.prompts), 3)
+
+    def test_client_errors_are_not_retried(self) -> None:
+        request = httpx.Request("POST", "http://localhost")
+
+        class _RejectingProvider(_ScriptedProvider):
+            async def agenerate(self, prompt, system_instruction=None):
+                self.prompts.append(prompt)
+                raise httpx.HTTPStatusError(
+                    "denied", request=request, response=httpx.Response(401, request=request)
+                )
+
+        provider = _RejectingProvider([])
+        self.service.provider = provider
+        result = asyncio.run(self.service.process_query("plot a line"))
+        self.assertIn("LLM request failed", result["text"])
+        self.assertEqual(len(provider.prompts), 1)
+
+    def test_label_and_legend_edits_skip_the_provider(self) -> None:
+        provider = _ScriptedProvider([])
+        self.service.provider = provider
+        code = 'ax.plot(x, y, label="é")\nax.set_title("Old", fontsize=14)\nax.legend(fontsize=9)\n'
+        result = asyncio.run(
+            self.service.process_query("Change the title to 'Sales by Region'", current_code=code)
+        )
+        self.assertEqual(result["type"], "plot_code")
+        self.assertIn("ax.set_title('Sales by Region', fontsize=14)", result["code"])
+        moved = self.service._try_local_edit("move the legend to upper left", code)
+        self.assertIn("ax.legend(fontsize=9, loc='upper left')", moved)
+        self.assertEqual(provider.prompts, [])
+
+    def test_ambiguous_edits_fall_through_to_the_provider(self) -> None:
+        subplots = "ax1.set_title('a')\nax2.set_title('b')\n"
+        self.assertIsNone(self.service._try_local_edit("change the title to A", subplots))
+        self.assertIsNone(
+            self.service._try_local_edit(
+                "change the title to A and make it bold", "plt.title('a')\n"
+            )
+        )
+        self.assertEqual(
+            self.service._try_local_edit("move legend to center right", "plt.legend()\n"),
+            "plt.legend(loc='center right')\n",
+        )
+
+    def test_stream_stops_after_the_code_block_closes(self) -> None:
+        closed = []
+
+        class _ChattyProvider(_ScriptedProvider):
+            async def astream(self, prompt, system_instruction=None):
+                try:
+                    for piece in ["```python\nplt.plot([1])\n", "```\n", "This plot shows..."]:
+                        yield piece
+                finally:
+                    closed.append(True)
+
+        self.service.provider = _ChattyProvider([])
+
+        async def collect():
+            return [event async for event in self.service.stream_query("plot a line")]
+
+        events = asyncio.run(collect())
+        self.assertEqual([event.get("delta") for event in events[:-1]], ["```python\nplt.plot([1])\n", "```\n"])
+        self.assertEqual(events[-1]["code"], "plt.plot([1])")
+        self.assertEqual(closed, [True])
+
+    def test_rate_limit_waits_for_retry_after(self) -> None:
+        request = httpx.Request("POST", "http://localhost")
+
+        def rate_limited(seconds: str) -> httpx.HTTPStatusError:
+            response = httpx.Response(429, request=request, headers={"Retry-After": seconds})
+            return httpx.HTTPStatusError("slow down", request=request, response=response)
+
+        errors = [rate_limited("2"), rate_limited("60")]
+
+        class _LimitedProvider(_ScriptedProvider):
+            async def agenerate(self, prompt, system_instruction=None):
+                self.prompts.append(prompt)
+                if errors:
+                    raise errors.pop(0)
+                return "```python\nplt.plot([1])\n```"
+
+        provider = _LimitedProvider([])
+        self.service.provider = provider
+        with mock.patch.object(llm_service.asyncio, "sleep", mock.AsyncMock()) as sleep:
+            first = asyncio.run(self.service.process_query("plot a line"))
+            second = asyncio.run(self.service.process_query("plot a bar"))
+        self.assertIn("LLM request failed", first["text"])
+        self.assertEqual(second["type"], "plot_code")
+        # The 2s wait is honoured; the 60s one is too long and fails fast.
+        self.assertEqual(sleep.await_args_list, [mock.call(2.0)])
+        self.assertEqual(len(provider.prompts), 3)
+
+    def test_small_edit_to_long_code_applies_a_diff(self) -> None:
+        filler = "".join(f"values_{index} = [{index}] * 40\n" for index in range(100))
+        code = f"{filler}plt.plot(values_0, color='red')\n\nplt.grid(True)\n"
+        diff = (
+            "```diff\n@@ -101,3 +101,3 @@\n"
+            "-plt.plot(values_0, color='red')\n+plt.plot(values_0, color='blue')\n"
+            "\n plt.grid(True)\n```"
+        )
+        provider = _ScriptedProvider([diff])
+        self.service.provider = provider
+        result = asyncio.run(self.service.process_query("make the line colour blue", current_code=code))
+        self.assertEqual(result["code"], code.replace("'red'", "'blue'"))
+        self.assertIn("unified diff", provider.prompts[0])
+
+        stale = diff.replace("values_0", "values_x")
+        provider = _ScriptedProvider([stale, "```python\nplt.plot([1])\n```"])
+        self.service.provider = provider
+        result = asyncio.run(self.service.process_query("make the line colour green", current_code=code))
+        self.assertEqual(result["code"], "plt.plot([1])")
+        self.assertNotIn("unified diff", provider.prompts[1])
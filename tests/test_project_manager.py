@@ -34,3 +34,11 @@ class TestProjectManager(unittest.TestCase):
         files = [entry for entry in entries if entry.get("type") == "file"]
         self.assertEqual(len(files), 1)
         self.assertEqual(files[0]["name"], "data.csv")
+
+    def test_project_exists_checks_directories_only(self) -> None:
+        self.manager.create_project("Survey")
+        with open(os.path.join(self.manager.base_dir, "notes.txt"), "w") as f:
+            f.write("not a project")
+        self.assertTrue(self.manager.project_exists("Survey"))
+        self.assertFalse(self.manager.project_exists("notes.txt"))
+        self.assertFalse(self.manager.project_exists("Missing"))
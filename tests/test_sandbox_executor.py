@@ -0,0 +1,23 @@
+"""Tests for the plot sandbox subprocess runner."""
+
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "backend"))
+
+from sandbox_executor import SandboxExecutor
+
+
+class TestSandboxExecutor(unittest.TestCase):
+    """Validate output handling and time limits."""
+
+    def test_large_output_does_not_stall_execution(self) -> None:
+        code = "for i in range(30000):\n    print('x' * 10)\nplt.plot([1, 2])"
+        result = SandboxExecutor(timeout_seconds=20).execute(code, {})
+        self.assertFalse(result.get("error"), result.get("error_message"))
+        self.assertTrue(result["buffer"])
+
+    def test_runaway_code_times_out(self) -> None:
+        result = SandboxExecutor(timeout_seconds=1).execute("while True:\n    pass", {})
+        self.assertEqual(result, {"error": True, "error_message": "Plot execution timed out"})